@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import threading
+from dataclasses import dataclass, field
+
+from fastapi.responses import JSONResponse
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "exponential")
+
+
+@dataclass
+class LatencyModel:
+    """
+    Milliseconds to wait before answering a request. `spread_ms` is the half
+    width of a uniform, or the standard deviation of a normal distribution
+    around `mean_ms`; exponential latencies only use `mean_ms`.
+    """
+
+    distribution: str = "fixed"
+    mean_ms: float = 0.0
+    spread_ms: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.distribution == "uniform":
+            latency = rng.uniform(
+                self.mean_ms - self.spread_ms, self.mean_ms + self.spread_ms
+            )
+        elif self.distribution == "normal":
+            latency = rng.gauss(self.mean_ms, self.spread_ms)
+        elif self.distribution == "exponential":
+            latency = rng.expovariate(1 / self.mean_ms) if self.mean_ms > 0 else 0.0
+        else:
+            latency = self.mean_ms
+        return max(latency, 0.0) / 1000
+
+
+@dataclass
+class EmulatorConfig:
+    host: str = "127.0.0.1"
+    port: int = 0
+    latency: LatencyModel = field(default_factory=LatencyModel)
+    # Share of requests answered with `error_status` instead
+    error_rate: float = 0.0
+    error_status: int = 500
+    # Outputs only depend on the request and the seed; latencies and injected
+    # errors follow the order requests arrive in
+    seed: int = 0
+
+
+class FaultInjector:
+    """
+    Delays requests and fails some of them, drawing from one seeded random
+    generator shared by every request.
+    """
+
+    def __init__(self, config: EmulatorConfig):
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+
+    async def delay(self) -> None:
+        with self._lock:
+            seconds = self.config.latency.sample(self._rng)
+        if seconds:
+            await asyncio.sleep(seconds)
+
+    def injected_error(self, body: dict) -> JSONResponse | None:
+        """
+        Returns the error response to send instead of the real answer, if any.
+        """
+        if not self.config.error_rate:
+            return None
+        with self._lock:
+            failed = self._rng.random() < self.config.error_rate
+        if not failed:
+            return None
+        return JSONResponse(status_code=self.config.error_status, content=body)
+
+
+def seeded_random(seed: int, *parts: str) -> random.Random:
+    """
+    A random generator seeded by `seed` and the request content, so the same
+    request always gets the same output.
+    """
+    digest = hashlib.sha256("\x1f".join((str(seed), *parts)).encode("utf-8")).digest()
+    return random.Random(digest)
+
+
+def add_common_arguments(
+    parser: argparse.ArgumentParser, env_prefix: str, default_port: int
+) -> None:
+    """
+    Adds the server, latency, error injection and seed options. Each option
+    defaults to the `<env_prefix><OPTION>` environment variable, e.g.
+    `OLLAMA_EMULATOR_LATENCY_MS`.
+    """
+
+    def env(name: str, default: str) -> str:
+        return os.getenv(f"{env_prefix}{name}", default)
+
+    parser.add_argument("--host", default=env("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(env("PORT", str(default_port))))
+    parser.add_argument(
+        "--latency-distribution",
+        choices=LATENCY_DISTRIBUTIONS,
+        default=env("LATENCY_DISTRIBUTION", "fixed"),
+    )
+    parser.add_argument(
+        "--latency-ms", type=float, default=float(env("LATENCY_MS", "0"))
+    )
+    parser.add_argument(
+        "--latency-spread-ms", type=float, default=float(env("LATENCY_SPREAD_MS", "0"))
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=float(env("ERROR_RATE", "0"))
+    )
+    parser.add_argument(
+        "--error-status", type=int, default=int(env("ERROR_STATUS", "500"))
+    )
+    parser.add_argument("--seed", type=int, default=int(env("SEED", "0")))
+
+
+def config_from_arguments(args: argparse.Namespace) -> EmulatorConfig:
+    if not 0.0 <= args.error_rate <= 1.0:
+        raise SystemExit("--error-rate must be between 0 and 1")
+    return EmulatorConfig(
+        host=args.host,
+        port=args.port,
+        latency=LatencyModel(
+            args.latency_distribution, args.latency_ms, args.latency_spread_ms
+        ),
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
@@ -0,0 +1,276 @@
+"""
+A local stand-in for the Ollama API, for load tests and benchmarks without a
+GPU or any model downloaded:
+
+    python -m emulators.ollama --port 11435 --latency-ms 80 --token-delay-ms 15
+
+Point a lab at it with `OLLAMA_BASE_URL=http://127.0.0.1:11435`.
+`/api/generate` and `/api/chat` answer with text picked from a fixed
+vocabulary and streamed token by token (unless the request sets
+`"stream": false`); `/api/embed` and `/api/embeddings` return bag-of-words
+unit vectors. Both only depend on the model, the input and `--seed`.
+Options default to `OLLAMA_EMULATOR_*` environment variables, e.g.
+`OLLAMA_EMULATOR_ERROR_RATE=0.05`.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+from emulators.common import (
+    EmulatorConfig,
+    FaultInjector,
+    add_common_arguments,
+    config_from_arguments,
+    seeded_random,
+)
+
+DEFAULT_PORT = 11435
+WORD_PATTERN = re.compile(r"\w+")
+VERSION = "0.12.0-emulator"
+
+VOCABULARY = (
+    "the record shows a customer account with an active subscription and a "
+    "billing address on file the contact was updated last month after a request "
+    "from support the data includes email phone and network details for each user "
+    "in the system no further action is required at this time"
+).split()
+
+
+def create_app(
+    config: EmulatorConfig,
+    token_delay: float = 0.0,
+    response_words: int = 48,
+    dimensions: int = 768,
+    models: tuple[str, ...] = ("llama3.2", "nomic-embed-text"),
+) -> FastAPI:
+    app = FastAPI(title="Ollama emulator")
+    faults = FaultInjector(config)
+
+    async def answer(
+        body: dict, text: str, to_chunk: Callable[[str], dict], started: float
+    ) -> Any:
+        """
+        Returns the reply as one JSON object, or streams it as NDJSON chunks
+        of one token each, followed by the final chunk with the counts.
+        """
+        tokens = _tokens(text)
+        final = {
+            "model": body.get("model", ""),
+            "created_at": _now(),
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": len(_tokens(json.dumps(body))),
+            "eval_count": len(tokens),
+        }
+        if not body.get("stream", True):
+            final.update(to_chunk(text))
+            final["total_duration"] = _nanoseconds_since(started)
+            return final
+
+        async def stream() -> AsyncIterator[str]:
+            for index, token in enumerate(tokens):
+                if index and token_delay:
+                    await asyncio.sleep(token_delay)
+                chunk = {
+                    "model": body.get("model", ""),
+                    "created_at": _now(),
+                    "done": False,
+                }
+                chunk.update(to_chunk(token))
+                yield json.dumps(chunk) + "\n"
+            final.update(to_chunk(""))
+            final["total_duration"] = _nanoseconds_since(started)
+            yield json.dumps(final) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.get("/", response_class=PlainTextResponse)
+    async def root() -> str:
+        return "Ollama is running"
+
+    @app.get("/api/version")
+    async def version() -> dict:
+        return {"version": VERSION}
+
+    @app.get("/api/tags")
+    async def tags() -> dict:
+        return {
+            "models": [
+                {"name": f"{model}:latest", "model": f"{model}:latest", "size": 0}
+                for model in models
+            ]
+        }
+
+    @app.post("/api/generate")
+    async def generate(request: Request) -> Any:
+        started = time.perf_counter()
+        body = await request.json()
+        if error := faults.injected_error({"error": "injected failure"}):
+            return error
+        await faults.delay()
+
+        prompt = body.get("prompt", "")
+        # An empty prompt only loads the model, e.g. during warm-up
+        text = ""
+        if prompt:
+            text = _text(config.seed, body.get("model", ""), prompt, response_words)
+        return await answer(body, text, lambda part: {"response": part}, started)
+
+    @app.post("/api/chat")
+    async def chat(request: Request) -> Any:
+        started = time.perf_counter()
+        body = await request.json()
+        if error := faults.injected_error({"error": "injected failure"}):
+            return error
+        await faults.delay()
+
+        messages = body.get("messages", [])
+        conversation = "\n".join(
+            f"{message.get('role')}: {message.get('content', '')}"
+            for message in messages
+        )
+        text = _text(config.seed, body.get("model", ""), conversation, response_words)
+        return await answer(
+            body,
+            text if messages else "",
+            lambda part: {"message": {"role": "assistant", "content": part}},
+            started,
+        )
+
+    @app.post("/api/embed")
+    async def embed(request: Request) -> Any:
+        started = time.perf_counter()
+        body = await request.json()
+        if error := faults.injected_error({"error": "injected failure"}):
+            return error
+        await faults.delay()
+
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        model = body.get("model", "")
+        return {
+            "model": model,
+            "embeddings": [
+                _vector(config.seed, model, text, dimensions) for text in inputs
+            ],
+            "total_duration": _nanoseconds_since(started),
+            "load_duration": 0,
+            "prompt_eval_count": sum(len(_tokens(text)) for text in inputs),
+        }
+
+    @app.post("/api/embeddings")
+    async def embeddings(request: Request) -> Any:
+        body = await request.json()
+        if error := faults.injected_error({"error": "injected failure"}):
+            return error
+        await faults.delay()
+
+        model = body.get("model", "")
+        return {
+            "embedding": _vector(config.seed, model, body.get("prompt", ""), dimensions)
+        }
+
+    return app
+
+
+def _text(seed: int, model: str, prompt: str, words: int) -> str:
+    """
+    `words` vocabulary words in sentences of 6 to 12 words, one per line
+    (e.g. the alternative questions a multi-query retriever asks for).
+    """
+    rng = seeded_random(seed, model, prompt)
+    sentences = []
+    remaining = words
+    while remaining > 0:
+        length = min(rng.randint(6, 12), remaining)
+        sentence = " ".join(rng.choice(VOCABULARY) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        remaining -= length
+    return "\n".join(sentences)
+
+
+def _tokens(text: str) -> list[str]:
+    # Words with their leading whitespace, so the streamed tokens join back into `text`
+    tokens: list[str] = []
+    for index, word in enumerate(text.split(" ")):
+        tokens.append(word if index == 0 else " " + word)
+    return [token for token in tokens if token]
+
+
+def _vector(seed: int, model: str, text: str, dimensions: int) -> list[float]:
+    """
+    A unit vector hashing each word of `text` to a signed dimension, so texts
+    sharing words are similar and retrieval thresholds behave as with a real
+    model. Text without words gets a random vector seeded by the text.
+    """
+    vector = [0.0] * dimensions
+    for word in WORD_PATTERN.findall(text.lower()):
+        digest = hashlib.blake2b(
+            f"{seed}\x1f{word}".encode("utf-8"), digest_size=8
+        ).digest()
+        bucket = int.from_bytes(digest, "big")
+        vector[bucket % dimensions] += 1.0 if bucket >> 63 else -1.0
+
+    norm = math.sqrt(sum(value * value for value in vector))
+    if not norm:
+        rng = seeded_random(seed, model, text)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+        norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _nanoseconds_since(started: float) -> int:
+    return int((time.perf_counter() - started) * 1e9)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    add_common_arguments(parser, "OLLAMA_EMULATOR_", DEFAULT_PORT)
+    parser.add_argument(
+        "--token-delay-ms",
+        type=float,
+        default=float(os.getenv("OLLAMA_EMULATOR_TOKEN_DELAY_MS", "0")),
+        help="delay between streamed tokens",
+    )
+    parser.add_argument(
+        "--response-words",
+        type=int,
+        default=int(os.getenv("OLLAMA_EMULATOR_RESPONSE_WORDS", "48")),
+    )
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        default=int(os.getenv("OLLAMA_EMULATOR_DIMENSIONS", "768")),
+        help="length of the embedding vectors (768 for nomic-embed-text)",
+    )
+    args = parser.parse_args(argv)
+    config = config_from_arguments(args)
+
+    app = create_app(
+        config,
+        token_delay=args.token_delay_ms / 1000,
+        response_words=args.response_words,
+        dimensions=args.dimensions,
+    )
+    uvicorn.run(app, host=config.host, port=config.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+A local stand-in for the Soteria guard API (`POST /process`, as called by
+`soteria_sdk`), so the protected modes run without network access:
+
+    python -m emulators.soteria --port 8787 --latency-ms 40
+
+Point a lab at it with `SOTERIA_API_BASE=http://127.0.0.1:8787` (any
+`SOTERIA_API_KEY` is accepted unless `--api-key` is given).
+The guards are pattern based and deterministic: `jailbreak-detector` and
+`prompt-injection-detector` block prompts matching well-known attack phrases,
+`pii-redactor` and `secrets-redactor` replace what they find with numbered
+placeholders such as `[REDACTED_EMAIL_ADDRESS_1]`.
+Options default to `SOTERIA_EMULATOR_*` environment variables, e.g.
+`SOTERIA_EMULATOR_LATENCY_DISTRIBUTION=exponential`.
+"""
+
+import argparse
+import os
+import re
+from typing import Any
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from emulators.common import (
+    EmulatorConfig,
+    FaultInjector,
+    add_common_arguments,
+    config_from_arguments,
+)
+
+DEFAULT_PORT = 8787
+
+# Same placeholder scheme as the Soteria redactors
+PLACEHOLDER = "[REDACTED_{type}_{number}]"
+
+JAILBREAK_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"\b(?:you are|act as|pretend to be|roleplay as)\b.{0,40}"
+        r"\b(?:dan|unrestricted|unfiltered|jailbroken|evil)\b",
+        r"\bdo anything now\b",
+        r"\bdeveloper mode\b",
+        r"\bwithout (?:any )?(?:restrictions|filters|limitations|guidelines)\b",
+        r"\b(?:i am|i'm) (?:your|the) (?:admin|administrator|developer|creator|system)\b",
+    )
+]
+PROMPT_INJECTION_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"\b(?:ignore|disregard|forget|override)\b.{0,30}"
+        r"\b(?:previous|prior|above|earlier|all)\b.{0,30}"
+        r"\b(?:instructions|rules|prompts?|directions)\b",
+        r"\b(?:reveal|print|show|repeat)\b.{0,30}\b(?:system prompt|hidden instructions|your instructions)\b",
+        r"\bnew instructions?\s*:",
+        r"\bfrom now on\b.{0,40}\b(?:you will|you must|always|never)\b",
+    )
+]
+
+PII_PATTERNS = [
+    ("EMAIL_ADDRESS", re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}")),
+    ("CREDIT_CARD", re.compile(r"\b\d{4}(?:[ -]?\d{4}){3}\b")),
+    (
+        "PHONE_NUMBER",
+        re.compile(
+            r"(?<![\w.])(?:\+\d{1,3}[ .-]?)?(?:\(\d{2,4}\)[ .-]?|\d{2,4}[ .-])"
+            r"\d{3,4}[ .-]?\d{3,4}\b"
+        ),
+    ),
+    ("IP_ADDRESS", re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")),
+    # Capitalised word pairs not starting a sentence, e.g. "call Bob Johnson"
+    ("PERSON", re.compile(r"(?<=[a-z,] )[A-Z][a-z]+(?: [A-Z][a-z]+)+\b")),
+]
+SECRET_PATTERNS = [
+    ("SECRET", re.compile(r"\bAKIA[0-9A-Z]{16}\b")),
+    ("SECRET", re.compile(r"\b(?:sk|pk|rk)-[A-Za-z0-9_-]{20,}\b")),
+    ("SECRET", re.compile(r"\bgh[pousr]_[A-Za-z0-9]{36,}\b")),
+    ("SECRET", re.compile(r"\bpassword\s*[=:]\s*\S+", re.IGNORECASE)),
+]
+
+
+def detect(patterns: list[re.Pattern], prompt: str) -> dict:
+    matches = [
+        match.group() for pattern in patterns if (match := pattern.search(prompt))
+    ]
+    return {
+        "is_valid": not matches,
+        "processed_prompt": prompt,
+        "validation_summaries": [f"Matched '{match}'" for match in matches],
+    }
+
+
+def redact(patterns: list[tuple[str, re.Pattern]], prompt: str) -> dict:
+    """
+    Replaces every match with a placeholder numbered per type, the same text
+    getting the same placeholder.
+    """
+    counts: dict[str, int] = {}
+    placeholders: dict[tuple[str, str], str] = {}
+
+    def placeholder(pii_type: str, text: str) -> str:
+        if (pii_type, text) not in placeholders:
+            counts[pii_type] = counts.get(pii_type, 0) + 1
+            placeholders[(pii_type, text)] = PLACEHOLDER.format(
+                type=pii_type, number=counts[pii_type]
+            )
+        return placeholders[(pii_type, text)]
+
+    processed = prompt
+    for pii_type, pattern in patterns:
+        processed = pattern.sub(lambda m: placeholder(pii_type, m.group()), processed)
+    return {
+        "is_valid": True,
+        "processed_prompt": processed,
+        "validation_summaries": [
+            f"Redacted {count} {pii_type}" for pii_type, count in counts.items()
+        ],
+    }
+
+
+GUARDS = {
+    "jailbreak-detector": lambda prompt: detect(JAILBREAK_PATTERNS, prompt),
+    "prompt-injection-detector": lambda prompt: detect(
+        PROMPT_INJECTION_PATTERNS, prompt
+    ),
+    "pii-redactor": lambda prompt: redact(PII_PATTERNS, prompt),
+    "secrets-redactor": lambda prompt: redact(SECRET_PATTERNS, prompt),
+}
+
+
+def create_app(config: EmulatorConfig, api_key: str | None = None) -> FastAPI:
+    app = FastAPI(title="Soteria emulator")
+    faults = FaultInjector(config)
+
+    @app.get("/health")
+    async def health() -> dict:
+        return {"status": "ok"}
+
+    @app.post("/process")
+    async def process(request: Request) -> Any:
+        if api_key is not None and request.headers.get("X-API-Key") != api_key:
+            return JSONResponse(status_code=401, content={"detail": "Invalid API key"})
+
+        body = await request.json()
+        if error := faults.injected_error({"detail": "injected failure"}):
+            return error
+        await faults.delay()
+
+        guard = GUARDS.get(body.get("guard_name"))
+        if guard is None:
+            return JSONResponse(
+                status_code=404,
+                content={"detail": f"Unknown guard '{body.get('guard_name')}'"},
+            )
+        return guard(str(body.get("prompt", "")))
+
+    return app
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    add_common_arguments(parser, "SOTERIA_EMULATOR_", DEFAULT_PORT)
+    parser.add_argument(
+        "--api-key",
+        default=os.getenv("SOTERIA_EMULATOR_API_KEY"),
+        help="only accept requests with this X-API-Key",
+    )
+    args = parser.parse_args(argv)
+    config = config_from_arguments(args)
+
+    uvicorn.run(
+        create_app(config, api_key=args.api_key),
+        host=config.host,
+        port=config.port,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,18 @@
+import os
+import time
+
+import ollama
+from dotenv import load_dotenv
 from langchain_ollama import OllamaLLM
 
+load_dotenv()
+
+LLM_MODEL = "llama3.2"
+# e.g. http://127.0.0.1:11435 for the local emulator (python -m emulators.ollama)
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+# How long Ollama keeps the model loaded after the last request, e.g. "30m" ("-1" keeps it loaded)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
 DEFAULT_CHAT_TEMPLATE = """
 Answer the question below based on our conversation history
 
@@ -15,7 +28,25 @@ Answer:
 
 def init_model() -> OllamaLLM:
     try:
-        return OllamaLLM(model="llama3.2")
+        return OllamaLLM(
+            model=LLM_MODEL, base_url=OLLAMA_BASE_URL, keep_alive=OLLAMA_KEEP_ALIVE
+        )
     except Exception as error:
         print(f"Error Initializing the LLM.\nDetails: {error}")
         exit()
+
+
+async def warm_up() -> dict[str, float]:
+    """
+    Loads the chat model into Ollama and returns how long each step took (in milliseconds).
+    Raises if Ollama cannot be reached or the model is missing.
+    """
+    started = time.perf_counter()
+
+    # An empty prompt loads the model without generating anything
+    await ollama.AsyncClient(host=OLLAMA_BASE_URL).generate(
+        model=LLM_MODEL, prompt="", keep_alive=OLLAMA_KEEP_ALIVE
+    )
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    return {"chat_model_ms": elapsed_ms, "total_ms": elapsed_ms}
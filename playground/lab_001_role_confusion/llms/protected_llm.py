@@ -10,8 +10,10 @@ import os
 load_dotenv()
 
 soteria_api_key=os.getenv("SOTERIA_API_KEY")
+# e.g. http://127.0.0.1:8787 for the local emulator (python -m emulators.soteria)
+soteria_api_base=os.getenv("SOTERIA_API_BASE", "https://api.soteriainfra.com")
 
-soteria_sdk.configure(api_key=soteria_api_key, api_base="https://api.soteriainfra.com")
+soteria_sdk.configure(api_key=soteria_api_key, api_base=soteria_api_base)
 
 chat_prompt_template = ChatPromptTemplate.from_template(DEFAULT_CHAT_TEMPLATE)
 chain = chat_prompt_template | init_model()
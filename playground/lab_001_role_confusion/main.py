@@ -1,11 +1,15 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 import soteria_sdk
 from pydantic import ValidationError
 
 # Import the separate implementations' specific functions/objects
 from llms import protected_llm, vulnerable_llm, DEFAULT_CHAT_TEMPLATE
+from llms.core import warm_up
 from websocket_primitives import WSMessage, WSToggleMessage, WSChatMessage
 
 
@@ -13,7 +17,34 @@ from websocket_primitives import WSMessage, WSToggleMessage, WSChatMessage
 contexts: dict[WebSocket, str] = {}
 protection_modes: dict[WebSocket, bool] = {}
 
-app = FastAPI()
+# Reported by /readyz
+startup_status = {"ready": False, "attempts": 0, "error": None, "timings": {}}
+WARMUP_RETRY_SECONDS = 10
+
+
+async def run_warm_up():
+    while not startup_status["ready"]:
+        startup_status["attempts"] += 1
+        try:
+            startup_status["timings"] = await warm_up()
+            startup_status["error"] = None
+            startup_status["ready"] = True
+            print(f"[STARTUP] Warm-up finished: {startup_status['timings']}")
+        except Exception as error:
+            startup_status["error"] = str(error)
+            print(f"[STARTUP] Warm-up attempt {startup_status['attempts']} failed: {error}. Retrying in {WARMUP_RETRY_SECONDS}s...")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so /healthz answers while the model loads
+    warm_up_task = asyncio.create_task(run_warm_up())
+    yield
+    warm_up_task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Serve static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -24,6 +55,26 @@ async def serve_index():
     return FileResponse("static/index.html")
 
 
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    if startup_status["ready"]:
+        return {"status": "ready", "timings": startup_status["timings"]}
+
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "warming_up",
+            "attempts": startup_status["attempts"],
+            "error": startup_status["error"],
+        },
+    )
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
@@ -15,10 +15,12 @@ load_dotenv()
 
 # --- Soteria SDK Configuration ---
 soteria_api_key = os.getenv("SOTERIA_API_KEY")
+# e.g. http://127.0.0.1:8787 for the local emulator (python -m emulators.soteria)
+soteria_api_base = os.getenv("SOTERIA_API_BASE", "https://api.soteriainfra.com")
 if not soteria_api_key:
     print("WARNING: SOTERIA_API_KEY environment variable not set. Soteria protection will not be active.")
 else:
-    soteria_sdk.configure(api_key=soteria_api_key, api_base="https://api.soteriainfra.com")
+    soteria_sdk.configure(api_key=soteria_api_key, api_base=soteria_api_base)
 
 
 HISTORY_DIR_PROTECTED = "json_chat_histories_auto_id_protected"
@@ -32,8 +34,13 @@ def get_session_history_protected(session_id: str, user_id: str):
     file_path = os.path.join(HISTORY_DIR_PROTECTED, file_name)
     return FileChatMessageHistory(file_path=file_path)
 
+# e.g. http://127.0.0.1:11435 for the local emulator (python -m emulators.ollama)
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+# How long Ollama keeps the model loaded after the last request, e.g. "30m" ("-1" keeps it loaded)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
 try:
-    model_protected = OllamaLLM(model="llama3.2")
+    model_protected = OllamaLLM(model="llama3.2", base_url=OLLAMA_BASE_URL, keep_alive=OLLAMA_KEEP_ALIVE)
     parser_protected = StrOutputParser()
 except Exception as e:
     print(f"Error initializing OllamaLLM or StrOutputParser for protected mode: {e}")
@@ -7,6 +7,9 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, Huma
 from langchain_core.messages import SystemMessage
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.runnables import ConfigurableFieldSpec
+from dotenv import load_dotenv
+
+load_dotenv()
 
 # Define a directory to store your JSON history files for vulnerable mode
 HISTORY_DIR_VULNERABLE = "json_chat_histories_auto_id_vulnerable"
@@ -21,8 +24,13 @@ def get_session_history_vulnerable(session_id: str, user_id: str):
     return FileChatMessageHistory(file_path=file_path)
 
 
+# e.g. http://127.0.0.1:11435 for the local emulator (python -m emulators.ollama)
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+# How long Ollama keeps the model loaded after the last request, e.g. "30m" ("-1" keeps it loaded)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
 try:
-    model_vulnerable = OllamaLLM(model="llama3.2")
+    model_vulnerable = OllamaLLM(model="llama3.2", base_url=OLLAMA_BASE_URL, keep_alive=OLLAMA_KEEP_ALIVE)
     parser_vulnerable = StrOutputParser()
 except Exception as e:
     print(f"Error initializing OllamaLLM or StrOutputParser for vulnerable mode: {e}")
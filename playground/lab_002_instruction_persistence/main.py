@@ -1,16 +1,62 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
+from contextlib import asynccontextmanager
+import asyncio
 import json
+import time
 import uuid
 from typing import Dict
 import uvicorn
 import soteria_sdk
 
-from llms.protected_llm import protected_chat_handler
-from llms.vulnerable_llm import runnable_with_history_vulnerable
+from llms.protected_llm import protected_chat_handler, model_protected
+from llms.vulnerable_llm import runnable_with_history_vulnerable, model_vulnerable
 
-app = FastAPI()
+# Reported by /readyz
+startup_status = {"ready": False, "attempts": 0, "error": None, "timings": {}}
+WARMUP_RETRY_SECONDS = 10
+
+
+async def warm_up() -> dict:
+    """
+    Loads the chat model into Ollama and returns how long it took (in milliseconds).
+    Both modes use the same model, so loading it once warms both.
+    """
+    model = model_protected or model_vulnerable
+    if model is None:
+        raise RuntimeError("No LLM could be initialized")
+
+    started = time.perf_counter()
+    # An empty prompt loads the model without generating anything
+    await model._async_client.generate(model=model.model, prompt="", keep_alive=model.keep_alive)
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    return {"chat_model_ms": elapsed_ms, "total_ms": elapsed_ms}
+
+
+async def run_warm_up():
+    while not startup_status["ready"]:
+        startup_status["attempts"] += 1
+        try:
+            startup_status["timings"] = await warm_up()
+            startup_status["error"] = None
+            startup_status["ready"] = True
+            print(f"Warm-up finished: {startup_status['timings']}")
+        except Exception as e:
+            startup_status["error"] = str(e)
+            print(f"Warm-up attempt {startup_status['attempts']} failed: {e}. Retrying in {WARMUP_RETRY_SECONDS}s...")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so /healthz answers while the model loads
+    warm_up_task = asyncio.create_task(run_warm_up())
+    yield
+    warm_up_task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -18,6 +64,19 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 async def read_index():
     return FileResponse('static/index.html')
 
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    if startup_status["ready"]:
+        return {"status": "ready", "timings": startup_status["timings"]}
+    return JSONResponse(
+        status_code=503,
+        content={"status": "warming_up", "attempts": startup_status["attempts"], "error": startup_status["error"]},
+    )
+
 class ConnectionState:
     def __init__(self):
         self.session_id = str(uuid.uuid4())
@@ -1,11 +1,15 @@
+import asyncio
 import os
 import shutil
+import uuid
+from pathlib import Path
 
 from fastapi import status, HTTPException, UploadFile
+from werkzeug.utils import secure_filename
 
 from config import settings
 from custom_loggers import DEFAULT_LOGGER
-from llms import protected_llm, vulnerable_llm
+from ingestion_jobs import QueueFullError, ingestion_queue
 from websocket.handler import protection_modes
 
 
@@ -13,70 +17,149 @@ async def handle_document_upload(
     file: UploadFile,
 ):  # Make this async for better FastAPI integration
     """
-    Handles document uploads via HTTP POST. The uploaded JSON file is saved temporarily,
-    embedded into the vector database, and then deleted.
+    Handles document uploads via HTTP POST. The uploaded JSON file is saved temporarily
+    and queued for embedding into the vector database; the response carries the job id
+    to follow at `GET /jobs/{job_id}` or over the WebSocket.
     """
     if not file.filename:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="No file uploaded."
         )
 
-    temp_file_path = settings.TEMP_FOLDER / file.filename
+    temp_file_path = temp_path_for(file)
 
     try:
-        # Save the uploaded file temporarily
-        with temp_file_path.open("wb") as destination:
-            shutil.copyfileobj(file.file, destination)
+        await save_upload(file, temp_file_path)
 
-        is_protected = True
-        if protection_modes:
-            is_protected = list(protection_modes.values())[-1]
+        is_protected = current_protection_mode()
 
         DEFAULT_LOGGER.debug(
-            f"Processing file '{file.filename}' with protection mode: {is_protected}"
+            f"Queueing file '{file.filename}' with protection mode: {is_protected}"
         )
+        job = ingestion_queue.submit(temp_file_path, file.filename, is_protected)
 
-        if is_protected:
-            embedding_result = protected_llm.process_and_embed_file_protected(
-                temp_file_path
-            )
-        else:
-            embedding_result = vulnerable_llm.process_and_embed_file(temp_file_path)
-
-        if not embedding_result["success"]:
-            detail_message = embedding_result.get("error", "Embedding failed")
-            if embedding_result.get("details"):
-                detail_message += f" Details: {embedding_result['details']}"
-            DEFAULT_LOGGER.debug(f"Document embedding failed: {detail_message}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=detail_message
-            )
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "filename": file.filename,
+            "message": "File uploaded and queued for embedding.",
+        }
+    except QueueFullError as e:
+        DEFAULT_LOGGER.debug(f"Rejected upload of '{file.filename}': {e}")
+        remove_temp_file(temp_file_path)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many uploads in progress, try again later. ({e})",
+        )
+    except Exception as e:
+        DEFAULT_LOGGER.error(
+            f"An unexpected error occurred during file upload for '{file.filename}': {e}",
+            exc_info=True,
+        )
+        remove_temp_file(temp_file_path)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process file '{file.filename}': {e}",
+        )
+
+
+async def handle_documents_upload(files: list[UploadFile]):
+    """
+    Handles bulk uploads via HTTP POST: several JSON files and/or zip/tar archives
+    of JSON files. Everything is queued as one ingestion job, embedded with a
+    single commit, and the job reports a result per file.
+    """
+    files = [file for file in files if file.filename]
+    if not files:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="No files uploaded."
+        )
+
+    uploads = [(temp_path_for(file), file.filename) for file in files]
+    filenames = [filename for _, filename in uploads]
+
+    try:
+        for file, (temp_file_path, _) in zip(files, uploads):
+            await save_upload(file, temp_file_path)
+
+        is_protected = current_protection_mode()
 
         DEFAULT_LOGGER.debug(
-            f"Document '{file.filename}' uploaded and embedded successfully."
+            f"Queueing {len(uploads)} files with protection mode: {is_protected}"
         )
+        job = ingestion_queue.submit_files(uploads, is_protected)
+
         return {
-            "filename": file.filename,
-            "message": "File uploaded and embedded successfully.",
+            "job_id": job.id,
+            "status": job.status,
+            "filenames": filenames,
+            "message": "Files uploaded and queued for embedding.",
         }
-    except HTTPException:
-        raise  # Re-raise HTTPExceptions
+    except QueueFullError as e:
+        DEFAULT_LOGGER.debug(f"Rejected bulk upload of {filenames}: {e}")
+        for temp_file_path, _ in uploads:
+            remove_temp_file(temp_file_path)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many uploads in progress, try again later. ({e})",
+        )
     except Exception as e:
         DEFAULT_LOGGER.error(
-            f"An unexpected error occurred during file upload or embedding for '{file.filename}': {e}",
+            f"An unexpected error occurred during bulk upload of {filenames}: {e}",
             exc_info=True,
         )
+        for temp_file_path, _ in uploads:
+            remove_temp_file(temp_file_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to process file '{file.filename}': {e}",
+            detail=f"Failed to process files {filenames}: {e}",
+        )
+
+
+async def handle_job_status(job_id: str):
+    """
+    Returns the status and progress of an ingestion job.
+    """
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Job '{job_id}' not found."
         )
-    finally:
-        # Ensure the temporary file is removed after processing.
-        if temp_file_path.exists():
-            try:
-                os.remove(temp_file_path)
-                DEFAULT_LOGGER.debug(f"Temporary file '{temp_file_path}' removed.")
-            except Exception as e:
-                DEFAULT_LOGGER.error(
-                    f"Error removing temporary file '{temp_file_path}': {e}"
-                )
+    return job.to_dict()
+
+
+def temp_path_for(file: UploadFile) -> Path:
+    # A unique name, so concurrent uploads of the same file don't overwrite each other
+    return settings.TEMP_FOLDER / f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+
+
+async def save_upload(file: UploadFile, temp_file_path: Path) -> None:
+    """
+    Saves the uploaded file temporarily, off the event loop.
+    """
+
+    def save() -> None:
+        with temp_file_path.open("wb") as destination:
+            shutil.copyfileobj(file.file, destination)
+
+    await asyncio.to_thread(save)
+
+
+def current_protection_mode() -> bool:
+    """
+    Uploads use the protection mode last set by a connected client (protected by default).
+    """
+    if protection_modes:
+        return list(protection_modes.values())[-1]
+    return True
+
+
+def remove_temp_file(temp_file_path: Path) -> None:
+    if temp_file_path.exists():
+        try:
+            os.remove(temp_file_path)
+            DEFAULT_LOGGER.debug(f"Temporary file '{temp_file_path}' removed.")
+        except Exception as e:
+            DEFAULT_LOGGER.error(
+                f"Error removing temporary file '{temp_file_path}': {e}"
+            )
@@ -0,0 +1,140 @@
+"""
+Writes a synthetic dataset shaped like `data/config.json` (an array of flat
+contact records) for the ingestion benchmarks:
+
+    python -m benchmarks.generate_dataset --records 1000000 --pii-density 0.5 \
+        --output /tmp/contacts.json
+
+`--pii-density` is the share of contact fields holding PII (the others are
+null) and of `notes` mentioning a person and a phone number in free text,
+which only the remote redactor can judge. The same arguments always give the
+same file.
+"""
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Any, Iterator, TextIO
+
+FIRST_NAMES = [
+    "Alice",
+    "Bob",
+    "Charlie",
+    "Diana",
+    "Ethan",
+    "Fiona",
+    "George",
+    "Hannah",
+    "Ivan",
+    "Julia",
+    "Kevin",
+    "Laura",
+    "Marco",
+    "Nina",
+    "Oscar",
+    "Priya",
+]
+LAST_NAMES = [
+    "Smith",
+    "Johnson",
+    "Brown",
+    "Garcia",
+    "Miller",
+    "Davis",
+    "Martinez",
+    "Lopez",
+    "Wilson",
+    "Anderson",
+    "Taylor",
+    "Thomas",
+    "Moore",
+    "Jackson",
+    "Martin",
+    "Lee",
+]
+TOPICS = [
+    "requested a password reset",
+    "asked to update the billing address",
+    "reported a failed login from a new device",
+    "renewed the annual subscription",
+    "opted out of the marketing emails",
+    "escalated a delayed shipment",
+]
+
+FORMATS = ("json", "jsonl")
+
+
+def generate_records(count: int, pii_density: float, seed: int) -> Iterator[dict]:
+    rng = random.Random(seed)
+
+    def pii(value: Any) -> Any:
+        return value if rng.random() < pii_density else None
+
+    for index in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        handle = f"{first.lower()}.{last.lower()}{index}"
+        topic = rng.choice(TOPICS)
+        if rng.random() < pii_density:
+            contact = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            notes = f"{topic.capitalize()}, call back {contact} on 555-{rng.randrange(1000, 10000)}."
+        else:
+            notes = f"Customer {topic} on ticket {rng.randrange(10**6)}."
+
+        yield {
+            "name": pii(f"{first} {last}"),
+            "email": pii(f"{handle}@example.com"),
+            "phone_number": pii(f"+1-555-100-{index % 10000:04d}"),
+            "business_email": pii(f"{handle}@bizcorp.com"),
+            "work_phone": pii(f"+1-555-200-{index % 10000:04d}"),
+            "ip_address": pii(
+                f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}"
+            ),
+            "notes": notes,
+        }
+
+
+def write_dataset(records: Iterator[dict], out: TextIO, file_format: str) -> int:
+    """
+    Streams the records to `out`, as an indented JSON array like
+    `data/config.json` or as JSON Lines, and returns how many were written.
+    """
+    count = 0
+    if file_format == "jsonl":
+        for record in records:
+            out.write(json.dumps(record) + "\n")
+            count += 1
+        return count
+
+    out.write("[")
+    for record in records:
+        out.write(",\n  " if count else "\n  ")
+        out.write(json.dumps(record, indent=2).replace("\n", "\n  "))
+        count += 1
+    out.write("\n]\n" if count else "]\n")
+    return count
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--pii-density", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=FORMATS, default="json")
+    parser.add_argument("--output", type=Path, required=True)
+    args = parser.parse_args(argv)
+
+    if args.records < 0:
+        parser.error("--records must not be negative")
+    if not 0.0 <= args.pii_density <= 1.0:
+        parser.error("--pii-density must be between 0 and 1")
+
+    records = generate_records(args.records, args.pii_density, args.seed)
+    with args.output.open("w", encoding="utf-8") as out:
+        count = write_dataset(records, out, args.format)
+    print(f"Wrote {count} records to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
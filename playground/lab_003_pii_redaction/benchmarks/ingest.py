@@ -0,0 +1,221 @@
+"""
+Times the ingestion of a dataset (see `benchmarks.generate_dataset`) through
+the vulnerable or protected pipeline, without Ollama or Soteria:
+
+    python -m benchmarks.ingest /tmp/contacts.json --pipeline protected \
+        --output benchmarks.jsonl
+
+Chunks are embedded by a deterministic stub and the PII scan is a stub that
+returns its input, each with an optional simulated latency. Everything is
+written to a fresh temporary Chroma store, so every run starts cold.
+
+The result is printed as JSON, and appended as one line to `--output`:
+records per second, peak RSS and the seconds spent in each stage. `read`,
+`parse`, `clean`, `scan`, `render` and `split` run one after another on the
+ingestion thread. `embed` and `persist` are summed over the batches, which
+are embedded concurrently, so they can add up to more than the wall time.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import platform
+import resource
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import settings
+from custom_loggers import DEFAULT_LOGGER, LLM_LOGGER
+from llms import embed, protected_embed
+from llms.clients import close_clients, get_clients
+from llms.embedding_cache import CachedEmbeddings
+from llms.stage_timing import StageTimer, stage_timer
+
+PIPELINES = ("vulnerable", "protected")
+PRODUCER_STAGES = ("read", "parse", "clean", "scan", "render", "split")
+
+
+class StubEmbeddings(Embeddings):
+    """
+    Unit vectors seeded by the SHA-256 of the text, so the same text always
+    gets the same vector, optionally waiting `latency` seconds per request.
+    """
+
+    def __init__(self, dimensions: int, latency: float = 0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    def _vector(self, text: str) -> list[float]:
+        seed = hashlib.sha256(text.encode("utf-8")).digest()
+        vector = np.random.default_rng(list(seed)).standard_normal(self.dimensions)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+
+def stub_scan(latency: float):
+    def scan(prompt: str) -> str:
+        if latency:
+            time.sleep(latency)
+        return prompt
+
+    return scan
+
+
+@contextmanager
+def isolated_store(work_dir: Path) -> Iterator[None]:
+    """
+    Points Chroma and the embedding and PII caches at `work_dir`.
+    """
+    saved = (
+        settings.CHROMA_PATH,
+        settings.EMBEDDING_CACHE_PATH,
+        settings.PII_CACHE_PATH,
+    )
+    settings.CHROMA_PATH = work_dir / "chroma"
+    settings.EMBEDDING_CACHE_PATH = work_dir / "embedding_cache.sqlite3"
+    settings.PII_CACHE_PATH = work_dir / "pii_cache.sqlite3"
+    settings.CHROMA_PATH.mkdir()
+    try:
+        yield
+    finally:
+        asyncio.run(close_clients())
+        settings.CHROMA_PATH, settings.EMBEDDING_CACHE_PATH, settings.PII_CACHE_PATH = (
+            saved
+        )
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+def run_benchmark(
+    dataset: Path,
+    pipeline: str,
+    dimensions: int,
+    embed_latency: float,
+    scan_latency: float,
+) -> dict:
+    clients = get_clients()
+    clients.embedding = CachedEmbeddings(
+        StubEmbeddings(dimensions, embed_latency),
+        model=f"stub-{dimensions}",
+        store=clients.embedding_cache,
+    )
+    if pipeline == "protected":
+        # Any key makes `scan_text` scan, through the stub instead of Soteria
+        settings.SOTERIA_API_KEY = "benchmark"
+        protected_embed.scan_pii_with_soteria = stub_scan(scan_latency)
+        embed_chunks = protected_embed.embed_chunks
+    else:
+        embed_chunks = embed.embed_chunks
+
+    baseline_rss = peak_rss_mb()
+    timer = StageTimer()
+    token = stage_timer.set(timer)
+    started = time.perf_counter()
+    try:
+        stats = embed_chunks(dataset, dataset.name)
+    finally:
+        stage_timer.reset(token)
+    seconds = time.perf_counter() - started
+
+    if stats is None:
+        raise RuntimeError(f"Could not ingest {dataset}, see the log above")
+
+    records = stats.records_added + stats.records_updated + stats.records_unchanged
+    stages = {
+        stage: round(timer.seconds.get(stage, 0.0), 3) for stage in PRODUCER_STAGES
+    }
+    stages["embed"] = round(stats.embed_seconds, 3)
+    stages["persist"] = round(stats.write_seconds + stats.commit_seconds, 3)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "dataset": str(dataset),
+        "dataset_bytes": dataset.stat().st_size,
+        "pipeline": pipeline,
+        "records": records,
+        "chunks": stats.chunks,
+        "seconds": round(seconds, 3),
+        "records_per_second": round(records / seconds, 1) if seconds else 0.0,
+        "chunks_per_second": round(stats.chunks / seconds, 1) if seconds else 0.0,
+        "baseline_rss_mb": round(baseline_rss, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "stages": stages,
+        "chars_saved": stats.chars_saved,
+        "tokens_saved": stats.tokens_saved,
+        "settings": {
+            "INGEST_BATCH_SIZE": settings.INGEST_BATCH_SIZE,
+            "CHUNK_TARGET_CHARS": settings.CHUNK_TARGET_CHARS,
+            "RECORD_RENDERING": settings.RECORD_RENDERING,
+            "EMBED_BATCH_SIZE": settings.EMBED_BATCH_SIZE,
+            "EMBED_MAX_CONCURRENCY": settings.EMBED_MAX_CONCURRENCY,
+            "PII_SCAN_MAX_CONCURRENCY": settings.PII_SCAN_MAX_CONCURRENCY,
+        },
+        "stub": {
+            "embedding_dimensions": dimensions,
+            "embed_latency_ms": embed_latency * 1000,
+            "scan_latency_ms": scan_latency * 1000 if pipeline == "protected" else None,
+        },
+        "python": platform.python_version(),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("dataset", type=Path)
+    parser.add_argument("--pipeline", choices=PIPELINES, default="vulnerable")
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--scan-latency-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--output", type=Path, help="JSON Lines file the result is appended to"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="keep the per-batch logs"
+    )
+    args = parser.parse_args(argv)
+
+    if not args.dataset.is_file():
+        parser.error(f"{args.dataset} does not exist")
+    if not args.verbose:
+        # Per-batch log lines would be timed as part of the stages
+        DEFAULT_LOGGER.setLevel(logging.WARNING)
+        LLM_LOGGER.setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix="ingest-benchmark-") as work_dir:
+        with isolated_store(Path(work_dir)):
+            result = run_benchmark(
+                args.dataset,
+                args.pipeline,
+                args.dimensions,
+                args.embed_latency_ms / 1000,
+                args.scan_latency_ms / 1000,
+            )
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with args.output.open("a", encoding="utf-8") as out:
+            out.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field, computed_field
@@ -13,19 +14,88 @@ class Settings(BaseSettings):
 
     LLM_MODEL: str = Field("llama3.2")
     SOTERIA_API_KEY: str | None = None
+    # e.g. http://127.0.0.1:8787 for the local emulator (python -m emulators.soteria)
+    SOTERIA_API_BASE: str = "https://api.soteriainfra.com"
     BASE_DIR: Path = Path(__file__).parent.resolve()
 
     CHROMA_PATH: Path = "chroma"
     COLLECTION_NAME: str = "local-rag"
     TEXT_EMBEDDING_MODEL: str = "nomic-embed-text"
+    EMBEDDING_CACHE_PATH: Path = "embedding_cache.sqlite3"
+    PII_CACHE_PATH: Path = "pii_cache.sqlite3"
+
+    # JSON records parsed, split and embedded together while streaming an upload
+    INGEST_BATCH_SIZE: int = 256
+    # Records are packed into chunks of about this many characters, larger records are
+    # split between keys (RETRIEVAL_TOP_K chunks fit the CONTEXT_TOKEN_BUDGET)
+    CHUNK_TARGET_CHARS: int = 1500
+    # How records are written into chunks: indented JSON, or `key: value` lines that
+    # take fewer characters and tokens to embed and prompt (the JSON is kept for display)
+    RECORD_RENDERING: Literal["json", "compact"] = "compact"
+    # Chunks per embedding request, and embedding requests to Ollama in flight per upload
+    EMBED_BATCH_SIZE: int = 64
+    EMBED_MAX_CONCURRENCY: int = 4
+    # Records scanned for PII at the same time per protected upload
+    PII_SCAN_MAX_CONCURRENCY: int = 8
+    # Failed scans (e.g. 429s or connection errors) are retried after 0.5 s, 1 s, ...;
+    # a string that still cannot be scanned fails its file instead of being stored unscanned
+    PII_SCAN_RETRIES: int = 3
+    PII_SCAN_RETRY_BACKOFF: float = 0.5
+    # Uploads embedded at the same time, and uploads accepted while others are queued or running
+    INGEST_MAX_WORKERS: int = 2
+    INGEST_MAX_PENDING_JOBS: int = 16
+
+    # e.g. http://127.0.0.1:11435 for the local emulator (python -m emulators.ollama)
+    OLLAMA_BASE_URL: str = "http://localhost:11434"
+    OLLAMA_MAX_CONNECTIONS: int = 20
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    # Seconds Ollama keeps the models loaded after the last request (-1 keeps them loaded)
+    OLLAMA_KEEP_ALIVE: int = 1800
+    WARMUP_RETRY_SECONDS: float = 10
+
+    RETRIEVAL_MAX_WORKERS: int = 5
+    # single: one vector search, multi: LLM query rewriting (MultiQueryRetriever),
+    # adaptive: one vector search, rewriting only when its best score is below ADAPTIVE_MIN_SCORE
+    RETRIEVAL_MODE: Literal["single", "multi", "adaptive"] = "multi"
+    ADAPTIVE_MIN_SCORE: float = 0.6
+    # Fuse BM25 lexical results with the vector results (reciprocal rank fusion)
+    HYBRID_RETRIEVAL: bool = True
+    LEXICAL_TOP_K: int = 4
+    # At most RETRIEVAL_TOP_K chunks scoring at least RETRIEVAL_MIN_SCORE reach the answer prompt.
+    # Hybrid results are not cut, they keep the order of the fusion
+    RETRIEVAL_TOP_K: int = 4
+    RETRIEVAL_MIN_SCORE: float = 0.3
+    # Token budget for the retrieved context in the answer prompt, estimated for LLM_MODEL
+    CONTEXT_TOKEN_BUDGET: int = 2048
+    CONTEXT_CHARS_PER_TOKEN: float = 3.5
+    # Answer questions naming a record and a field ("what is Bob Johnson's work phone")
+    # straight from the field index, without calling the LLM
+    FIELD_LOOKUP_ENABLED: bool = True
+
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_DISTANCE: float = 0.05
+    ANSWER_CACHE_MAX_ENTRIES: int = 256
+    ANSWER_CACHE_TTL_SECONDS: float = 3600
 
     SERVER_HOST: str = "0.0.0.0"
     SERVER_PORT: int = 8000
 
+    CHAT_MAX_CONCURRENCY: int = 4
+
     @computed_field
     @property
     def TEMP_FOLDER(self) -> Path:
         return self.BASE_DIR / ".temp"
 
+    @computed_field
+    @property
+    def LEXICAL_INDEX_PATH(self) -> Path:
+        return Path(self.CHROMA_PATH) / "lexical_index.sqlite3"
+
+    @computed_field
+    @property
+    def FIELD_INDEX_PATH(self) -> Path:
+        return Path(self.CHROMA_PATH) / "field_index.sqlite3"
+
 
 settings = Settings()  # type: ignore
@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Callable, Literal
+
+from config import settings
+from custom_loggers import DEFAULT_LOGGER
+from llms import protected_llm, vulnerable_llm
+from llms.chunk_writer import WriteStats, progress_listener
+
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+# Minimum seconds between two progress notifications for the same job
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+
+class QueueFullError(Exception):
+    pass
+
+
+@dataclass
+class IngestionJob:
+    id: str
+    filename: str
+    protected: bool
+    status: JobStatus = "queued"
+    chunks_written: int = 0
+    message: str | None = None
+    error: str | None = None
+    stats: dict | None = None
+    # Per-file results of a bulk upload
+    files: list[dict] | None = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class IngestionQueue:
+    """
+    Runs the copy -> PII scan -> split -> embed pipeline for uploaded files on
+    a bounded pool of worker threads, so uploads never block the event loop.
+    Listeners are called (from the worker threads) whenever a job changes.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, max_finished: int = 100):
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ingest"
+        )
+        self._jobs: OrderedDict[str, IngestionJob] = OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners: list[Callable[[IngestionJob], None]] = []
+
+    def add_listener(self, listener: Callable[[IngestionJob], None]) -> None:
+        self._listeners.append(listener)
+
+    def submit(self, file_path: Path, filename: str, protected: bool) -> IngestionJob:
+        """
+        Queues `file_path` for embedding. The file is removed once the job finishes.
+        Raises `QueueFullError` when `max_pending` jobs are already waiting or running.
+        """
+        if protected:
+            embed = partial(
+                protected_llm.process_and_embed_file_protected,
+                file_path,
+                source=filename,
+            )
+        else:
+            embed = partial(
+                vulnerable_llm.process_and_embed_file, file_path, source=filename
+            )
+        return self._submit(filename, protected, embed, [file_path])
+
+    def submit_files(
+        self, uploads: list[tuple[Path, str]], protected: bool
+    ) -> IngestionJob:
+        """
+        Queues several uploaded files and/or zip/tar archives, given as
+        (saved path, original file name), as one job with one commit.
+        The files are removed once the job finishes.
+        Raises `QueueFullError` when `max_pending` jobs are already waiting or running.
+        """
+        if protected:
+            embed = partial(protected_llm.process_and_embed_files_protected, uploads)
+        else:
+            embed = partial(vulnerable_llm.process_and_embed_files, uploads)
+        filename = ", ".join(filename for _, filename in uploads)
+        return self._submit(
+            filename, protected, embed, [file_path for file_path, _ in uploads]
+        )
+
+    def get(self, job_id: str) -> IngestionJob | None:
+        return self._jobs.get(job_id)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(
+        self,
+        filename: str,
+        protected: bool,
+        embed: Callable[[], dict],
+        file_paths: list[Path],
+    ) -> IngestionJob:
+        with self._lock:
+            unfinished = sum(
+                1 for job in self._jobs.values() if job.status in ("queued", "running")
+            )
+            if unfinished >= self.max_pending:
+                raise QueueFullError(
+                    f"{unfinished} ingestion jobs are already queued or running"
+                )
+
+            job = IngestionJob(
+                id=str(uuid.uuid4()), filename=filename, protected=protected
+            )
+            self._jobs[job.id] = job
+            self._forget_finished()
+
+        self._executor.submit(self._run, job, embed, file_paths)
+        self._notify(job)
+        return job
+
+    def _run(
+        self, job: IngestionJob, embed: Callable[[], dict], file_paths: list[Path]
+    ) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        self._notify(job)
+
+        last_notified = 0.0
+
+        def on_progress(stats: WriteStats) -> None:
+            nonlocal last_notified
+            job.chunks_written = stats.chunks
+            if time.monotonic() - last_notified >= PROGRESS_INTERVAL_SECONDS:
+                last_notified = time.monotonic()
+                self._notify(job)
+
+        token = progress_listener.set(on_progress)
+        try:
+            result = embed()
+
+            details = result.get("details") or {}
+            job.files = details.get("files")
+            if result["success"]:
+                job.status = "succeeded"
+                job.message = result.get("message")
+                job.stats = details.get("stats")
+            else:
+                job.status = "failed"
+                job.error = result.get("error", "Embedding failed")
+                if details.get("error"):
+                    job.error += f" Details: {details['error']}"
+
+        except Exception as e:
+            DEFAULT_LOGGER.error(f"Ingestion job {job.id} failed: {e}", exc_info=True)
+            job.status = "failed"
+            job.error = f"Failed to process file '{job.filename}': {e}"
+
+        finally:
+            progress_listener.reset(token)
+            job.finished_at = time.time()
+            for file_path in file_paths:
+                if file_path.exists():
+                    os.remove(file_path)
+
+        DEFAULT_LOGGER.debug(
+            f"Ingestion job {job.id} for '{job.filename}' finished: {job.status}"
+        )
+        self._notify(job)
+
+    def _notify(self, job: IngestionJob) -> None:
+        for listener in self._listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                DEFAULT_LOGGER.error(f"Ingestion job listener failed: {e}")
+
+    def _forget_finished(self) -> None:
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status in ("succeeded", "failed")
+        ]
+        for job_id in finished[: max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job_id]
+
+
+ingestion_queue = IngestionQueue(
+    max_workers=settings.INGEST_MAX_WORKERS,
+    max_pending=settings.INGEST_MAX_PENDING_JOBS,
+)
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from config import settings
+from custom_loggers import LLM_LOGGER
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    embedding: np.ndarray
+    answer: str
+    created_at: float
+    sources: list[dict] = field(default_factory=list)
+
+
+class SemanticAnswerCache:
+    """
+    An LRU/TTL cache of generated answers keyed by question embedding.
+    A question whose embedding is within `max_distance` (cosine distance) of
+    a cached question gets the cached answer back.
+    """
+
+    def __init__(self, max_distance: float, max_entries: int, ttl_seconds: float):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: OrderedDict[int, CachedAnswer] = OrderedDict()
+        self._next_key = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        """
+        Bumped on every invalidation, so answers computed against an older
+        collection are not stored.
+        """
+        return self._generation
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def lookup(self, embedding: list[float]) -> CachedAnswer | None:
+        """
+        Returns the cached answer for the closest question within `max_distance`.
+        """
+        vector = _normalize(embedding)
+
+        with self._lock:
+            self._evict_expired()
+
+            best_key, best_distance = None, self.max_distance
+            for key, entry in self._entries.items():
+                distance = 1.0 - float(np.dot(vector, entry.embedding))
+                if distance <= best_distance:
+                    best_key, best_distance = key, distance
+
+            if best_key is None:
+                self.misses += 1
+                LLM_LOGGER.debug(f"Answer cache miss (hit rate: {self.hit_rate:.2%})")
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            entry = self._entries[best_key]
+            LLM_LOGGER.debug(
+                f"Answer cache hit for '{entry.question}' at distance {best_distance:.4f} "
+                f"(hit rate: {self.hit_rate:.2%})"
+            )
+            return entry
+
+    def store(
+        self,
+        question: str,
+        embedding: list[float],
+        answer: str,
+        generation: int,
+        sources: list[dict] | None = None,
+    ) -> None:
+        """
+        Caches an answer and the scored sources it was generated from,
+        unless the collection changed since `generation`.
+        """
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            self._entries[self._next_key] = CachedAnswer(
+                question=question,
+                embedding=_normalize(embedding),
+                answer=answer,
+                created_at=time.monotonic(),
+                sources=sources or [],
+            )
+            self._next_key += 1
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """
+        Drops every cached answer. Called whenever the collection is written to.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+        LLM_LOGGER.debug("Answer cache invalidated")
+
+    def stats(self) -> dict:
+        """
+        Counters reported by `/readyz`.
+        """
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    def _evict_expired(self) -> None:
+        deadline = time.monotonic() - self.ttl_seconds
+        # LRU order follows access rather than age, so check every entry
+        for key in [k for k, e in self._entries.items() if e.created_at < deadline]:
+            del self._entries[key]
+
+
+def _normalize(embedding: list[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+answer_cache = SemanticAnswerCache(
+    max_distance=settings.ANSWER_CACHE_MAX_DISTANCE,
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,78 @@
+import io
+import lzma
+import tarfile
+import zipfile
+import zlib
+from pathlib import Path
+from typing import IO, Iterator, TextIO
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+# Raised for a corrupt or truncated archive (gzip and bz2 raise OSError)
+ARCHIVE_ERRORS = (
+    zipfile.BadZipFile,
+    tarfile.TarError,
+    EOFError,
+    OSError,
+    zlib.error,
+    lzma.LZMAError,
+)
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def iter_upload_members(
+    uploads: list[tuple[Path, str]],
+) -> Iterator[tuple[str, TextIO | Exception]]:
+    """
+    Yields the name and a text stream of every uploaded file, given as
+    (saved path, original file name). Zip and tar archives are expanded into
+    their files, which are read straight from the archive without extracting it.
+    Each stream is closed when the next file is requested.
+    An upload that cannot be read, e.g. a corrupt or truncated archive, is
+    yielded with the error instead of a stream, after the members read so far.
+    """
+    for file_path, filename in uploads:
+        try:
+            if is_archive(filename):
+                yield from _iter_archive(file_path, filename)
+            else:
+                with file_path.open("r", encoding="utf-8-sig", newline="") as f:
+                    yield filename, f
+        except ARCHIVE_ERRORS as e:
+            yield filename, e
+
+
+def _iter_archive(file_path: Path, filename: str) -> Iterator[tuple[str, TextIO]]:
+    """
+    Raises `zipfile.BadZipFile` or `tarfile.TarError` for a corrupt archive.
+    """
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(file_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or _is_hidden(info.filename):
+                    continue
+                member = archive.open(info)
+                with _text_stream(member) as f:
+                    yield info.filename, f
+        return
+
+    # Members are read in archive order, so compressed tars are decompressed once
+    with tarfile.open(file_path, "r:*") as archive:
+        for info in archive:
+            if not info.isfile() or _is_hidden(info.name):
+                continue
+            member = archive.extractfile(info)
+            with _text_stream(member) as f:
+                yield info.name, f
+
+
+def _text_stream(member: IO[bytes]) -> TextIO:
+    # newline="" leaves line endings inside quoted CSV fields to the csv module
+    return io.TextIOWrapper(member, encoding="utf-8-sig", newline="")
+
+
+def _is_hidden(name: str) -> bool:
+    # e.g. the __MACOSX/ resource forks and .DS_Store files macOS adds to zips
+    return name.startswith("__MACOSX/") or Path(name).name.startswith(".")
@@ -0,0 +1,387 @@
+import hashlib
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Any, Callable, Iterable, Iterator
+
+from langchain_core.documents import Document
+
+from custom_loggers import DEFAULT_LOGGER
+from llms.answer_cache import answer_cache
+from llms.clients import ClientRegistry
+from llms.json_stream import batched
+
+
+@dataclass
+class WriteStats:
+    chunks: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    batch_seconds: float = 0.0
+    # Summed over the batches, which are embedded concurrently
+    embed_seconds: float = 0.0
+    write_seconds: float = 0.0
+    commit_seconds: float = 0.0
+    chunks_unchanged: int = 0
+    chunks_removed: int = 0
+    records_added: int = 0
+    records_updated: int = 0
+    records_unchanged: int = 0
+    records_removed: int = 0
+    # Saved by compact record rendering in the chunks written, over JSON
+    chars_saved: int = 0
+    tokens_saved: int = 0
+
+    @property
+    def chunks_seen(self) -> int:
+        return self.chunks + self.chunks_unchanged
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    @property
+    def seconds_per_batch(self) -> float:
+        return self.batch_seconds / self.batches if self.batches else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "chunks": self.chunks,
+            "batches": self.batches,
+            "seconds": round(self.seconds, 3),
+            "chunks_per_second": round(self.chunks_per_second, 1),
+            "seconds_per_batch": round(self.seconds_per_batch, 3),
+            "embed_seconds": round(self.embed_seconds, 3),
+            "write_seconds": round(self.write_seconds, 3),
+            "commit_seconds": round(self.commit_seconds, 3),
+            "chunks_unchanged": self.chunks_unchanged,
+            "chunks_removed": self.chunks_removed,
+            "records_added": self.records_added,
+            "records_updated": self.records_updated,
+            "records_unchanged": self.records_unchanged,
+            "records_removed": self.records_removed,
+            "chars_saved": self.chars_saved,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+def chunk_id(source: str, item_index: Any, position: int, content: str) -> str:
+    """
+    A deterministic chunk id: the same chunk of the same record of the same
+    source always gets the same id, and any change to its content a new one.
+    """
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    key = f"{source}\x1f{item_index}\x1f{position}\x1f{content_hash}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def covered_records(metadata: dict) -> list[Any]:
+    """
+    The `item_index` of every record a chunk covers (`[None]` for a single
+    JSON object or primitive).
+    """
+    start = metadata.get("item_index")
+    if start is None:
+        return [None]
+    return list(range(start, metadata.get("item_index_end", start) + 1))
+
+
+@dataclass
+class SourceDiff:
+    """
+    Compares the chunks of a re-ingested source with the ones already stored,
+    by id. A chunk covers the records `item_index` to `item_index_end`; when
+    a chunk changes, every record it covers counts as changed.
+    """
+
+    existing: dict[str, list[Any]]
+    seen_ids: set[str] = field(default_factory=set)
+    seen_records: set[Any] = field(default_factory=set)
+    changed_records: set[Any] = field(default_factory=set)
+
+    def new_chunks(self, chunks: Iterable[Document]) -> Iterator[Document]:
+        """
+        Yields the chunks that are not stored yet.
+        """
+        for chunk in chunks:
+            records = covered_records(chunk.metadata)
+            self.seen_ids.add(chunk.id)
+            self.seen_records.update(records)
+            if chunk.id not in self.existing:
+                self.changed_records.update(records)
+                yield chunk
+
+    def stale_ids(self) -> list[str]:
+        return [chunk_id for chunk_id in self.existing if chunk_id not in self.seen_ids]
+
+    def update_stats(self, stats: WriteStats) -> None:
+        previous_records = set(chain.from_iterable(self.existing.values()))
+        stats.chunks_unchanged = len(self.seen_ids) - stats.chunks
+        stats.records_added = len(self.changed_records - previous_records)
+        stats.records_updated = len(self.changed_records & previous_records)
+        stats.records_unchanged = len(self.seen_records - self.changed_records)
+        stats.records_removed = len(previous_records - self.seen_records)
+
+
+# Called with the running totals after every written batch, e.g. to report job progress
+progress_listener: ContextVar[Callable[[WriteStats], None] | None] = ContextVar(
+    "progress_listener", default=None
+)
+
+
+class ChunkWriter:
+    """
+    Writes a stream of chunks to the vector database and the lexical and
+    field indexes.
+    Chunks are embedded in batches of `batch_size`, with at most
+    `max_concurrency` embedding requests to Ollama in flight, while the
+    registry's single writer thread writes the finished batches in order.
+    The whole upload is committed once at the end. If anything fails, the
+    chunks already written are removed again.
+
+    Chunks get deterministic ids (see `chunk_id`). When a `source` is given,
+    chunks already stored for it are not embedded again, and stored chunks
+    the new version of the source no longer contains are removed on commit.
+    """
+
+    def __init__(self, clients: ClientRegistry, batch_size: int, max_concurrency: int):
+        self.clients = clients
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+
+    def write(
+        self, chunk_batches: Iterable[list[Document]], source: str | None = None
+    ) -> WriteStats:
+        with self._embed_executor() as executor:
+            stats, written_ids, stale_ids = self._write_source(
+                executor, chunk_batches, source
+            )
+            started = time.perf_counter()
+            try:
+                self._commit(stale_ids, changed=bool(written_ids or stale_ids))
+            except BaseException:
+                self._rollback(written_ids)
+                raise
+            stats.commit_seconds = time.perf_counter() - started
+        return stats
+
+    def write_sources(
+        self, sources: Iterable[tuple[str, Iterable[list[Document]]]]
+    ) -> list[tuple[str, WriteStats | Exception]]:
+        """
+        Writes several sources, e.g. the files of a bulk upload, with one commit
+        at the end. A source that fails is rolled back on its own and reported
+        with its error, the other sources are still committed.
+        """
+        results: list[tuple[str, WriteStats | Exception]] = []
+        written_ids: list[str] = []
+        stale_ids: list[str] = []
+        # Running totals over all sources, reported to the progress listener
+        progress = WriteStats()
+
+        with self._embed_executor() as executor:
+            try:
+                for source, chunk_batches in sources:
+                    try:
+                        stats, written, stale = self._write_source(
+                            executor, chunk_batches, source, progress
+                        )
+                    except Exception as e:
+                        DEFAULT_LOGGER.error(f"Failed to write '{source}': {e}")
+                        results.append((source, e))
+                        continue
+                    results.append((source, stats))
+                    written_ids.extend(written)
+                    stale_ids.extend(stale)
+
+                # A source uploaded twice (e.g. also inside an archive) lists the same stale ids
+                stale_ids = list(dict.fromkeys(stale_ids))
+                self._commit(stale_ids, changed=bool(written_ids or stale_ids))
+            except BaseException:
+                self._rollback(written_ids)
+                raise
+
+        return results
+
+    def _embed_executor(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="embed"
+        )
+
+    def _write_source(
+        self,
+        executor: ThreadPoolExecutor,
+        chunk_batches: Iterable[list[Document]],
+        source: str | None,
+        progress: WriteStats | None = None,
+    ) -> tuple[WriteStats, list[str], list[str]]:
+        """
+        Embeds and writes the chunks of one source without committing.
+        Returns the stats, the ids written and the stored ids to remove on commit.
+        """
+        stats = WriteStats()
+        written_ids: list[str] = []
+        stale_ids: list[str] = []
+        pending: deque[tuple[list[Document], Future]] = deque()
+        started = time.perf_counter()
+
+        try:
+            diff = SourceDiff(self._stored_records(source)) if source else None
+            chunks = self._with_ids(chain.from_iterable(chunk_batches))
+            if diff is not None:
+                chunks = diff.new_chunks(chunks)
+
+            for batch in batched(chunks, self.batch_size):
+                pending.append((batch, executor.submit(self._embed, batch)))
+                # Wait for the oldest batch once the concurrency cap is reached
+                if len(pending) >= self.max_concurrency:
+                    written_ids.extend(self._write(*pending.popleft(), stats, progress))
+
+            while pending:
+                written_ids.extend(self._write(*pending.popleft(), stats, progress))
+
+            if diff is not None:
+                stale_ids = diff.stale_ids()
+                diff.update_stats(stats)
+                stats.chunks_removed = len(stale_ids)
+
+        except BaseException:
+            for _, future in pending:
+                future.cancel()
+            self._rollback(written_ids)
+            raise
+
+        stats.seconds = time.perf_counter() - started
+        DEFAULT_LOGGER.info(
+            f"Wrote {stats.chunks} chunks in {stats.batches} batches: "
+            f"{stats.chunks_per_second:.1f} chunks/s, {stats.seconds_per_batch:.3f} s/batch"
+        )
+        if stats.chars_saved:
+            DEFAULT_LOGGER.info(
+                f"Compact rendering saved {stats.chars_saved} characters "
+                f"(~{stats.tokens_saved} tokens) over JSON"
+            )
+        if source:
+            DEFAULT_LOGGER.info(
+                f"Records in '{source}': {stats.records_added} added, "
+                f"{stats.records_updated} updated, {stats.records_unchanged} unchanged, "
+                f"{stats.records_removed} removed"
+            )
+        return stats, written_ids, stale_ids
+
+    def _with_ids(self, chunks: Iterable[Document]) -> Iterator[Document]:
+        """
+        Sets a deterministic id on every chunk. A record's chunks are produced
+        consecutively, so their position is counted from the record's first chunk.
+        """
+        previous_record: tuple[Any, Any] | None = None
+        position = 0
+        for chunk in chunks:
+            record = (chunk.metadata.get("source"), chunk.metadata.get("item_index"))
+            position = position + 1 if record == previous_record else 0
+            previous_record = record
+            chunk.id = chunk_id(*record, position, chunk.page_content)
+            yield chunk
+
+    def _stored_records(self, source: str) -> dict[str, list[Any]]:
+        """
+        Returns the ids of the chunks stored for `source`, mapped to their records.
+        """
+        stored = self.clients.write_executor.submit(
+            self.clients.vector_db._collection.get,
+            where={"source": source},
+            include=["metadatas"],
+        ).result()
+        return {
+            stored_id: covered_records(metadata or {})
+            for stored_id, metadata in zip(stored["ids"], stored["metadatas"])
+        }
+
+    def _embed(self, batch: list[Document]) -> tuple[list[list[float]], float]:
+        started = time.perf_counter()
+        embeddings = self.clients.embedding.embed_documents(
+            [document.page_content for document in batch]
+        )
+        return embeddings, time.perf_counter() - started
+
+    def _write(
+        self,
+        batch: list[Document],
+        future: Future,
+        stats: WriteStats,
+        progress: WriteStats | None = None,
+    ) -> list[str]:
+        embeddings, embed_seconds = future.result()
+
+        for document in batch:
+            # Per-write statistics, kept out of the stored metadata
+            stats.chars_saved += document.metadata.pop("chars_saved", 0)
+            stats.tokens_saved += document.metadata.pop("tokens_saved", 0)
+
+        started = time.perf_counter()
+        ids = [document.id for document in batch]
+        self.clients.write_executor.submit(
+            self._upsert, ids, batch, embeddings
+        ).result()
+        write_seconds = time.perf_counter() - started
+
+        stats.chunks += len(batch)
+        stats.batches += 1
+        stats.batch_seconds += embed_seconds + write_seconds
+        stats.embed_seconds += embed_seconds
+        stats.write_seconds += write_seconds
+        DEFAULT_LOGGER.debug(
+            f"Batch {stats.batches}: {len(batch)} chunks embedded in {embed_seconds:.3f}s, "
+            f"written in {write_seconds:.3f}s"
+        )
+        if progress is not None:
+            progress.chunks += len(batch)
+            progress.batches += 1
+        if (listener := progress_listener.get()) is not None:
+            listener(progress if progress is not None else stats)
+        return ids
+
+    def _upsert(
+        self, ids: list[str], batch: list[Document], embeddings: list[list[float]]
+    ) -> None:
+        self.clients.vector_db._collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=[document.page_content for document in batch],
+            metadatas=[document.metadata for document in batch],
+        )
+        self.clients.lexical_index.add(ids, batch, commit=False)
+        self.clients.field_index.add(ids, batch, commit=False)
+
+    def _commit(self, stale_ids: list[str], changed: bool) -> None:
+        def commit() -> None:
+            if stale_ids:
+                self.clients.vector_db.delete(ids=stale_ids)
+                self.clients.lexical_index.delete(stale_ids)
+                self.clients.field_index.delete(stale_ids)
+            # Chroma persists every write itself, the lexical and field indexes commit here
+            self.clients.lexical_index.commit()
+            self.clients.field_index.commit()
+
+        self.clients.write_executor.submit(commit).result()
+        if changed:
+            answer_cache.invalidate()
+
+    def _rollback(self, written_ids: list[str]) -> None:
+        if written_ids:
+            DEFAULT_LOGGER.error(
+                f"Write failed, removing {len(written_ids)} chunks already written"
+            )
+            self._remove(written_ids)
+
+    def _remove(self, ids: list[str]) -> None:
+        def remove() -> None:
+            self.clients.vector_db.delete(ids=ids)
+            self.clients.lexical_index.delete(ids)
+            self.clients.field_index.delete(ids)
+
+        self.clients.write_executor.submit(remove).result()
+        answer_cache.invalidate()
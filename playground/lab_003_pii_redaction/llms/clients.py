@@ -0,0 +1,164 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import chromadb
+import httpx
+from langchain_community.vectorstores.chroma import Chroma
+from langchain_core.documents import Document
+from langchain_ollama import ChatOllama, OllamaEmbeddings
+
+from config import settings
+from custom_loggers import DEFAULT_LOGGER
+from llms.embedding_cache import CachedEmbeddings, EmbeddingCacheStore
+from llms.field_index import FieldIndex
+from llms.lexical_index import LexicalIndex
+from llms.pii_cache import PIIVerdictCache
+
+
+class ClientRegistry:
+    """
+    Holds the long-lived LLM, embedding and Chroma handles for this process.
+    The Ollama clients keep a pooled HTTP connection and the Chroma client
+    keeps the collection (SQLite + HNSW index) open between requests.
+    """
+
+    def __init__(self) -> None:
+        client_kwargs = {
+            "limits": httpx.Limits(
+                max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+            )
+        }
+
+        self.llm = ChatOllama(
+            model=settings.LLM_MODEL,
+            base_url=settings.OLLAMA_BASE_URL,
+            keep_alive=settings.OLLAMA_KEEP_ALIVE,
+            client_kwargs=client_kwargs,
+        )
+        self.ollama_embedding = OllamaEmbeddings(
+            model=settings.TEXT_EMBEDDING_MODEL,
+            base_url=settings.OLLAMA_BASE_URL,
+            keep_alive=settings.OLLAMA_KEEP_ALIVE,
+            client_kwargs=client_kwargs,
+        )
+        # Documents and queries are embedded through an on-disk cache
+        self.embedding_cache = EmbeddingCacheStore(settings.EMBEDDING_CACHE_PATH)
+        self.embedding = CachedEmbeddings(
+            self.ollama_embedding,
+            model=settings.TEXT_EMBEDDING_MODEL,
+            store=self.embedding_cache,
+        )
+        self.chroma_client = chromadb.PersistentClient(
+            path=settings.CHROMA_PATH.as_posix()
+        )
+        self.vector_db = Chroma(
+            client=self.chroma_client,
+            collection_name=settings.COLLECTION_NAME,
+            persist_directory=settings.CHROMA_PATH.as_posix(),
+            embedding_function=self.embedding,
+            # Ollama embeddings are unit-normalised and Chroma's "l2" space is the
+            # squared distance, so this turns distances into cosine similarities
+            relevance_score_fn=lambda distance: 1.0 - distance / 2,
+        )
+        # Redacted records from earlier protected uploads
+        self.pii_cache = PIIVerdictCache(settings.PII_CACHE_PATH)
+        self.lexical_index = LexicalIndex(settings.LEXICAL_INDEX_PATH)
+        self.field_index = FieldIndex(settings.FIELD_INDEX_PATH)
+        for index in (self.lexical_index, self.field_index):
+            if not len(index):
+                self._rebuild_index(index)
+
+        self.search_executor = ThreadPoolExecutor(
+            max_workers=settings.RETRIEVAL_MAX_WORKERS,
+            thread_name_prefix="vector-search",
+        )
+        # Every write to Chroma and the lexical and field indexes runs on this one thread,
+        # so concurrent ingestion jobs never write at the same time
+        self.write_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="chroma-writer"
+        )
+
+    def _rebuild_index(self, index: LexicalIndex | FieldIndex) -> None:
+        """
+        Indexes the chunks already in the Chroma collection, e.g. the first
+        time an index is used with an existing collection.
+        """
+        existing = self.vector_db.get(include=["documents", "metadatas"])
+        if existing["ids"]:
+            DEFAULT_LOGGER.debug(
+                f"Building {type(index).__name__} from {len(existing['ids'])} existing chunks..."
+            )
+            index.add(
+                existing["ids"],
+                [
+                    Document(page_content=content, metadata=metadata or {})
+                    for content, metadata in zip(
+                        existing["documents"], existing["metadatas"]
+                    )
+                ],
+            )
+
+    async def close(self) -> None:
+        """
+        Closes the pooled HTTP connections and stops the Chroma system.
+        """
+        self.search_executor.shutdown(wait=True, cancel_futures=True)
+        self.write_executor.shutdown(wait=True, cancel_futures=True)
+
+        for model in (self.llm, self.ollama_embedding):
+            if model._client is not None:
+                model._client.close()
+            if model._async_client is not None:
+                await model._async_client.close()
+
+        self.embedding_cache.close()
+        self.pii_cache.close()
+        self.lexical_index.close()
+        self.field_index.close()
+
+        try:
+            self.chroma_client._system.stop()
+        finally:
+            self.chroma_client.clear_system_cache()
+
+
+_registry: ClientRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def init_clients() -> ClientRegistry:
+    """
+    Creates the process-wide client registry if it does not exist yet.
+    """
+    global _registry
+
+    with _registry_lock:
+        if _registry is None:
+            DEFAULT_LOGGER.debug("Initializing LLM, embedding and vector DB clients...")
+            _registry = ClientRegistry()
+        return _registry
+
+
+def get_clients() -> ClientRegistry:
+    """
+    Returns the process-wide client registry.
+    Outside the FastAPI lifespan (e.g. the CLI) it is created on first use.
+    """
+    if _registry is None:
+        return init_clients()
+    return _registry
+
+
+async def close_clients() -> None:
+    """
+    Closes the process-wide client registry, if one was created.
+    """
+    global _registry
+
+    with _registry_lock:
+        registry, _registry = _registry, None
+
+    if registry is not None:
+        DEFAULT_LOGGER.debug("Closing LLM, embedding and vector DB clients...")
+        await registry.close()
@@ -0,0 +1,91 @@
+import math
+from dataclasses import dataclass
+
+from langchain_core.documents import Document
+
+from config import settings
+from custom_loggers import LLM_LOGGER
+
+# Shared prefix/suffix lengths treated as chunk overlap (chunks embedded with the earlier
+# text splitter overlap by 100 characters, split record parts repeat their keys)
+MIN_OVERLAP = 20
+MAX_OVERLAP = 500
+CHUNK_SEPARATOR = "\n\n"
+
+
+@dataclass
+class PackedContext:
+    text: str
+    documents: list[tuple[Document, float]]
+    tokens: int
+    tokens_saved: int
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximates the number of `LLM_MODEL` tokens in `text`.
+    """
+    return math.ceil(len(text) / settings.CONTEXT_CHARS_PER_TOKEN)
+
+
+def pack_context(
+    ranked: list[tuple[Document, float]], token_budget: int
+) -> PackedContext:
+    """
+    Builds the answer prompt context from scored chunks, best score first.
+    Duplicate chunks and chunks contained in an already packed chunk are
+    dropped, the overlap a chunk shares with an already packed neighbour is
+    trimmed, and chunks are added until `token_budget` is reached.
+    """
+    input_tokens = sum(estimate_tokens(doc.page_content) for doc, _ in ranked)
+
+    packed: list[tuple[Document, float]] = []
+    texts: list[str] = []
+    tokens = 0
+    for document, score in sorted(ranked, key=lambda item: item[1], reverse=True):
+        text = document.page_content
+        if any(text in packed_text for packed_text in texts):
+            continue
+
+        for packed_text in texts:
+            text = _trim_overlap(packed_text, text)
+
+        chunk_tokens = estimate_tokens(text + CHUNK_SEPARATOR)
+        if tokens + chunk_tokens > token_budget:
+            if texts:
+                # A smaller, lower-scored chunk may still fit
+                continue
+            # Always keep (the start of) the best chunk
+            text = text[: int(token_budget * settings.CONTEXT_CHARS_PER_TOKEN)]
+            chunk_tokens = estimate_tokens(text)
+
+        texts.append(text)
+        packed.append((Document(page_content=text, metadata=document.metadata), score))
+        tokens += chunk_tokens
+
+    tokens_saved = max(input_tokens - tokens, 0)
+    LLM_LOGGER.debug(
+        f"Packed {len(packed)} of {len(ranked)} chunks into ~{tokens} tokens "
+        f"(budget {token_budget}, saved ~{tokens_saved} tokens)"
+    )
+    return PackedContext(
+        text=CHUNK_SEPARATOR.join(texts),
+        documents=packed,
+        tokens=tokens,
+        tokens_saved=tokens_saved,
+    )
+
+
+def _trim_overlap(packed_text: str, text: str) -> str:
+    """
+    Removes the part of `text` that duplicates the start or end of
+    `packed_text`, e.g. the overlap between neighbouring chunks.
+    """
+    max_overlap = min(len(packed_text), len(text) - 1, MAX_OVERLAP)
+    for size in range(max_overlap, MIN_OVERLAP - 1, -1):
+        if packed_text.endswith(text[:size]):
+            return text[size:]
+    for size in range(max_overlap, MIN_OVERLAP - 1, -1):
+        if packed_text.startswith(text[-size:]):
+            return text[:-size]
+    return text
@@ -1,19 +1,59 @@
 import shutil
+import time
 from pathlib import Path
-from typing import TypedDict, NotRequired
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    Literal,
+    NotRequired,
+    TextIO,
+    TypedDict,
+)
+
+from langchain_core.documents import Document
 
 from config import settings
-from llms.query import query
+from llms.archives import iter_upload_members
+from llms.get_vector_db import add_sources
+from llms.query import query, aquery, astream_query
 
 from custom_loggers import DEFAULT_LOGGER
 
 
+class FileResult(TypedDict):
+    filename: str
+    success: bool
+    stats: NotRequired[dict]
+    error: NotRequired[str]
+
+
 class LLMResult(TypedDict):
     success: bool
     message: NotRequired[str]
+    answer: NotRequired[str]
     results: NotRequired[list]
     error: NotRequired[str]
     details: NotRequired["LLMResult"]
+    stats: NotRequired[dict]
+    files: NotRequired[list[FileResult]]
+    skipped: NotRequired[list[str]]
+
+
+class ChatStreamEvent(TypedDict):
+    type: Literal["sources", "token", "end"]
+    sources: NotRequired[list[dict]]
+    token: NotRequired[str]
+    timings: NotRequired[dict[str, float]]
+    context: NotRequired[str]
+    error: NotRequired[str]
+
+
+# Streams a file, given as (text stream, file name), as batches of chunks:
+# `embed.load_and_split_data` or `protected_embed.load_and_process_json`
+ChunkLoader = Callable[[TextIO, str], Iterable[list[Document]]]
 
 
 def upload_to_temp(file_path: Path) -> Path:
@@ -42,68 +82,228 @@ def upload_to_temp(file_path: Path) -> Path:
         raise error
 
 
-def query_db(user_query: str) -> LLMResult:
+def embed_files(
+    files: Iterable[tuple[str, TextIO | Exception]],
+    load_chunks: ChunkLoader,
+    is_allowed: Callable[[str], bool],
+) -> LLMResult:
     """
-    Performs a query against the vector database.
+    Streams each (file name, text stream) into the vector database through
+    `load_chunks`, committing once at the end, and returns a result per file.
+    Files `is_allowed` rejects are skipped, and a file given with the error
+    it could not be read with fails.
     """
-    if not user_query:
-        DEFAULT_LOGGER.error("No query string provided.")
-        return {"success": False, "error": "Query parameter is missing"}
+    skipped: list[str] = []
 
+    def sources() -> Iterator[tuple[str, Iterator[list[Document]]]]:
+        for filename, file in files:
+            if isinstance(file, Exception):
+                # An upload that could not be read fails on its own
+                yield filename, _failed_upload(file)
+                continue
+            if not is_allowed(filename):
+                skipped.append(filename)
+                continue
+            yield filename, load_chunks(file, filename)
+
+    results: list[FileResult] = []
+    for filename, outcome in add_sources(sources()):
+        if isinstance(outcome, Exception):
+            error = str(outcome)
+        elif not outcome.chunks_seen:
+            error = "No data could be loaded"
+        else:
+            results.append(
+                {"filename": filename, "success": True, "stats": outcome.to_dict()}
+            )
+            continue
+        results.append({"filename": filename, "success": False, "error": error})
+
+    embedded = sum(result["success"] for result in results)
+    DEFAULT_LOGGER.info(
+        f"Embedded {embedded} of {len(results)} files, skipped {len(skipped)}"
+    )
+    return {
+        "success": embedded > 0,
+        "message": f"Embedded {embedded} of {len(results)} files",
+        "files": results,
+        "skipped": skipped,
+    }
+
+
+def embed_uploads(
+    uploads: list[tuple[Path, str]],
+    load_chunks: ChunkLoader,
+    is_allowed: Callable[[str], bool],
+) -> LLMResult:
+    """
+    Embeds several files, and the files inside zip/tar archives, given as
+    (saved path, original file name), into the vector database in one pass
+    with one commit (see `embed_files`). Each file is stored under its own name.
+    """
     try:
-        response = query(user_query)
+        embedding_result = embed_files(
+            iter_upload_members(uploads), load_chunks, is_allowed
+        )
+    except Exception as e:
+        DEFAULT_LOGGER.error(
+            f"An unexpected error occurred during bulk embedding: {e}", exc_info=True
+        )
+        return {"success": False, "error": f"Internal error: {e}"}
+
+    if embedding_result["success"]:
+        return {
+            "success": True,
+            "message": embedding_result["message"],
+            "details": embedding_result,
+        }
+    return {
+        "success": False,
+        "error": f"Failed to embed the uploaded files: {embedding_result['message']}",
+        "details": embedding_result,
+    }
+
 
-        # Handle different response types from the query function
-        if isinstance(response, str):
-            # If query returns a string, treat it as the result content
+def _failed_upload(error: Exception) -> Iterator[list[Document]]:
+    DEFAULT_LOGGER.error(f"Could not read uploaded file: {error}")
+    raise ValueError(f"Could not read uploaded file: {error}") from error
+    yield
+
+
+def _to_llm_result(user_query: str, response: Any) -> LLMResult:
+    """
+    Converts the response of the query function into an `LLMResult`.
+    """
+    # Handle different response types from the query function
+    if isinstance(response, str):
+        # If query returns a string, treat it as the result content
+        DEFAULT_LOGGER.debug(f"Query processed successfully for: '{user_query}'")
+        return {
+            "success": True,
+            "message": "Query successful",
+            "results": [{"score": 1.0, "document": response}],
+        }
+    elif isinstance(response, dict):
+        # If query returns a dict, handle it as before
+        if response and response.get("found", False):
             DEFAULT_LOGGER.debug(f"Query processed successfully for: '{user_query}'")
-            return {
+            result: LLMResult = {
                 "success": True,
                 "message": "Query successful",
-                "results": [{"score": 1.0, "document": response}],
+                "results": response.get("results", []),
             }
-        elif isinstance(response, dict):
-            # If query returns a dict, handle it as before
-            if response and response.get("found", False):
-                DEFAULT_LOGGER.debug(
-                    f"Query processed successfully for: '{user_query}'"
-                )
-                return {
-                    "success": True,
-                    "message": "Query successful",
-                    "results": response.get("results", []),
-                }
-            else:
-                DEFAULT_LOGGER.debug(f"No results found for query: '{user_query}'")
-                return {"success": True, "message": "No results found", "results": []}
-        elif isinstance(response, list):
-            # If query returns a list of results
-            DEFAULT_LOGGER.debug(f"Query processed successfully for: '{user_query}'")
-            results = []
-            for item in response:
-                if isinstance(item, str):
-                    results.append({"score": 1.0, "document": item})
-                elif isinstance(item, dict):
-                    results.append(item)
-                else:
-                    results.append({"score": 1.0, "document": str(item)})
-            return {"success": True, "message": "Query successful", "results": results}
+            if "answer" in response:
+                result["answer"] = response["answer"]
+            return result
         else:
-            # Handle any other response type
-            DEFAULT_LOGGER.error(f"No results found for query: '{user_query}'")
+            DEFAULT_LOGGER.debug(f"No results found for query: '{user_query}'")
             return {"success": True, "message": "No results found", "results": []}
+    elif isinstance(response, list):
+        # If query returns a list of results
+        DEFAULT_LOGGER.debug(f"Query processed successfully for: '{user_query}'")
+        results = []
+        for item in response:
+            if isinstance(item, str):
+                results.append({"score": 1.0, "document": item})
+            elif isinstance(item, dict):
+                results.append(item)
+            else:
+                results.append({"score": 1.0, "document": str(item)})
+        return {"success": True, "message": "Query successful", "results": results}
+    else:
+        # Handle any other response type
+        DEFAULT_LOGGER.error(f"No results found for query: '{user_query}'")
+        return {"success": True, "message": "No results found", "results": []}
+
+
+def query_db(user_query: str) -> LLMResult:
+    """
+    Performs a query against the vector database.
+    """
+    if not user_query:
+        DEFAULT_LOGGER.error("No query string provided.")
+        return {"success": False, "error": "Query parameter is missing"}
+
+    try:
+        return _to_llm_result(user_query, query(user_query))
 
     except Exception as e:
         DEFAULT_LOGGER.error(
             f"An error occurred during database query for '{user_query}': {e}",
             exc_info=True,
         )
+        return {"success": False, "error": f"Internal error during query: {e}"}
+
+
+async def aquery_db(user_query: str) -> LLMResult:
+    """
+    Async counterpart of `query_db`. Cancelling the awaiting task also
+    cancels the in-flight requests to Ollama.
+    """
+    if not user_query:
+        DEFAULT_LOGGER.error("No query string provided.")
+        return {"success": False, "error": "Query parameter is missing"}
+
+    try:
+        return _to_llm_result(user_query, await aquery(user_query))
+
+    except Exception as e:
         DEFAULT_LOGGER.error(
-            f"An error occurred during database query for '{user_query}': {e}"
+            f"An error occurred during database query for '{user_query}': {e}",
+            exc_info=True,
         )
         return {"success": False, "error": f"Internal error during query: {e}"}
 
 
+def _format_chat_response(
+    context: str, user_input: str, query_response: LLMResult
+) -> tuple[str, str]:
+    """
+    Formats a query response for the chat and appends a summary to the context.
+    """
+    if query_response["success"]:
+        if results := query_response.get("results"):
+            response_text = ""
+            if answer := query_response.get("answer"):
+                response_text += f"{answer}\n\nSources:\n\n"
+            else:
+                response_text += "Here's what I found:\n\n"
+            for i, result in enumerate(results):
+                score = result.get("score", "N/A")
+                score_str = (
+                    f"{score:.2f}" if isinstance(score, (int, float)) else str(score)
+                )
+                document = result.get("document", "N/A")
+
+                # Show more of the document content for better answers
+                if len(str(document)) > 500:
+                    document_preview = str(document)[:500] + "..."
+                else:
+                    document_preview = str(document)
+
+                response_text += (
+                    f"Result {i + 1} (Score: {score_str}):\n{document_preview}\n\n"
+                )
+
+            DEFAULT_LOGGER.debug(f"Chatbot: {response_text.strip()}")
+            # For context, just store a summary
+            context_summary = f"Found {len(query_response['results'])} relevant results"
+        else:
+            DEFAULT_LOGGER.debug("Chatbot: No matching results found for your query.")
+            response_text = "No matching results found for your query."
+            context_summary = response_text
+    else:
+        error_msg = (
+            f"Sorry, I encountered an error trying to search: {query_response['error']}"
+        )
+        DEFAULT_LOGGER.debug(f"Chatbot: {error_msg}")
+        response_text = error_msg
+        context_summary = "Search error occurred"
+
+    context += f"\nUser: {user_input}\nChatbot: {context_summary}"
+    return context, response_text
+
+
 def query_chat_processing_fn(context: str, user_input: str) -> tuple[str, str]:
     """
     Processes user input as a query to the vector database.
@@ -111,55 +311,96 @@ def query_chat_processing_fn(context: str, user_input: str) -> tuple[str, str]:
     but `perform_db_query` doesn't directly use it for retrieval.
     It's maintained for the overall chat flow.
     """
-    response_text = ""
     try:
         DEFAULT_LOGGER.debug("Chatbot: Searching...")
         query_response = query_db(user_input)
+        return _format_chat_response(context, user_input, query_response)
 
-        if query_response["success"]:
-            if results := query_response.get("results"):
-                response_text = "Here's what I found:\n\n"
-                for i, result in enumerate(results):
-                    score = result.get("score", "N/A")
-                    score_str = (
-                        f"{score:.2f}"
-                        if isinstance(score, (int, float))
-                        else str(score)
-                    )
-                    document = result.get("document", "N/A")
-
-                    # Show more of the document content for better answers
-                    if len(str(document)) > 500:
-                        document_preview = str(document)[:500] + "..."
-                    else:
-                        document_preview = str(document)
-
-                    response_text += (
-                        f"Result {i + 1} (Score: {score_str}):\n{document_preview}\n\n"
-                    )
-
-                DEFAULT_LOGGER.debug(f"Chatbot: {response_text.strip()}")
-                # For context, just store a summary
-                context_summary = (
-                    f"Found {len(query_response['results'])} relevant results"
-                )
-            else:
-                DEFAULT_LOGGER.debug(
-                    "Chatbot: No matching results found for your query."
-                )
-                response_text = "No matching results found for your query."
-                context_summary = response_text
-        else:
-            error_msg = f"Sorry, I encountered an error trying to search: {query_response['error']}"
-            DEFAULT_LOGGER.debug(f"Chatbot: {error_msg}")
-            response_text = error_msg
-            context_summary = "Search error occurred"
+    except Exception as e:
+        error_msg = f"Sorry, I encountered an error trying to respond: {e}"
+        DEFAULT_LOGGER.debug(f"Chatbot: {error_msg}")
+        context += f"\nUser: {user_input}\nChatbot: Error: {e}"
+
+    return context, ""
 
-        context += f"\nUser: {user_input}\nChatbot: {context_summary}"
+
+async def aquery_chat_processing_fn(context: str, user_input: str) -> tuple[str, str]:
+    """
+    Async counterpart of `query_chat_processing_fn`, so the event loop keeps
+    serving other clients while the query runs.
+    """
+    try:
+        DEFAULT_LOGGER.debug("Chatbot: Searching...")
+        query_response = await aquery_db(user_input)
+        return _format_chat_response(context, user_input, query_response)
 
     except Exception as e:
         error_msg = f"Sorry, I encountered an error trying to respond: {e}"
         DEFAULT_LOGGER.debug(f"Chatbot: {error_msg}")
         context += f"\nUser: {user_input}\nChatbot: Error: {e}"
 
-    return context, response_text
+    return context, ""
+
+
+async def stream_chat_processing_fn(
+    context: str, user_input: str
+) -> AsyncIterator[ChatStreamEvent]:
+    """
+    Streaming counterpart of `query_chat_processing_fn`.
+    Yields the retrieved source snippets as soon as retrieval finishes, then the
+    answer tokens as they are generated, and finally an `end` event carrying the
+    timings (in milliseconds) and the updated context.
+    """
+    started = time.perf_counter()
+    timings: dict[str, float] = {}
+    source_count = 0
+
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    try:
+        DEFAULT_LOGGER.debug("Chatbot: Searching (streaming)...")
+        async for event in astream_query(user_input):
+            if event["type"] == "sources":
+                timings["retrieval_ms"] = elapsed_ms()
+                source_count = len(event["sources"])
+                yield {
+                    "type": "sources",
+                    "sources": [
+                        {
+                            "document": source["document"][:500],
+                            "metadata": source["metadata"],
+                            "score": source["score"],
+                        }
+                        for source in event["sources"]
+                    ],
+                }
+            elif event["type"] == "token":
+                timings.setdefault("first_token_ms", elapsed_ms())
+                yield {"type": "token", "token": event["token"]}
+
+        if "first_token_ms" not in timings:
+            yield {
+                "type": "token",
+                "token": "No matching results found for your query.",
+            }
+
+        timings["total_ms"] = elapsed_ms()
+        context += (
+            f"\nUser: {user_input}\nChatbot: Found {source_count} relevant results"
+        )
+        yield {"type": "end", "timings": timings, "context": context}
+
+    except Exception as e:
+        DEFAULT_LOGGER.error(
+            f"An error occurred during streaming query for '{user_input}': {e}",
+            exc_info=True,
+        )
+        timings["total_ms"] = elapsed_ms()
+        context += f"\nUser: {user_input}\nChatbot: Error: {e}"
+        yield {
+            "type": "end",
+            "timings": timings,
+            "context": context,
+            "error": f"Sorry, I encountered an error trying to respond: {e}",
+        }
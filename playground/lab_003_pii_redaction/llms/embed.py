@@ -1,16 +1,25 @@
 import os
 from datetime import datetime
 from pathlib import Path
+from typing import Iterator, TextIO
 
 from werkzeug.utils import secure_filename
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from config import settings
 from llms.core import LLMResult
-from llms.get_vector_db import get_vector_db
+from llms.chunk_writer import WriteStats
+from llms.get_vector_db import add_chunk_batches
+from llms.json_chunker import chunk_records
+from llms.json_stream import (
+    batched,
+    is_supported_file,
+    iter_records,
+)
+from llms.stage_timing import timed_iter
 
 from custom_loggers import DEFAULT_LOGGER
 from fastapi import UploadFile
+import csv
 import json
 from langchain_core.documents import Document
 
@@ -19,7 +28,7 @@ def is_allowed_file_type(filename: str) -> bool:
     """
     Checks if the file type is allowed for the given filename.
     """
-    return Path(filename).suffix.lower() in {".json"}
+    return is_supported_file(filename)
 
 
 def save_file(file: UploadFile) -> Path:
@@ -36,80 +45,48 @@ def save_file(file: UploadFile) -> Path:
     return destination
 
 
-# Function to load and split the data from the JSON file
-def load_and_split_data(file_path: Path) -> list[Document] | None:
-    try:
-        DEFAULT_LOGGER.info(f"Loading JSON file: {file_path}")
-
-        with file_path.open("r", encoding="utf-8") as f:
-            json_data = json.load(f)
-
-        # Convert JSON to string format for text processing
-        if isinstance(json_data, dict):
-            # Convert dict to readable text
-            content = json.dumps(json_data, indent=2, ensure_ascii=False)
-            data = [
-                Document(
-                    page_content=content,
-                    metadata={"source": file_path.as_posix(), "type": "json_object"},
-                )
-            ]
-            DEFAULT_LOGGER.info(f"Processed JSON object with {len(content)} characters")
-
-        elif isinstance(json_data, list):
-            # Handle list of objects
-            data = []
-            for i, item in enumerate(json_data):
-                if isinstance(item, (dict, list)):
-                    content = json.dumps(item, indent=2, ensure_ascii=False)
-                else:
-                    content = str(item)
-                data.append(
-                    Document(
-                        page_content=content,
-                        metadata={
-                            "source": file_path.as_posix(),
-                            "item_index": i,
-                            "type": "json_array_item",
-                        },
-                    )
-                )
-            DEFAULT_LOGGER.info(f"Processed JSON array with {len(data)} items")
-
-        else:
-            # Handle primitive types
-            content = str(json_data)
-            data = [
-                Document(
-                    page_content=content,
-                    metadata={"source": file_path.as_posix(), "type": "json_primitive"},
-                )
-            ]
-            DEFAULT_LOGGER.info(f"Processed JSON primitive: {type(json_data).__name__}")
-
-        if not data:
-            raise ValueError("No data could be loaded from the JSON file")
-
-        DEFAULT_LOGGER.info(
-            f"Created {len(data)} documents, now splitting into chunks..."
+# Function to stream the records of the JSON, JSON Lines or CSV file and pack them
+# into chunks, yielding one batch of chunks per `INGEST_BATCH_SIZE` records
+def load_and_split_data(file: Path | TextIO, source: str) -> Iterator[list[Document]]:
+    """
+    The format is picked from the suffix of `source`.
+    Raises `json.JSONDecodeError` or `csv.Error` if the file is malformed.
+    """
+    DEFAULT_LOGGER.info(f"Loading file: {source}")
+    record_count = 0
+    batches = batched(iter_records(file, source), settings.INGEST_BATCH_SIZE)
+    for records in timed_iter(batches, "parse"):
+        record_count += len(records)
+        chunks = chunk_records(
+            records, source, settings.CHUNK_TARGET_CHARS, settings.RECORD_RENDERING
         )
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=7500, chunk_overlap=100
+        DEFAULT_LOGGER.info(
+            f"Packed {len(records)} records into {len(chunks)} chunks ({record_count} records so far)"
         )
-        chunks = text_splitter.split_documents(data)
-        DEFAULT_LOGGER.info(f"Split into {len(chunks)} chunks")
+        yield chunks
 
-        return chunks
 
+# Function to stream the file into the vector database
+def embed_chunks(file_path: Path, source: str) -> WriteStats | None:
+    """
+    Returns the write statistics, or `None` if no data could be loaded.
+    """
+    try:
+        stats = add_chunk_batches(load_and_split_data(file_path, source), source)
     except json.JSONDecodeError as e:
         DEFAULT_LOGGER.error(f"Invalid JSON format in {file_path}: {e}")
         return None
-    except Exception as e:
-        DEFAULT_LOGGER.error(
-            f"Error loading and splitting data from {file_path}: {e}", exc_info=True
-        )
+    except csv.Error as e:
+        DEFAULT_LOGGER.error(f"Invalid CSV format in {file_path}: {e}")
+        return None
+
+    if not stats.chunks_seen:
+        DEFAULT_LOGGER.error(f"No data could be loaded from {file_path}")
         return None
 
+    DEFAULT_LOGGER.info(f"Embedded {stats.chunks} chunks from {file_path}")
+    return stats
+
 
 # Main function to handle the embedding process for file objects (Flask uploads)
 def embed_file_from_obj(file: UploadFile) -> LLMResult:
@@ -117,17 +94,17 @@ def embed_file_from_obj(file: UploadFile) -> LLMResult:
     if file and file.filename != "" and is_allowed_file_type(file.filename):
         try:
             file_path = save_file(file)
-            chunks = load_and_split_data(file_path)
-
-            if chunks is None:
+            stats = embed_chunks(file_path, secure_filename(file.filename))
+            if stats is None:
                 return {"success": False, "error": "Failed to load and split data"}
 
-            db = get_vector_db()
-            db.add_documents(chunks)
-            db.persist()
             os.remove(file_path)
 
-            return {"success": True, "message": "File embedded successfully"}
+            return {
+                "success": True,
+                "message": "File embedded successfully",
+                "stats": stats.to_dict(),
+            }
         except Exception as e:
             DEFAULT_LOGGER.error(f"Error in embed_file_object: {e}", exc_info=True)
             return {"success": False, "error": str(e)}
@@ -136,36 +113,36 @@ def embed_file_from_obj(file: UploadFile) -> LLMResult:
 
 
 # Main function to handle the embedding process for file paths (strings)
-def embed_file_from_path(file_path: Path) -> LLMResult:
+def embed_file_from_path(file_path: Path, source: str | None = None) -> LLMResult:
     """Handle embedding for file paths (strings)"""
     if not os.path.exists(file_path):
         return {"success": False, "error": f"File not found: {file_path}"}
 
     filename = os.path.basename(file_path)
+    source = source or filename
     if not is_allowed_file_type(filename):
         return {
             "success": False,
-            "error": "File type not allowed. Only JSON files are supported.",
+            "error": "File type not allowed. Only JSON, JSON Lines and CSV files are supported.",
         }
 
     try:
-        chunks = load_and_split_data(file_path)
-
-        if chunks is None:
+        stats = embed_chunks(file_path, source)
+        if stats is None:
             return {"success": False, "error": "Failed to load and split data"}
 
-        db = get_vector_db()
-        db.add_documents(chunks)
-        db.persist()
-
-        return {"success": True, "message": f"File '{filename}' embedded successfully"}
+        return {
+            "success": True,
+            "message": f"File '{source}' embedded successfully",
+            "stats": stats.to_dict(),
+        }
     except Exception as e:
         DEFAULT_LOGGER.error(f"Error in embed_file_path: {e}", exc_info=True)
         return {"success": False, "error": str(e)}
 
 
 # Unified embed function that handles both file objects and file paths
-def embed_file(file: UploadFile | Path | str) -> LLMResult:
+def embed_file(file: UploadFile | Path | str, source: str | None = None) -> LLMResult:
     """
     Universal embed function that handles both file objects and file paths
     """
@@ -175,11 +152,11 @@ def embed_file(file: UploadFile | Path | str) -> LLMResult:
         return embed_file_from_obj(file)
     elif isinstance(file, str):
         # It's a file path string
-        return embed_file_from_path(Path(file))
+        return embed_file_from_path(Path(file), source)
     elif isinstance(file, Path):
-        return embed_file_from_path(file)
+        return embed_file_from_path(file, source)
     else:
         return {
             "success": False,
             "error": "Invalid input: expected file object or file path string",
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,141 @@
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from custom_loggers import LLM_LOGGER
+
+
+class EmbeddingCacheStore:
+    """
+    A SQLite table of embedding vectors keyed by (model name, SHA-256 of text).
+    It lives on disk, so cached vectors survive process restarts.
+    """
+
+    def __init__(self, path: Path):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+                """
+            )
+
+    def get_many(self, model: str, text_hashes: list[str]) -> dict[str, list[float]]:
+        found: dict[str, list[float]] = {}
+        unique_hashes = list(dict.fromkeys(text_hashes))
+
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                )
+                for text_hash, vector in rows:
+                    found[text_hash] = np.frombuffer(vector, dtype=np.float64).tolist()
+
+        return found
+
+    def put_many(self, model: str, vectors: dict[str, list[float]]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [
+                    (model, text_hash, np.asarray(vector, dtype=np.float64).tobytes())
+                    for text_hash, vector in vectors.items()
+                ],
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model so every text is looked up in the
+    `EmbeddingCacheStore` first and only the misses are sent to the model.
+    """
+
+    def __init__(self, underlying: Embeddings, model: str, store: EmbeddingCacheStore):
+        self.underlying = underlying
+        self.model = model
+        self.store = store
+
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        text_hashes, cached, missing = self._lookup(texts)
+        if missing:
+            missing_texts = list(missing.values())
+            self._store(missing, self.underlying.embed_documents(missing_texts), cached)
+        return [cached[text_hash] for text_hash in text_hashes]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        text_hashes, cached, missing = self._lookup(texts)
+        if missing:
+            missing_texts = list(missing.values())
+            vectors = await self.underlying.aembed_documents(missing_texts)
+            self._store(missing, vectors, cached)
+        return [cached[text_hash] for text_hash in text_hashes]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self) -> dict:
+        """
+        Counters reported by `/readyz`.
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _lookup(
+        self, texts: list[str]
+    ) -> tuple[list[str], dict[str, list[float]], dict[str, str]]:
+        text_hashes = [
+            hashlib.sha256(text.encode("utf-8")).hexdigest() for text in texts
+        ]
+        cached = self.store.get_many(self.model, text_hashes)
+
+        missing: dict[str, str] = {}
+        for text_hash, text in zip(text_hashes, texts):
+            if text_hash not in cached:
+                missing.setdefault(text_hash, text)
+
+        hits = sum(1 for text_hash in text_hashes if text_hash in cached)
+        misses = len(texts) - hits
+        self.hits += hits
+        self.misses += misses
+        LLM_LOGGER.debug(
+            f"Embedding cache: {hits} hits, {misses} misses "
+            f"(total {self.hits} hits, {self.misses} misses)"
+        )
+        return text_hashes, cached, missing
+
+    def _store(
+        self,
+        missing: dict[str, str],
+        vectors: list[list[float]],
+        cached: dict[str, list[float]],
+    ) -> None:
+        new_vectors = dict(zip(missing.keys(), vectors))
+        self.store.put_many(self.model, new_vectors)
+        cached.update(new_vectors)
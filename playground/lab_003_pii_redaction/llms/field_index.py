@@ -0,0 +1,252 @@
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator
+
+from langchain_core.documents import Document
+
+from custom_loggers import DEFAULT_LOGGER
+from llms.json_chunker import chunk_values
+
+# Longer values are free text, not something a question names exactly
+MAX_VALUE_CHARS = 200
+# Runs of question words tried as a field value, e.g. not "a" or "is"
+MIN_SUBJECT_CHARS = 3
+MAX_SUBJECT_WORDS = 8
+# Longer questions are not lookups (and stay below SQLite's bound-parameter limit)
+MAX_QUESTION_WORDS = 40
+
+# Punctuation around a question word, and a trailing possessive ("Bob Johnson's")
+_WORD_EDGES = re.compile(r"^[\"'“”‘’(.,;:!?]+|(?:['’]s)?[\"'“”‘’).,;:!?]*$")
+_NAME_WORDS = re.compile(r"[0-9a-z]+")
+# Question words that ask for a field without naming it
+_IMPLIED_FIELD_WORDS = {"who": "name", "whose": "name", "whom": "name"}
+_CAMEL_CASE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+# Top-level fields that identify a record, so a question can name its subject
+# by them. Other fields (e.g. `manager` or `department`) are shared between
+# records and never make a subject.
+IDENTIFYING_FIELDS = {
+    "name",
+    "full name",
+    "display name",
+    "username",
+    "user name",
+    "login",
+    "email",
+    "email address",
+    "business email",
+    "work email",
+}
+
+
+@dataclass
+class FieldMatch:
+    source: str
+    record: int | None
+    subject: str
+    path: str
+    value: str
+    chunk_id: str
+
+
+class FieldIndex:
+    """
+    A SQLite table of the scalar fields of every ingested record, e.g.
+    `work_phone = +1-555-200-2002`, kept next to the Chroma collection.
+    It answers exact lookups such as "what is Bob Johnson's work phone"
+    without embedding the question or calling the LLM.
+    """
+
+    def __init__(self, path: Path):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fields (
+                    chunk_id TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    record INTEGER,
+                    path TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    normalized TEXT NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS fields_normalized ON fields (normalized)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS fields_record ON fields (source, record)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS fields_chunk ON fields (chunk_id)"
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connection.execute(
+                "SELECT COUNT(DISTINCT chunk_id) FROM fields"
+            ).fetchone()
+        return count
+
+    def add(
+        self, ids: list[str], documents: list[Document], commit: bool = True
+    ) -> None:
+        """
+        Indexes the fields of the chunks' records, replacing those indexed for
+        the same ids. With `commit=False` the rows are only written to disk by
+        the next `commit()`, as in the lexical index.
+        """
+        rows = [
+            row
+            for chunk_id, document in zip(ids, documents)
+            for row in _field_rows(chunk_id, document)
+        ]
+        with self._lock:
+            self._connection.executemany(
+                "DELETE FROM fields WHERE chunk_id = ?",
+                [(chunk_id,) for chunk_id in ids],
+            )
+            self._connection.executemany(
+                "INSERT INTO fields (chunk_id, source, record, path, value, normalized) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            if commit:
+                self._connection.commit()
+
+    def commit(self) -> None:
+        with self._lock:
+            self._connection.commit()
+
+    def delete(self, ids: list[str]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM fields WHERE chunk_id = ?",
+                [(chunk_id,) for chunk_id in ids],
+            )
+
+    def lookup(self, question: str) -> list[FieldMatch]:
+        """
+        Finds the fields an exact lookup asks for. The subject is the longest
+        run of question words equal to an identifying field of one record
+        (see `IDENTIFYING_FIELDS`, e.g. a name "Bob Johnson"), and the field
+        returned is the one of that record whose name is fully covered by the
+        other question words ("work phone" -> `work_phone`).
+        Returns nothing, so the question goes through retrieval, when the
+        subject is not identifying or matches several records, or when no
+        field, or more than one, is named.
+        """
+        words = [_WORD_EDGES.sub("", word) for word in question.split()]
+        if len(words) > MAX_QUESTION_WORDS:
+            return []
+        candidates = {
+            _normalize(" ".join(words[start:end]))
+            for start in range(len(words))
+            for end in range(start + 1, min(start + MAX_SUBJECT_WORDS, len(words)) + 1)
+        }
+        candidates = {c for c in candidates if len(c) >= MIN_SUBJECT_CHARS}
+        if not candidates:
+            return []
+
+        with self._lock:
+            placeholders = ",".join("?" * len(candidates))
+            subjects = [
+                row
+                for row in self._connection.execute(
+                    f"SELECT DISTINCT source, record, path, value, normalized FROM fields "
+                    f"WHERE normalized IN ({placeholders})",
+                    list(candidates),
+                )
+                if _is_identifying(row[2])
+            ]
+            if not subjects:
+                return []
+
+            longest = max(len(normalized) for *_, normalized in subjects)
+            subjects = [row for row in subjects if len(row[-1]) == longest]
+            records = {(source, record) for source, record, *_ in subjects}
+            if len(records) > 1:
+                DEFAULT_LOGGER.debug(
+                    f"Field lookup: '{subjects[0][3]}' matches {len(records)} records"
+                )
+                return []
+
+            ((source, record),) = records
+            subject_paths = {path for _, _, path, *_ in subjects}
+            fields = [
+                row
+                for row in self._connection.execute(
+                    "SELECT path, value, chunk_id FROM fields "
+                    "WHERE source = ? AND record IS ?",
+                    (source, record),
+                )
+                if row[0] not in subject_paths
+            ]
+
+        subject = subjects[0][3]
+        question_words = set(_name_words(question)) - set(_name_words(subject))
+        question_words |= {
+            _IMPLIED_FIELD_WORDS[word]
+            for word in question_words & _IMPLIED_FIELD_WORDS.keys()
+        }
+        # Only fields every word of which the question names, e.g. not
+        # `phone_number` and `work_phone` for "what is Bob Johnson's phone"
+        matches = [
+            FieldMatch(source, record, subject, path, value, chunk_id)
+            for path, value, chunk_id in fields
+            if (field_words := set(_name_words(path.rsplit(".", 1)[-1])))
+            and field_words <= question_words
+        ]
+        if len({match.path for match in matches}) != 1:
+            return []
+        return matches
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def _field_rows(chunk_id: str, document: Document) -> Iterator[tuple]:
+    metadata = document.metadata
+    first_record = metadata.get("item_index")
+    for offset, value in enumerate(chunk_values(document)):
+        record = None if first_record is None else first_record + offset
+        for path, leaf in _leaves(value, path=""):
+            text = leaf if isinstance(leaf, str) else str(leaf)
+            if text.strip() and len(text) <= MAX_VALUE_CHARS:
+                source = metadata.get("source", "")
+                yield (chunk_id, source, record, path, text, _normalize(text))
+
+
+def _leaves(value: Any, path: str) -> Iterator[tuple[str, Any]]:
+    """
+    Yields the string and number leaves of an object with their paths,
+    dotted like the compact rendering (items of an array share its path).
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _leaves(item, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, list):
+        for item in value:
+            yield from _leaves(item, path)
+    elif path and isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        yield path, value
+
+
+def _is_identifying(path: str) -> bool:
+    return " ".join(_name_words(path)) in IDENTIFYING_FIELDS and "." not in path
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _name_words(text: str) -> list[str]:
+    # "work_phone", "workPhone" and "Work phone" all give ["work", "phone"]
+    return _NAME_WORDS.findall(_CAMEL_CASE.sub(" ", text).lower())
@@ -1,15 +1,45 @@
-from langchain_community.embeddings import OllamaEmbeddings
+from typing import Iterable
+
 from langchain_community.vectorstores.chroma import Chroma
+from langchain_core.documents import Document
 
 from config import settings
+from llms.chunk_writer import ChunkWriter, WriteStats
+from llms.clients import get_clients
 
 
-def get_vector_db():
-    embedding = OllamaEmbeddings(
-        model=settings.TEXT_EMBEDDING_MODEL, show_progress=True
-    )
-    return Chroma(
-        collection_name=settings.COLLECTION_NAME,
-        persist_directory=settings.CHROMA_PATH.as_posix(),
-        embedding_function=embedding,
+def get_vector_db() -> Chroma:
+    return get_clients().vector_db
+
+
+def add_chunk_batches(
+    batches: Iterable[list[Document]], source: str | None = None
+) -> WriteStats:
+    """
+    Embeds and adds chunk batches to the vector database and the lexical index
+    as they are produced, committing once at the end.
+    With a `source`, only new or changed chunks are embedded and the chunks the
+    source no longer contains are removed, so re-ingesting a file is idempotent.
+    If producing or adding a batch fails, the chunks already added are removed
+    again before the error is re-raised.
+    """
+    return _chunk_writer().write(batches, source)
+
+
+def add_sources(
+    sources: Iterable[tuple[str, Iterable[list[Document]]]],
+) -> list[tuple[str, WriteStats | Exception]]:
+    """
+    Adds the chunk batches of several sources (see `add_chunk_batches`) with
+    one commit at the end, returning each source's stats or error.
+    A source that fails is removed again without affecting the others.
+    """
+    return _chunk_writer().write_sources(sources)
+
+
+def _chunk_writer() -> ChunkWriter:
+    return ChunkWriter(
+        get_clients(),
+        batch_size=settings.EMBED_BATCH_SIZE,
+        max_concurrency=settings.EMBED_MAX_CONCURRENCY,
     )
@@ -0,0 +1,272 @@
+import json
+import re
+from typing import Any, Literal
+
+from langchain_core.documents import Document
+
+from llms.context_packing import estimate_tokens
+from llms.json_stream import JSONRecord
+from llms.stage_timing import timed_stage
+
+RecordRendering = Literal["json", "compact"]
+
+# Compact records are several lines each, so they are set apart by a blank line
+RECORD_SEPARATORS: dict[RecordRendering, str] = {"json": "\n", "compact": "\n\n"}
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"\s*")
+# Object keys shown as they are in compact paths
+_PLAIN_KEY = re.compile(r'[^.\[\]":\r\n]+')
+# First characters of a JSON value
+_JSON_VALUE_STARTS = frozenset('-0123456789"[{tfn')
+
+
+def chunk_records(
+    records: list[JSONRecord],
+    source: str,
+    target_chars: int,
+    rendering: RecordRendering = "json",
+) -> list[Document]:
+    """
+    Turns consecutive records into chunks of about `target_chars` characters.
+    Small records are packed together, whole, until the next one would not
+    fit; a record larger than `target_chars` gets chunks of its own, split
+    only between object keys or array items.
+    Each chunk's metadata holds the first and last record it covers
+    (`item_index`, `item_index_end`, and `row`, `row_end` for line-based files).
+    With `compact` rendering, or when a record is a primitive rendered as bare
+    text, it also holds the chunk as JSON (`json`). With `compact` rendering
+    it holds the characters and estimated tokens saved over the JSON
+    (`chars_saved`, `tokens_saved`) until the chunk is written.
+    """
+    with timed_stage("split"):
+        return _chunk_records(records, source, target_chars, rendering)
+
+
+def _chunk_records(
+    records: list[JSONRecord],
+    source: str,
+    target_chars: int,
+    rendering: RecordRendering,
+) -> list[Document]:
+    separator = RECORD_SEPARATORS[rendering]
+    # Looked up once, the records are rendered in the same context
+    render_stage = timed_stage("render")
+    chunks: list[Document] = []
+    pack: list[tuple[JSONRecord, str]] = []
+    pack_chars = 0
+
+    def flush() -> None:
+        nonlocal pack, pack_chars
+        if pack:
+            chunks.append(
+                _to_document(
+                    separator.join(text for _, text in pack),
+                    [record for record, _ in pack],
+                    source,
+                    [record.value for record, _ in pack],
+                    rendering,
+                )
+            )
+        pack, pack_chars = [], 0
+
+    for record in records:
+        with render_stage:
+            text = render_value(record.value, rendering)
+        if len(text) > target_chars:
+            flush()
+            for part in _split_value(record.value, target_chars, rendering):
+                with render_stage:
+                    text = render_value(part, rendering)
+                chunks.append(_to_document(text, [record], source, [part], rendering))
+            continue
+
+        if pack and pack_chars + len(separator) + len(text) > target_chars:
+            flush()
+        pack.append((record, text))
+        pack_chars += len(text) + (len(separator) if pack_chars else 0)
+
+    flush()
+    return chunks
+
+
+def render_value(value: Any, rendering: RecordRendering = "json") -> str:
+    if rendering == "compact":
+        return "\n".join(_compact_lines(value, path=""))
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, indent=2, ensure_ascii=False)
+    return str(value)
+
+
+def chunk_values(document: Document) -> list[Any]:
+    """
+    The JSON values a chunk was rendered from: its records in order, or the
+    part of the one record it holds. A primitive record rendered as bare text
+    (only in chunks stored before `json` held them) is `None`, so the values
+    still line up with the records from `item_index` on.
+    """
+    text = document.metadata.get("json", document.page_content)
+    values: list[Any] = []
+    position = 0
+    while position < len(text):
+        try:
+            value, position = _decoder.raw_decode(text, position)
+        except json.JSONDecodeError:
+            # Bare text runs to the end of its line, where the next record starts
+            end = text.find(RECORD_SEPARATORS["json"], position)
+            value, position = None, len(text) if end < 0 else end + 1
+        values.append(value)
+        position = _WHITESPACE.match(text, position).end()
+    return values
+
+
+def _compact_lines(value: Any, path: str) -> list[str]:
+    """
+    Renders a value as `path: value` lines, e.g. `address.city: Lyon` and
+    `orders[0].total: 12.5`. An array of primitives stays on one line,
+    as `tags: a, b, c`. Keys and strings that would read as something else
+    are quoted as in JSON (see `_compact_key` and `_compact_scalar`).
+    """
+    if isinstance(value, dict) and value:
+        lines = []
+        for key, item in value.items():
+            key = _compact_key(str(key))
+            lines.extend(_compact_lines(item, f"{path}.{key}" if path else key))
+        return lines
+    if isinstance(value, list) and value:
+        if all(not isinstance(item, (dict, list)) for item in value):
+            return [_compact_line(path, ", ".join(map(_compact_scalar, value)))]
+        lines = []
+        for index, item in enumerate(value):
+            lines.extend(_compact_lines(item, f"{path}[{index}]"))
+        return lines
+    if isinstance(value, (dict, list)):
+        return [_compact_line(path, "{}" if isinstance(value, dict) else "[]")]
+    return [_compact_line(path, _compact_scalar(value))]
+
+
+def _compact_line(path: str, text: str) -> str:
+    return f"{path}: {text}" if path else text
+
+
+def _compact_key(key: str) -> str:
+    # Quoted where it would read as a nested path (`a.b`, `a[0]`) or end the path early (`a: b`)
+    if _PLAIN_KEY.fullmatch(key) and key == key.strip():
+        return key
+    return json.dumps(key, ensure_ascii=False)
+
+
+def _compact_scalar(value: Any) -> str:
+    if isinstance(value, str):
+        # Quoted only where the bare text would be ambiguous: empty, spanning
+        # lines, padded, read as two array items ("a, b") or as another JSON
+        # value ("null", "42", "[]")
+        if (
+            not value
+            or "\n" in value
+            or "\r" in value
+            or value != value.strip()
+            or ", " in value
+            or _is_json(value)
+        ):
+            return json.dumps(value, ensure_ascii=False)
+        return value
+    # null, true and false as in JSON
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _is_json(text: str) -> bool:
+    if text[0] not in _JSON_VALUE_STARTS:
+        return False
+    try:
+        json.loads(text)
+    except json.JSONDecodeError:
+        return False
+    return True
+
+
+def _split_value(
+    value: Any, target_chars: int, rendering: RecordRendering = "json"
+) -> list[Any]:
+    """
+    Splits an object into objects with a subset of its keys (an array into
+    shorter arrays), each rendering to about `target_chars` characters.
+    A key whose value is too large on its own is split recursively, and every
+    part keeps the key, so each part shows where it sits in the record.
+    Only a string longer than `target_chars` is cut, into shorter strings.
+    """
+    if isinstance(value, dict):
+        items = list(value.items())
+    elif isinstance(value, list):
+        items = list(enumerate(value))
+    elif isinstance(value, str):
+        return [
+            value[start : start + target_chars]
+            for start in range(0, max(len(value), 1), target_chars)
+        ]
+    else:
+        return [value]
+
+    def wrap(pairs: list[tuple[Any, Any]]) -> Any:
+        if isinstance(value, list):
+            return [item for _, item in pairs]
+        return dict(pairs)
+
+    parts: list[Any] = []
+    current: list[tuple[Any, Any]] = []
+    current_chars = 0
+    for key, item in items:
+        item_chars = len(render_value(wrap([(key, item)]), rendering))
+        if rendering == "compact":
+            # The ", " or "\n" joining it to the previous item
+            item_chars += 2
+        if item_chars > target_chars:
+            if current:
+                parts.append(wrap(current))
+                current, current_chars = [], 0
+            nested_chars = max(target_chars - len(str(key)) - 8, 1)
+            parts.extend(
+                wrap([(key, part)])
+                for part in _split_value(item, nested_chars, rendering)
+            )
+            continue
+
+        if current and current_chars + item_chars > target_chars:
+            parts.append(wrap(current))
+            current, current_chars = [], 0
+        current.append((key, item))
+        current_chars += item_chars
+
+    if current:
+        parts.append(wrap(current))
+    return parts
+
+
+def _to_document(
+    text: str,
+    records: list[JSONRecord],
+    source: str,
+    values: list[Any],
+    rendering: RecordRendering,
+) -> Document:
+    first, last = records[0], records[-1]
+    metadata = {"source": source, "type": first.type}
+    if first.item_index is not None:
+        metadata["item_index"] = first.item_index
+        metadata["item_index_end"] = last.item_index
+    if first.row is not None:
+        metadata["row"] = first.row
+        metadata["row_end"] = last.row
+    # The field index reads the values back from `json`, or from the text
+    # when it is JSON already
+    if rendering != "json" or not all(isinstance(v, (dict, list)) for v in values):
+        with timed_stage("render"):
+            json_text = RECORD_SEPARATORS["json"].join(
+                json.dumps(v, indent=2, ensure_ascii=False) for v in values
+            )
+        metadata["json"] = json_text
+    if rendering != "json":
+        # Popped into the write stats by the chunk writer, not stored with the chunk
+        metadata["chars_saved"] = len(json_text) - len(text)
+        metadata["tokens_saved"] = estimate_tokens(json_text) - estimate_tokens(text)
+    return Document(page_content=text, metadata=metadata)
@@ -0,0 +1,236 @@
+import csv
+import json
+import re
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Literal, TextIO, TypeVar
+
+from llms.stage_timing import timed_iter, timed_stage
+
+# Characters read from the file at a time
+READ_SIZE = 1 << 16
+# A single array element larger than this is treated as malformed input
+MAX_ITEM_CHARS = 1 << 26
+
+# File types that can be ingested, each read one record at a time
+SUPPORTED_SUFFIXES = {".json", ".jsonl", ".ndjson", ".csv"}
+
+T = TypeVar("T")
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# What can follow a number up to the buffer end and still be part of it
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+
+@dataclass
+class JSONRecord:
+    value: Any
+    type: Literal[
+        "json_object", "json_array_item", "json_primitive", "jsonl_line", "csv_row"
+    ]
+    item_index: int | None = None
+    # 1-based line the record starts on, for line-based formats
+    row: int | None = None
+
+
+def is_supported_file(filename: str) -> bool:
+    return Path(filename).suffix.lower() in SUPPORTED_SUFFIXES
+
+
+def iter_records(file: Path | TextIO, filename: str) -> Iterator[JSONRecord]:
+    """
+    Yields the records of a JSON, JSON Lines or CSV file, picking the format
+    from the suffix of `filename`.
+    Raises `json.JSONDecodeError` or `csv.Error` on malformed input.
+    """
+    suffix = Path(filename).suffix.lower()
+    if suffix in (".jsonl", ".ndjson"):
+        return iter_json_lines(file)
+    if suffix == ".csv":
+        return iter_csv_rows(file)
+    return iter_json_records(file)
+
+
+def iter_json_records(file: Path | TextIO) -> Iterator[JSONRecord]:
+    """
+    Yields the records of a JSON file (a path, or a text stream such as an
+    archive member): one per element when the top-level value is an array,
+    parsed one at a time so memory use does not grow with the file size,
+    otherwise a single record for the whole object or primitive.
+    Raises `json.JSONDecodeError` on malformed input.
+    """
+    if isinstance(file, Path):
+        with _open_text(file) as f:
+            yield from iter_json_records(f)
+        return
+
+    head = _skip_whitespace(file, "")
+    if head.startswith("["):
+        for index, value in enumerate(_iter_array_items(file, head[1:])):
+            yield JSONRecord(value=value, type="json_array_item", item_index=index)
+        return
+
+    with timed_stage("read"):
+        rest = file.read()
+    value = json.loads(head + rest)
+    if isinstance(value, dict):
+        yield JSONRecord(value=value, type="json_object")
+    else:
+        yield JSONRecord(value=value, type="json_primitive")
+
+
+def iter_json_lines(file: Path | TextIO) -> Iterator[JSONRecord]:
+    """
+    Yields one record per non-blank line of a JSON Lines file.
+    Raises `json.JSONDecodeError` on a malformed line.
+    """
+    if isinstance(file, Path):
+        with _open_text(file) as f:
+            yield from iter_json_lines(f)
+        return
+
+    index = 0
+    for line_number, line in enumerate(timed_iter(file, "read"), start=1):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise json.JSONDecodeError(f"Line {line_number}: {e.msg}", e.doc, e.pos)
+        yield JSONRecord(
+            value=value, type="jsonl_line", item_index=index, row=line_number
+        )
+        index += 1
+
+
+def iter_csv_rows(file: Path | TextIO) -> Iterator[JSONRecord]:
+    """
+    Yields one record per data row of a CSV file with a header row, as an
+    object keyed by the column names.
+    Raises `csv.Error` on malformed input, including a row with more or fewer
+    fields than the header.
+    """
+    if isinstance(file, Path):
+        with _open_text(file) as f:
+            yield from iter_csv_rows(f)
+        return
+
+    reader = csv.reader(timed_iter(file, "read"))
+    header = next(reader, None)
+    if header is None:
+        return
+
+    index = 0
+    line_number = reader.line_num
+    for row in reader:
+        # A quoted field may span lines, so a row starts after the previous one ended
+        start = line_number + 1
+        line_number = reader.line_num
+        if not row:
+            # Blank line
+            continue
+        if len(row) != len(header):
+            raise csv.Error(
+                f"Line {start}: expected {len(header)} fields, got {len(row)}"
+            )
+        yield JSONRecord(
+            value=dict(zip(header, row)), type="csv_row", item_index=index, row=start
+        )
+        index += 1
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _open_text(file_path: Path) -> TextIO:
+    # newline="" leaves line endings inside quoted CSV fields to the csv module
+    return file_path.open("r", encoding="utf-8-sig", newline="")
+
+
+def _iter_array_items(f: TextIO, buffer: str) -> Iterator[Any]:
+    """
+    Decodes the elements of a top-level array whose opening bracket has
+    already been consumed, reading `f` in `READ_SIZE` pieces. While an element
+    is incomplete, each read is as large as what is buffered of it, so a large
+    element is decoded and copied a logarithmic number of times, not once per
+    piece.
+    """
+    position = 0
+    expect_value = True
+    has_items = False
+    at_eof = False
+
+    def read_more() -> None:
+        nonlocal buffer, position, at_eof
+        pending = len(buffer) - position
+        # Never past MAX_ITEM_CHARS by more than one character
+        size = max(READ_SIZE, min(pending, MAX_ITEM_CHARS + 1 - pending))
+        with timed_stage("read"):
+            more = f.read(size)
+        at_eof = not more
+        buffer = buffer[position:] + more
+        position = 0
+        if len(buffer) > MAX_ITEM_CHARS:
+            raise json.JSONDecodeError(
+                f"Array element exceeds {MAX_ITEM_CHARS} characters", buffer, 0
+            )
+
+    while True:
+        position = _WHITESPACE.match(buffer, position).end()
+        if position == len(buffer):
+            if at_eof:
+                raise json.JSONDecodeError("Unterminated array", buffer, position)
+            read_more()
+            continue
+
+        if buffer[position] == "]":
+            if expect_value and has_items:
+                raise json.JSONDecodeError("Expecting value", buffer, position)
+            if _skip_whitespace(f, buffer[position + 1 :]):
+                raise json.JSONDecodeError("Extra data", buffer, position + 1)
+            return
+        if not expect_value:
+            if buffer[position] != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, position)
+            position += 1
+            expect_value = True
+            continue
+
+        try:
+            value, end = _decoder.raw_decode(buffer, position)
+            # A number read up to the buffer end, or up to a "." or exponent
+            # just before it, may continue in the next read
+            complete = at_eof or not _NUMBER_TAIL.fullmatch(buffer, end)
+        except json.JSONDecodeError:
+            if at_eof:
+                raise
+            complete = False
+        if not complete:
+            read_more()
+            continue
+
+        yield value
+        position = end
+        expect_value = False
+        has_items = True
+
+
+def _skip_whitespace(f: TextIO, buffer: str) -> str:
+    """
+    Strips leading whitespace from `buffer`, reading from `f` until a
+    non-whitespace character is available or the file ends.
+    """
+    while True:
+        buffer = buffer.lstrip()
+        if buffer:
+            return buffer
+        with timed_stage("read"):
+            more = f.read(READ_SIZE)
+        if not more:
+            return ""
+        buffer = more
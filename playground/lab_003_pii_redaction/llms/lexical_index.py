@@ -0,0 +1,185 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from custom_loggers import DEFAULT_LOGGER
+
+# Identifiers that must match exactly: redaction placeholders, emails, IPs and phone numbers
+IDENTIFIER_PATTERN = re.compile(
+    r"\[REDACTED_[A-Z_]+_\d+\]"
+    r"|[\w.+-]+@[\w-]+(?:\.[\w-]+)+"
+    r"|\b(?:\d{1,3}\.){3}\d{1,3}\b"
+    r"|\b(?:[0-9a-fA-F]{1,4}:){2,7}[0-9a-fA-F]{1,4}\b"
+    r"|\+?\d[\d ().-]{6,}\d"
+)
+TOKEN_PATTERN = re.compile(IDENTIFIER_PATTERN.pattern + r"|\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return [token.lower() for token in TOKEN_PATTERN.findall(text)]
+
+
+def find_identifiers(text: str) -> list[str]:
+    return [token.lower() for token in IDENTIFIER_PATTERN.findall(text)]
+
+
+class LexicalIndex:
+    """
+    A BM25 inverted index over the ingested chunks.
+    Chunks are persisted in SQLite next to the Chroma collection and the
+    postings are rebuilt in memory on startup.
+    """
+
+    def __init__(self, path: Path, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        self._documents: dict[str, Document] = {}
+        self._lengths: dict[str, int] = {}
+        self._postings: dict[str, dict[str, int]] = defaultdict(dict)
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    metadata TEXT NOT NULL
+                )
+                """
+            )
+            for chunk_id, content, metadata in self._connection.execute(
+                "SELECT id, content, metadata FROM chunks"
+            ):
+                self._index(
+                    chunk_id,
+                    Document(page_content=content, metadata=json.loads(metadata)),
+                )
+
+        DEFAULT_LOGGER.debug(f"Lexical index loaded with {len(self)} chunks")
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(
+        self, ids: list[str], documents: list[Document], commit: bool = True
+    ) -> None:
+        """
+        Indexes the chunks. With `commit=False` the rows are only written to
+        disk by the next `commit()`, so several batches share one transaction.
+        """
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO chunks (id, content, metadata) VALUES (?, ?, ?)",
+                [
+                    (chunk_id, document.page_content, json.dumps(document.metadata))
+                    for chunk_id, document in zip(ids, documents)
+                ],
+            )
+            for chunk_id, document in zip(ids, documents):
+                self._unindex(chunk_id)
+                self._index(chunk_id, document)
+            if commit:
+                self._connection.commit()
+
+    def commit(self) -> None:
+        with self._lock:
+            self._connection.commit()
+
+    def delete(self, ids: list[str]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id in ids]
+            )
+            for chunk_id in ids:
+                self._unindex(chunk_id)
+
+    def search(self, query: str, k: int = 4) -> list[tuple[Document, float]]:
+        """
+        Returns the `k` best chunks for `query` by BM25 score.
+        """
+        with self._lock:
+            scores = self._score(tokenize(query))
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [(self._documents[chunk_id], score) for chunk_id, score in best]
+
+    def search_identifiers(self, query: str, k: int = 4) -> list[Document]:
+        """
+        Returns the chunks containing every exact identifier (email, IP, phone,
+        redaction placeholder) found in `query`, best BM25 score first.
+        """
+        identifiers = find_identifiers(query)
+        if not identifiers:
+            return []
+
+        with self._lock:
+            matching = set(self._postings.get(identifiers[0], {}))
+            for identifier in identifiers[1:]:
+                matching &= set(self._postings.get(identifier, {}))
+            if not matching:
+                return []
+
+            scores = self._score(tokenize(query))
+            best = sorted(matching, key=lambda chunk_id: scores[chunk_id], reverse=True)
+            return [self._documents[chunk_id] for chunk_id in best[:k]]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _index(self, chunk_id: str, document: Document) -> None:
+        term_counts = Counter(tokenize(document.page_content))
+        self._documents[chunk_id] = document
+        self._lengths[chunk_id] = sum(term_counts.values())
+        self._total_length += self._lengths[chunk_id]
+        for term, count in term_counts.items():
+            self._postings[term][chunk_id] = count
+
+    def _unindex(self, chunk_id: str) -> None:
+        document = self._documents.pop(chunk_id, None)
+        if document is None:
+            return
+
+        self._total_length -= self._lengths.pop(chunk_id)
+        for term in set(tokenize(document.page_content)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _score(self, terms: list[str]) -> dict[str, float]:
+        scores: dict[str, float] = defaultdict(float)
+        if not self._documents:
+            return scores
+
+        total = len(self._documents)
+        average_length = self._total_length / total
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, frequency in postings.items():
+                length_norm = (
+                    1 - self.b + self.b * self._lengths[chunk_id] / average_length
+                )
+                scores[chunk_id] += (
+                    idf
+                    * frequency
+                    * (self.k1 + 1)
+                    / (frequency + self.k1 * length_norm)
+                )
+
+        return scores
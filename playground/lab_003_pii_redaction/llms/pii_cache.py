@@ -0,0 +1,70 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any
+
+
+def content_hash(value: Any) -> str:
+    """
+    SHA-256 of the value's JSON, the key its redacted version is cached under.
+    """
+    content = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class PIIVerdictCache:
+    """
+    A SQLite table of redacted text keyed by the SHA-256 of the original text,
+    so text that was already scanned is never sent to Soteria again.
+    It lives on disk, so verdicts survive process restarts.
+    """
+
+    def __init__(self, path: Path):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS verdicts (
+                    content_hash TEXT PRIMARY KEY,
+                    redacted TEXT NOT NULL
+                )
+                """
+            )
+
+    def get_many(self, content_hashes: list[str]) -> dict[str, Any]:
+        found: dict[str, Any] = {}
+        unique_hashes = list(dict.fromkeys(content_hashes))
+
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT content_hash, redacted FROM verdicts "
+                    f"WHERE content_hash IN ({placeholders})",
+                    batch,
+                )
+                for key, redacted in rows:
+                    found[key] = json.loads(redacted)
+
+        return found
+
+    def put_many(self, verdicts: dict[str, Any]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO verdicts (content_hash, redacted) VALUES (?, ?)",
+                [
+                    (key, json.dumps(redacted, ensure_ascii=False))
+                    for key, redacted in verdicts.items()
+                ],
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,283 @@
+import ipaddress
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+# Same placeholder scheme as the Soteria redactor, e.g. [REDACTED_EMAIL_ADDRESS_1]
+PLACEHOLDER = "[REDACTED_{type}_{number}]"
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}")
+# Not part of a longer digit group sequence, such as a card number
+PHONE_PATTERN = re.compile(
+    r"(?<![\w.+])(?<!\d[ .-])(?:\+\d{1,3}[ .-]?)?(?:\(\d{2,4}\)[ .-]?|\d{2,4}[ .-])"
+    r"\d{3,4}[ .-]?\d{3,4}(?!\w|\.\d)(?![ .-]\d)"
+)
+# Candidates are validated with `ipaddress`, e.g. to skip times like 12:30:45
+IP_PATTERN = re.compile(
+    r"(?<![\w.:])(?:\d{1,3}(?:\.\d{1,3}){3}|(?:[0-9A-Fa-f]{0,4}:){2,7}[0-9A-Fa-f]{0,4})(?![\w.:])"
+)
+
+# Field names whose whole value is redacted, after lower-casing and replacing
+# non-alphanumerics with "_" (so "First Name" and "firstName" both become first_name)
+NAME_FIELD = re.compile(
+    r"(?:first|last|full|middle|given|family|maiden|display|user|contact|"
+    r"customer|employee|owner|person|patient|client)_?name|surname"
+)
+EMAIL_FIELD = re.compile(r"(?:\w+_)?e_?mail(?:_address)?")
+PHONE_FIELD = re.compile(
+    r"(?:\w+_)?(?:(?:tele)?phone|mobile|cell|fax|tel)(?:_number|_no)?"
+)
+# A bare "name" is a person's in an object with an email or phone field, or
+# stored under one of these keys (e.g. {"customer": {"name": ...}})
+PERSON_KEY = re.compile(
+    r"(?:\w+_)?(?:user|contact|customer|employee|owner|person|patient|client|"
+    r"manager|member|author|people|staff)s?"
+)
+# Numbers under these keys (or of 9+ digits) are scanned remotely like strings
+NUMBER_ID_FIELD = re.compile(
+    r"(?:\w+_)?(?:account|acct|iban|ssn|social_security|passport|national_id|"
+    r"tax_id|card|licen[cs]e|routing)(?:_(?:number|num|no|id))?"
+)
+
+# Strings are left to the remote redactor unless they hold no free text: after
+# removing placeholders, no letter at all (numbers, dates, amounts) or a single
+# lower- or upper-case ASCII token (booleans, enums, ids such as in_progress or
+# EUR). Runs of 9+ digits (account, card or national id numbers) always go.
+PLACEHOLDER_PATTERN = re.compile(r"\[REDACTED_([A-Z_]+)_\d+\]")
+LETTER_PATTERN = re.compile(r"[^\W\d_]")
+ENUM_TOKEN_PATTERN = re.compile(
+    r"[a-z0-9]+(?:[_.:/-][a-z0-9]+)*|[A-Z0-9]+(?:[_.:/-][A-Z0-9]+)*"
+)
+DIGIT_RUN_PATTERN = re.compile(r"\b\d(?:[ -]?\d){8,}\b")
+
+_FIELD_NAME_SEPARATORS = re.compile(r"[^0-9a-z]+")
+_CAMEL_CASE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+@dataclass
+class LocalRedaction:
+    value: Any
+    redacted: Counter = field(default_factory=Counter)
+    # String leaves of `value` still containing candidate PII
+    candidates: list[str] = field(default_factory=list)
+    _redactor: "_RecordRedactor | None" = field(default=None, repr=False)
+
+    @property
+    def needs_remote_scan(self) -> bool:
+        return bool(self.candidates)
+
+    def merge_remote(self, text: str, redacted: str) -> str:
+        """
+        Renumbers the placeholders the remote redactor put in a candidate
+        string (numbered from 1 in every string) into the record's own, so
+        different texts of one record never share a placeholder and the same
+        text gets the one it was given locally.
+        """
+        if self._redactor is None:
+            return redacted
+        return self._redactor.merge(text, redacted)
+
+
+def redact_locally(value: Any) -> LocalRedaction:
+    """
+    Redacts the obvious PII in a JSON record: emails, phone numbers, IPv4/IPv6
+    addresses and the values of name, email and phone fields. Placeholders are
+    numbered per record, the same text getting the same placeholder, so the
+    result only depends on the record.
+    The string leaves still containing candidate PII, and the text of number
+    leaves that may be ids, are listed in `candidates`.
+    """
+    redactor = _RecordRedactor()
+    redacted = redactor.redact(value, key=None, person=False)
+    return LocalRedaction(
+        value=redacted,
+        redacted=redactor.counts,
+        candidates=list(dict.fromkeys(redactor.candidates)),
+        _redactor=redactor,
+    )
+
+
+def replace_strings(value: Any, replacements: dict[str, str]) -> Any:
+    """
+    Returns `value` with every string leaf found in `replacements` replaced.
+    Number leaves are looked up by their text and only replaced when it was
+    changed, so they stay numbers otherwise. Object keys are left as they are.
+    """
+    if isinstance(value, dict):
+        return {k: replace_strings(v, replacements) for k, v in value.items()}
+    if isinstance(value, list):
+        return [replace_strings(item, replacements) for item in value]
+    if isinstance(value, str):
+        return replacements.get(value, value)
+    if _is_number(value):
+        text = str(value)
+        replacement = replacements.get(text, text)
+        return value if replacement == text else replacement
+    return value
+
+
+def needs_remote_scan(text: str) -> bool:
+    """
+    Whether a string, after local redaction, may still hold PII only the
+    remote redactor can find, e.g. a name in free text in any script or case.
+    """
+    rest = PLACEHOLDER_PATTERN.sub(" ", text).strip()
+    if DIGIT_RUN_PATTERN.search(rest):
+        return True
+    if not LETTER_PATTERN.search(rest):
+        return False
+    return not ENUM_TOKEN_PATTERN.fullmatch(rest)
+
+
+class _RecordRedactor:
+    def __init__(self) -> None:
+        self.counts: Counter = Counter()
+        self.candidates: list[str] = []
+        self._placeholders: dict[tuple[str, str], str] = {}
+
+    def redact(self, value: Any, key: str | None, person: bool) -> Any:
+        if isinstance(value, dict):
+            person = _is_person(value, key)
+            return {k: self.redact(v, k, person) for k, v in value.items()}
+        if isinstance(value, list):
+            # List items belong to the field the list is stored under
+            return [self.redact(item, key, person) for item in value]
+        if _is_number(value):
+            return self._redact_number(value, key, person)
+        if not isinstance(value, str) or not value.strip():
+            return value
+
+        field_type = _field_type(key, person)
+        if field_type is not None:
+            return self._placeholder(field_type, value)
+
+        text = EMAIL_PATTERN.sub(
+            lambda m: self._placeholder("EMAIL_ADDRESS", m.group()), value
+        )
+        text = IP_PATTERN.sub(self._replace_ip, text)
+        text = PHONE_PATTERN.sub(
+            lambda m: self._placeholder("PHONE_NUMBER", m.group()), text
+        )
+        # A bare name may be a person's, even as a single token such as "alice"
+        if needs_remote_scan(text) or (
+            _normalize_key(key) == "name" and LETTER_PATTERN.search(text)
+        ):
+            self.candidates.append(text)
+        return text
+
+    def _redact_number(self, value: int | float, key: str | None, person: bool) -> Any:
+        text = str(value)
+        field_type = _field_type(key, person)
+        if field_type is not None:
+            return self._placeholder(field_type, text)
+        name = _normalize_key(key)
+        if NUMBER_ID_FIELD.fullmatch(name) or DIGIT_RUN_PATTERN.search(text):
+            self.candidates.append(text)
+        return value
+
+    def merge(self, text: str, redacted: str) -> str:
+        tokens = list(PLACEHOLDER_PATTERN.finditer(redacted))
+        if not tokens:
+            return redacted
+
+        originals = _align(text, redacted, tokens)
+        parts, position = [], 0
+        for index, token in enumerate(tokens):
+            parts.append(redacted[position : token.start()])
+            original = originals[index] if originals else None
+            if original == token.group():
+                parts.append(original)
+            else:
+                # Unaligned, the token only stands for the same text within `text`
+                key = original if original is not None else f"{text}\x1f{token.group()}"
+                parts.append(self._placeholder(token.group(1), key))
+            position = token.end()
+        parts.append(redacted[position:])
+        return "".join(parts)
+
+    def _replace_ip(self, match: re.Match) -> str:
+        try:
+            ipaddress.ip_address(match.group())
+        except ValueError:
+            return match.group()
+        return self._placeholder("IP_ADDRESS", match.group())
+
+    def _placeholder(self, pii_type: str, text: str) -> str:
+        key = (pii_type, text)
+        if key not in self._placeholders:
+            self.counts[pii_type] += 1
+            self._placeholders[key] = PLACEHOLDER.format(
+                type=pii_type, number=self.counts[pii_type]
+            )
+        return self._placeholders[key]
+
+
+def _align(text: str, redacted: str, tokens: list[re.Match]) -> list[str] | None:
+    """
+    The text of `text` each placeholder of `redacted` stands for (or the
+    placeholder itself, when it was already in `text`), found by locating the
+    unchanged text between the placeholders in order. Returns None when the
+    redactor changed anything else, e.g. whitespace or punctuation.
+    """
+    literals = [redacted[: tokens[0].start()]]
+    literals += [
+        redacted[token.end() : following.start()]
+        for token, following in zip(tokens, tokens[1:])
+    ]
+    literals.append(redacted[tokens[-1].end() :])
+    if not text.startswith(literals[0]) or not text.endswith(literals[-1]):
+        return None
+
+    originals = []
+    position = len(literals[0])
+    end = len(text) - len(literals[-1])
+    for index, (token, literal) in enumerate(zip(tokens, literals[1:]), start=1):
+        placeholder = token.group()
+        if text.startswith(placeholder + literal, position):
+            # Kept as it was, e.g. a placeholder from the local redaction
+            found = position + len(placeholder)
+        elif index == len(tokens):
+            found = end
+        elif literal:
+            found = text.find(literal, position + 1, end)
+        else:
+            # Adjacent placeholders, which cannot be told apart
+            return None
+        if found <= position or found > end:
+            return None
+        originals.append(text[position:found])
+        position = found + len(literal)
+    return originals if position == len(text) else None
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _normalize_key(key: str | None) -> str:
+    if key is None:
+        return ""
+    return _FIELD_NAME_SEPARATORS.sub("_", _CAMEL_CASE.sub("_", key).lower()).strip("_")
+
+
+def _is_person(record: dict, key: str | None) -> bool:
+    if PERSON_KEY.fullmatch(_normalize_key(key)):
+        return True
+    return any(
+        _field_type(k, person=False) in ("EMAIL_ADDRESS", "PHONE_NUMBER")
+        for k in record
+    )
+
+
+def _field_type(key: str | None, person: bool) -> str | None:
+    name = _normalize_key(key)
+    if not name:
+        return None
+    if NAME_FIELD.fullmatch(name) or (person and name == "name"):
+        return "PERSON"
+    if EMAIL_FIELD.fullmatch(name):
+        return "EMAIL_ADDRESS"
+    if PHONE_FIELD.fullmatch(name):
+        return "PHONE_NUMBER"
+    return None
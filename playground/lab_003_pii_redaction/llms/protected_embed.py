@@ -1,19 +1,34 @@
+import dataclasses
 import os
+import csv
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
+from typing import Iterator, TextIO
 
 from werkzeug.utils import secure_filename
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
 from config import settings
 from llms.core import LLMResult
-from llms.get_vector_db import get_vector_db
+from llms.chunk_writer import WriteStats
+from llms.clients import get_clients
+from llms.get_vector_db import add_chunk_batches
+from llms.json_chunker import chunk_records
+from llms.json_stream import (
+    JSONRecord,
+    batched,
+    is_supported_file,
+    iter_records,
+)
+from llms.pii_cache import content_hash
+from llms.pii_filter import redact_locally, replace_strings
+from llms.stage_timing import timed_iter, timed_stage
 import soteria_sdk
 from dotenv import load_dotenv
 
-from llms.utils import clean_json_str
 from custom_loggers import DEFAULT_LOGGER
 from fastapi import UploadFile
 
@@ -24,7 +39,7 @@ DEFAULT_LOGGER.debug(f"Soteria API Key present: {bool(settings.SOTERIA_API_KEY)}
 
 if settings.SOTERIA_API_KEY:
     soteria_sdk.configure(
-        api_key=settings.SOTERIA_API_KEY, api_base="https://api.soteriainfra.com"
+        api_key=settings.SOTERIA_API_KEY, api_base=settings.SOTERIA_API_BASE
     )
     DEFAULT_LOGGER.debug("Soteria SDK configured")
 else:
@@ -35,7 +50,7 @@ def allowed_file(filename: str) -> bool:
     """
     Checks if the file type is allowed for the given filename.
     """
-    return Path(filename).suffix.lower() in {".json"}
+    return is_supported_file(filename)
 
 
 def save_file(file: UploadFile) -> Path:
@@ -61,98 +76,141 @@ def scan_pii_with_soteria(prompt: str) -> str:
     return prompt
 
 
-def load_and_process_json(file_path: Path) -> list[Document] | None:
-    """Load JSON file, scan for pii, and convert to documents"""
-    try:
-        with file_path.open("r", encoding="utf-8") as f:
-            raw_content = f.read()
+def scan_text(text: str) -> tuple[str, bool]:
+    """
+    Scan a string for pii and return the redacted string, and whether it was
+    actually scanned (and so may be cached). A failed scan is retried
+    `PII_SCAN_RETRIES` times, then raises, so unscanned text is never stored
+    """
+    if not settings.SOTERIA_API_KEY:
+        return text, False
 
+    for attempt in range(settings.PII_SCAN_RETRIES + 1):
         try:
-            if settings.SOTERIA_API_KEY:
-                scanned_content = scan_pii_with_soteria(prompt=raw_content)
-            else:
-                scanned_content = raw_content
+            return scan_pii_with_soteria(prompt=text), True
 
         except soteria_sdk.SoteriaValidationError as e:
             raise ValueError(
                 f"PII detected in file content, and redaction/policy failed: {e}"
             )
-        except Exception:
-            scanned_content = raw_content
-
-        cleaned_json = clean_json_str(scanned_content)
-        try:
-            json_data = json.loads(cleaned_json)
-        except json.JSONDecodeError:
-            import re
-
-            cleaned_content = re.sub(r"[\x00-\x1f\x7f-\x9f]", "", cleaned_json)
-            try:
-                json_data = json.loads(cleaned_content)
-            except json.JSONDecodeError as e2:
-                DEFAULT_LOGGER.debug(f"Still cannot parse after cleaning: {e2}")
-                return None
-
-        # Convert to documents
-        documents = []
-
-        if isinstance(json_data, dict):
-            content = json.dumps(json_data, indent=2, ensure_ascii=False)
-            documents.append(
-                Document(
-                    page_content=content,
-                    metadata={"source": file_path.as_posix(), "type": "json_object"},
+        except Exception as e:
+            if attempt == settings.PII_SCAN_RETRIES:
+                DEFAULT_LOGGER.error(
+                    f"PII scan failed after {attempt + 1} attempts: {e}"
                 )
+                raise ValueError(f"PII scan failed: {e}") from e
+
+            delay = settings.PII_SCAN_RETRY_BACKOFF * 2**attempt
+            DEFAULT_LOGGER.warning(
+                f"PII scan failed (attempt {attempt + 1}), retrying in {delay:.1f}s: {e}"
             )
+            time.sleep(delay)
 
-        elif isinstance(json_data, list):
-            for i, item in enumerate(json_data):
-                if isinstance(item, (dict, list)):
-                    content = json.dumps(item, indent=2, ensure_ascii=False)
-                else:
-                    content = str(item)
-                documents.append(
-                    Document(
-                        page_content=content,
-                        metadata={
-                            "source": file_path.as_posix(),
-                            "item_index": i,
-                            "type": "json_array_item",
-                        },
-                    )
-                )
 
-        else:
-            content = str(json_data)
-            documents.append(
-                Document(
-                    page_content=content,
-                    metadata={"source": file_path.as_posix(), "type": "json_primitive"},
-                )
-            )
-            DEFAULT_LOGGER.info("Created 1 document from JSON primitive")
-            DEFAULT_LOGGER.debug("Created 1 document from JSON primitive")
+def redact_records(
+    records: list[JSONRecord], executor: ThreadPoolExecutor
+) -> list[JSONRecord]:
+    """
+    Redact a batch of records on their parsed JSON: the obvious pii is redacted
+    locally, and only the string values still containing candidate pii are
+    scanned remotely, one request per string on `executor`, and written back
+    into the records with their placeholders numbered per record. Strings
+    scanned before are taken from the verdict cache and not sent again
+    """
+    with timed_stage("clean"):
+        local = [redact_locally(record.value) for record in records]
 
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=7500, chunk_overlap=100
+    with timed_stage("scan"):
+        # Identical strings in the batch are scanned once
+        candidates = list(
+            dict.fromkeys(text for redaction in local for text in redaction.candidates)
+        )
+        hashes = {text: content_hash(text) for text in candidates}
+        pii_cache = get_clients().pii_cache
+        cached = pii_cache.get_many(list(hashes.values()))
+
+        missing = [text for text in candidates if hashes[text] not in cached]
+        scans = dict(zip(missing, executor.map(scan_text, missing)))
+        pii_cache.put_many(
+            {
+                hashes[text]: redacted
+                for text, (redacted, scanned) in scans.items()
+                if scanned
+            }
         )
-        chunks = text_splitter.split_documents(documents)
 
-        return chunks
+    replacements = {
+        text: cached[hashes[text]] for text in candidates if text not in scans
+    }
+    replacements.update({text: redacted for text, (redacted, _) in scans.items()})
+
+    DEFAULT_LOGGER.debug(
+        f"PII scan: {sum(not r.needs_remote_scan for r in local)} records redacted "
+        f"locally only, {len(candidates) - len(missing)} strings cached, "
+        f"{len(missing)} scanned"
+    )
+    with timed_stage("clean"):
+        return [
+            dataclasses.replace(
+                record,
+                value=replace_strings(
+                    redaction.value,
+                    {
+                        text: redaction.merge_remote(text, replacements[text])
+                        for text in redaction.candidates
+                    },
+                ),
+            )
+            for redaction, record in zip(local, records)
+        ]
+
+
+def load_and_process_json(file: Path | TextIO, source: str) -> Iterator[list[Document]]:
+    """
+    Stream the JSON, JSON Lines or CSV file (by the suffix of `source`), redact
+    the pii in each batch of records (scanning up to `PII_SCAN_MAX_CONCURRENCY`
+    strings remotely at a time), and convert them to chunks, yielding one batch
+    of chunks per `INGEST_BATCH_SIZE` records
+    """
+    with ThreadPoolExecutor(
+        max_workers=settings.PII_SCAN_MAX_CONCURRENCY, thread_name_prefix="pii-scan"
+    ) as executor:
+        records = iter_records(file, source)
+        batches = batched(records, settings.INGEST_BATCH_SIZE)
+        for batch in timed_iter(batches, "parse"):
+            yield chunk_records(
+                redact_records(batch, executor),
+                source,
+                settings.CHUNK_TARGET_CHARS,
+                settings.RECORD_RENDERING,
+            )
+
+
+def embed_chunks(file_path: Path, source: str) -> WriteStats | None:
+    """
+    Stream the file into the vector database and return the write
+    statistics, or `None` if the file could not be loaded
+    """
+    try:
+        stats = add_chunk_batches(load_and_process_json(file_path, source), source)
 
     except json.JSONDecodeError as e:
         DEFAULT_LOGGER.error(f"Invalid JSON in {file_path}: {e}")
-        DEFAULT_LOGGER.error(f"JSON parse error: {e}")
+        return None
+    except csv.Error as e:
+        DEFAULT_LOGGER.error(f"Invalid CSV in {file_path}: {e}")
         return None
     except ValueError as e:
         DEFAULT_LOGGER.error(f"Critical PII redaction issue for {file_path}: {e}")
-        DEFAULT_LOGGER.error(f"Critical PII redaction issue: {e}")
         return None
-    except Exception as e:
-        DEFAULT_LOGGER.error(f"Error processing {file_path}: {e}", exc_info=True)
-        DEFAULT_LOGGER.error(f"Processing error: {e}")
+
+    if not stats.chunks_seen:
+        DEFAULT_LOGGER.error(f"No data could be loaded from {file_path}")
         return None
 
+    DEFAULT_LOGGER.debug(f"Embedded {stats.chunks} chunks to vector DB")
+    return stats
+
 
 def embed_file_from_obj(file: UploadFile) -> LLMResult:
     """Handle embedding for file objects (Flask uploads)"""
@@ -163,27 +221,21 @@ def embed_file_from_obj(file: UploadFile) -> LLMResult:
     if file.filename != "" and file and allowed_file(file.filename):
         try:
             file_path = save_file(file)
+            source = secure_filename(file.filename)
             DEFAULT_LOGGER.debug(f"File saved to: {file_path}")
 
-            chunks = load_and_process_json(file_path)
-
-            if chunks is None:
+            stats = embed_chunks(file_path, source)
+            if stats is None:
                 return {"success": False, "error": "Failed to load and process data"}
 
-            DEFAULT_LOGGER.debug(f"Embedding {len(chunks)} chunks to vector DB...")
-            db = get_vector_db()
-            db.add_documents(chunks)
-
-            # Remove persist() call if it's causing warnings
-            try:
-                db.persist()
-            except:
-                pass  # Ignore persistence warnings
-
             os.remove(file_path)
             DEFAULT_LOGGER.debug("File embedded successfully and temp file removed")
 
-            return {"success": True, "message": "File embedded successfully"}
+            return {
+                "success": True,
+                "message": "File embedded successfully",
+                "stats": stats.to_dict(),
+            }
         except Exception as e:
             DEFAULT_LOGGER.debug(f"embed_file_object error: {e}")
             DEFAULT_LOGGER.error(f"Error in embed_file_object: {e}", exc_info=True)
@@ -192,7 +244,7 @@ def embed_file_from_obj(file: UploadFile) -> LLMResult:
     return {"success": False, "error": "Invalid file or file type not allowed"}
 
 
-def embed_file_from_path(file_path: Path) -> LLMResult:
+def embed_file_from_path(file_path: Path, source: str | None = None) -> LLMResult:
     """Handle embedding for file paths (strings)"""
     DEFAULT_LOGGER.debug(f"embed_file_path called with: {file_path}")
 
@@ -200,30 +252,24 @@ def embed_file_from_path(file_path: Path) -> LLMResult:
         return {"success": False, "error": f"File not found: {file_path}"}
 
     filename = os.path.basename(file_path)
+    source = source or filename
     if not allowed_file(filename):
         return {
             "success": False,
-            "error": "File type not allowed. Only JSON files are supported.",
+            "error": "File type not allowed. Only JSON, JSON Lines and CSV files are supported.",
         }
 
     try:
-        chunks = load_and_process_json(file_path)
-
-        if chunks is None:
+        stats = embed_chunks(file_path, source)
+        if stats is None:
             return {"success": False, "error": "Failed to load and process data"}
 
-        DEFAULT_LOGGER.debug(f"Embedding {len(chunks)} chunks to vector DB...")
-        db = get_vector_db()
-        db.add_documents(chunks)
-
-        # Remove persist() call if it's causing warnings
-        try:
-            db.persist()
-        except:
-            pass  # Ignore persistence warnings
-
         DEFAULT_LOGGER.debug("File embedded successfully")
-        return {"success": True, "message": f"File '{filename}' embedded successfully"}
+        return {
+            "success": True,
+            "message": f"File '{source}' embedded successfully",
+            "stats": stats.to_dict(),
+        }
 
     except Exception as e:
         print(f"DEBUG: embed_file_path error: {e}")
@@ -231,7 +277,7 @@ def embed_file_from_path(file_path: Path) -> LLMResult:
         return {"success": False, "error": str(e)}
 
 
-def embed_file(file: UploadFile | Path | str) -> LLMResult:
+def embed_file(file: UploadFile | Path | str, source: str | None = None) -> LLMResult:
     """
     Universal embed function that handles both file objects and file paths
     """
@@ -244,10 +290,10 @@ def embed_file(file: UploadFile | Path | str) -> LLMResult:
     elif isinstance(file, str):
         # It's a file path string
         DEFAULT_LOGGER.debug("Detected file path string, calling embed_file_path")
-        return embed_file_from_path(Path(file))
+        return embed_file_from_path(Path(file), source)
     elif isinstance(file, Path):
-        return embed_file_from_path(file)
+        return embed_file_from_path(file, source)
     else:
         error_msg = f"Invalid input type: {type(file)}, expected file object or file path string"
         DEFAULT_LOGGER.debug(f"{error_msg}")
-        return {"success": False, "error": error_msg}
\ No newline at end of file
+        return {"success": False, "error": error_msg}
@@ -1,27 +1,37 @@
 import os
 import shutil
 from pathlib import Path
-import json
 
 from config import settings
 from llms.cli import get_conversation_handle_fn
 
 
-from llms.core import query_chat_processing_fn, LLMResult
-from llms.protected_embed import embed_file
+from llms.core import (
+    query_chat_processing_fn,
+    aquery_chat_processing_fn,
+    stream_chat_processing_fn,
+    LLMResult,
+    embed_uploads,
+)
+from llms.protected_embed import allowed_file, embed_file, load_and_process_json
 from custom_loggers import DEFAULT_LOGGER
 
 
-def process_and_embed_file_protected(file_path: Path) -> LLMResult:
+def process_and_embed_file_protected(
+    file_path: Path, source: str | None = None
+) -> LLMResult:
     """
     Processes a file: saves it temporarily (if not already in temp),
     and then embeds it into the vector database.
+    Chunks are stored under `source` (the file name by default), so
+    processing the same source again only updates what changed.
     """
     if not file_path.exists():
         DEFAULT_LOGGER.debug(f"Input file not found: {file_path}")
         return {"success": False, "error": f"File not found: {file_path}"}
 
     filename = file_path.name
+    source = source or filename
     temp_filepath = settings.TEMP_FOLDER / filename
     cleanup_temp_file = False
 
@@ -38,13 +48,13 @@ def process_and_embed_file_protected(file_path: Path) -> LLMResult:
             )
 
         # Use the file path directly since embed() now handles string paths
-        embedding_result = embed_file(temp_filepath)
+        embedding_result = embed_file(temp_filepath, source)
 
         if embedding_result and embedding_result.get("success", True):
-            DEFAULT_LOGGER.debug(f"File '{filename}' embedded successfully.")
+            DEFAULT_LOGGER.debug(f"File '{source}' embedded successfully.")
             return {
                 "success": True,
-                "message": f"File '{filename}' embedded successfully",
+                "message": f"File '{source}' embedded successfully",
                 "details": embedding_result,
             }
         else:
@@ -53,7 +63,7 @@ def process_and_embed_file_protected(file_path: Path) -> LLMResult:
             )
             return {
                 "success": False,
-                "error": f"Failed to embed file '{filename}'",
+                "error": f"Failed to embed file '{source}'",
                 "details": embedding_result,
             }
 
@@ -79,6 +89,14 @@ def process_and_embed_file_protected(file_path: Path) -> LLMResult:
             DEFAULT_LOGGER.debug(f"Temporary file '{temp_filepath}' removed.")
 
 
+def process_and_embed_files_protected(uploads: list[tuple[Path, str]]) -> LLMResult:
+    """
+    Embeds several files, and the files inside zip/tar archives, given as
+    (saved path, original file name), in one pass (see `embed_uploads`).
+    """
+    return embed_uploads(uploads, load_and_process_json, allowed_file)
+
+
 def run():
     file_to_embed_path = input(
         "Please enter the path to the file you want to embed (e.g., 'my_document.json'): "
@@ -95,27 +113,15 @@ def run():
         )
         return
 
-    # Check if it's a JSON file
-    if not file_to_embed_path.suffix.endswith(".json"):
+    # Check if it's a supported file type
+    if not allowed_file(file_to_embed_path.name):
         DEFAULT_LOGGER.error(
-            f"Only JSON files are supported. '{file_to_embed_path}' is not a JSON file. Exiting."
+            f"Only JSON, JSON Lines and CSV files are supported. '{file_to_embed_path}' is not one. Exiting."
         )
         return
 
-    # Validate that it's actually valid JSON
-    try:
-        with open(file_to_embed_path, "r", encoding="utf-8") as f:
-            json.load(f)
-        DEFAULT_LOGGER.debug(f"✓ Valid JSON file detected: {file_to_embed_path}")
-    except json.JSONDecodeError as e:
-        DEFAULT_LOGGER.debug(
-            f"✗ Invalid JSON file: {e}. Please check the file format. Exiting."
-        )
-        return
-    except Exception as e:
-        DEFAULT_LOGGER.error(f"✗ Error reading file: {e}. Exiting.")
-        return
-
+    # The file is validated while it is streamed into the vector database,
+    # so the file is only parsed once
     DEFAULT_LOGGER.debug(f"Attempting to embed file: {file_to_embed_path}")
     embed_result = process_and_embed_file_protected(file_to_embed_path)
 
@@ -124,7 +130,7 @@ def run():
             "✓ File embedded successfully. Now starting conversation mode."
         )
         DEFAULT_LOGGER.debug(
-            "You can now ask questions about the content of your JSON file!"
+            "You can now ask questions about the content of your file!"
         )
         DEFAULT_LOGGER.debug("Type 'quit' or 'exit' to end the conversation.")
         DEFAULT_LOGGER.debug("-" * 50)
@@ -1,12 +1,26 @@
-from langchain_community.chat_models import ChatOllama
+import asyncio
+from typing import AsyncIterator, Callable, Literal, NotRequired, TypedDict
+
+import numpy as np
 from langchain.prompts import ChatPromptTemplate, PromptTemplate
+from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from langchain.retrievers.multi_query import MultiQueryRetriever
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable
 from langchain_core.runnables.utils import Input
+from langchain.retrievers.multi_query import LineListOutputParser
 
 from config import settings
-from llms.get_vector_db import get_vector_db
+from custom_loggers import LLM_LOGGER
+from llms.answer_cache import answer_cache
+from llms.clients import ClientRegistry, get_clients
+from llms.context_packing import pack_context
+from llms.field_index import FieldMatch
+from llms.retrievers import (
+    AdaptiveRetriever,
+    BatchedMultiQueryRetriever,
+    HybridRetriever,
+)
 
 
 # Function to get the prompt templates for generating alternative questions and answering based on context
@@ -30,31 +44,336 @@ def get_prompt():
     return query_prompt, ChatPromptTemplate.from_template(template)
 
 
+class ScoredSource(TypedDict):
+    score: float
+    document: str
+    metadata: dict
+
+
+class QueryResponse(TypedDict):
+    found: bool
+    answer: NotRequired[str]
+    results: list[ScoredSource]
+    cached: NotRequired[bool]
+    # Answered from the field index, without the LLM
+    lookup: NotRequired[bool]
+
+
+class StreamEvent(TypedDict):
+    type: Literal["sources", "token"]
+    sources: NotRequired[list[ScoredSource]]
+    token: NotRequired[str]
+    cached: NotRequired[bool]
+
+
+# Function to build the retriever for the configured `RETRIEVAL_MODE`, optionally fused with
+# BM25 results from the local lexical index (`HYBRID_RETRIEVAL`)
+def get_retriever(clients: ClientRegistry) -> BaseRetriever:
+    retriever = get_vector_retriever(clients)
+    if not settings.HYBRID_RETRIEVAL:
+        return retriever
+
+    return HybridRetriever(
+        vector_retriever=retriever,
+        lexical_index=clients.lexical_index,
+        k=settings.LEXICAL_TOP_K,
+        executor=clients.search_executor,
+    )
+
+
+# The multi-query retriever generates multiple queries using the language model and the query prompt,
+# embedding them in one batch and searching the vector database concurrently
+def get_vector_retriever(clients: ClientRegistry) -> BaseRetriever:
+    vector_retriever = clients.vector_db.as_retriever(
+        search_kwargs={"k": settings.RETRIEVAL_TOP_K}
+    )
+    if settings.RETRIEVAL_MODE == "single":
+        return vector_retriever
+
+    query_prompt, _ = get_prompt()
+    multi_query_retriever = BatchedMultiQueryRetriever(
+        retriever=vector_retriever,
+        llm_chain=query_prompt | clients.llm | LineListOutputParser(),
+        executor=clients.search_executor,
+    )
+    if settings.RETRIEVAL_MODE == "multi":
+        return multi_query_retriever
+
+    return AdaptiveRetriever(
+        retriever=vector_retriever,
+        multi_query_retriever=multi_query_retriever,
+        min_score=settings.ADAPTIVE_MIN_SCORE,
+    )
+
+
+# Function to build the chain that generates the answer from the retrieved context and parses the output
+def get_answer_chain(clients: ClientRegistry) -> Runnable:
+    _, prompt = get_prompt()
+    return prompt | clients.llm | StrOutputParser()
+
+
+# Function to score the retrieved documents against the question with the vector store's relevance function,
+# keeping the `RETRIEVAL_TOP_K` best documents that score at least `RETRIEVAL_MIN_SCORE`.
+# The chunk embeddings come from the embedding cache, where they were stored at ingestion time.
+# Hybrid results keep their fused order and score, so lexical hits are not dropped
+def rank_documents(
+    clients: ClientRegistry, question_embedding: list[float], documents: list[Document]
+) -> list[tuple[Document, float]]:
+    if not documents:
+        return []
+    if _is_fused(documents):
+        return _fused_ranking(documents)
+
+    document_embeddings = clients.embedding.embed_documents(
+        [document.page_content for document in documents]
+    )
+    return _rank(clients, question_embedding, documents, document_embeddings)
+
+
+async def arank_documents(
+    clients: ClientRegistry, question_embedding: list[float], documents: list[Document]
+) -> list[tuple[Document, float]]:
+    if not documents:
+        return []
+    if _is_fused(documents):
+        return _fused_ranking(documents)
+
+    document_embeddings = await clients.embedding.aembed_documents(
+        [document.page_content for document in documents]
+    )
+    return _rank(clients, question_embedding, documents, document_embeddings)
+
+
+def _rank(
+    clients: ClientRegistry,
+    question_embedding: list[float],
+    documents: list[Document],
+    document_embeddings: list[list[float]],
+) -> list[tuple[Document, float]]:
+    # The collection uses Chroma's default "l2" space, whose distances are squared euclidean distances
+    relevance_score_fn: Callable[[float], float] = (
+        clients.vector_db._select_relevance_score_fn()
+    )
+    distances = np.sum(
+        (np.asarray(document_embeddings) - np.asarray(question_embedding)) ** 2, axis=1
+    )
+    scored = sorted(
+        (
+            (document, relevance_score_fn(float(distance)))
+            for document, distance in zip(documents, distances)
+        ),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    ranked = [
+        (document, score)
+        for document, score in scored[: settings.RETRIEVAL_TOP_K]
+        if score >= settings.RETRIEVAL_MIN_SCORE
+    ]
+    LLM_LOGGER.debug(
+        f"Kept {len(ranked)} of {len(documents)} retrieved chunks "
+        f"(top_k={settings.RETRIEVAL_TOP_K}, min_score={settings.RETRIEVAL_MIN_SCORE})"
+    )
+    return ranked
+
+
+def _is_fused(documents: list[Document]) -> bool:
+    return all("relevance_score" in document.metadata for document in documents)
+
+
+def _fused_ranking(documents: list[Document]) -> list[tuple[Document, float]]:
+    ranked = []
+    for document in documents:
+        metadata = dict(document.metadata)
+        score = metadata.pop("relevance_score")
+        ranked.append(
+            (Document(page_content=document.page_content, metadata=metadata), score)
+        )
+    LLM_LOGGER.debug(f"Kept the {len(ranked)} fused chunks in fused order")
+    return ranked
+
+
+def to_scored_sources(ranked: list[tuple[Document, float]]) -> list[ScoredSource]:
+    """
+    Sources are shown as the JSON they were ingested from, when the chunk was
+    rendered compactly for the prompt or holds primitive records.
+    """
+    sources: list[ScoredSource] = []
+    for document, score in ranked:
+        metadata = dict(document.metadata)
+        text = metadata.pop("json", document.page_content)
+        sources.append({"score": score, "document": text, "metadata": metadata})
+    return sources
+
+
+# Answers an exact lookup ("what is Bob Johnson's work phone") from the field index, or returns
+# None so the question goes through retrieval and generation
+def lookup_fields(clients: ClientRegistry, input_: Input) -> QueryResponse | None:
+    if not settings.FIELD_LOOKUP_ENABLED:
+        return None
+
+    matches = clients.field_index.lookup(input_)
+    if not matches:
+        return None
+
+    stored = clients.vector_db.get(
+        ids=list(dict.fromkeys(match.chunk_id for match in matches)),
+        include=["documents", "metadatas"],
+    )
+    sources = to_scored_sources(
+        [
+            (Document(page_content=content, metadata=metadata or {}), 1.0)
+            for content, metadata in zip(stored["documents"], stored["metadatas"])
+        ]
+    )
+    LLM_LOGGER.debug(
+        f"Field lookup answered with {len(matches)} fields: "
+        f"{[match.path for match in matches]}"
+    )
+    return {
+        "found": True,
+        "answer": format_field_answer(matches),
+        "results": sources,
+        "lookup": True,
+    }
+
+
+def format_field_answer(matches: list[FieldMatch]) -> str:
+    show_source = len({(match.source, match.record) for match in matches}) > 1
+    lines = []
+    for match in matches:
+        line = f"The {match.path} of {match.subject} is {match.value}"
+        if show_source:
+            record = "" if match.record is None else f", record {match.record}"
+            line += f" ({match.source}{record})"
+        lines.append(line + ".")
+    return "\n".join(lines)
+
+
 # Main function to handle the query process
-def query(input_: Input) -> str | None:
+def query(input_: Input) -> QueryResponse | None:
     if input_:
-        # Initialize the language model with the specified model name
-        llm = ChatOllama(model=settings.LLM_MODEL)
-        # Get the vector database instance
-        db = get_vector_db()
-        # Get the prompt templates
-        query_prompt, prompt = get_prompt()
-
-        # Set up the retriever to generate multiple queries using the language model and the query prompt
-        retriever = MultiQueryRetriever.from_llm(
-            db.as_retriever(), llm, prompt=query_prompt
+        # Reuse the process-wide language model and vector database clients
+        clients = get_clients()
+        if (answer := lookup_fields(clients, input_)) is not None:
+            return answer
+
+        question_embedding = clients.embedding.embed_query(input_)
+
+        # Return a stored answer if a semantically equivalent question was already answered
+        if settings.ANSWER_CACHE_ENABLED:
+            cache_generation = answer_cache.generation
+            if (cached := answer_cache.lookup(question_embedding)) is not None:
+                return {
+                    "found": True,
+                    "answer": cached.answer,
+                    "results": cached.sources,
+                    "cached": True,
+                }
+
+        documents = get_retriever(clients).invoke(input_)
+        ranked = rank_documents(clients, question_embedding, documents)
+        if not ranked:
+            return {"found": False, "results": []}
+
+        context = pack_context(ranked, settings.CONTEXT_TOKEN_BUDGET)
+        response = get_answer_chain(clients).invoke(
+            {"context": context.text, "question": input_}
         )
+        sources = to_scored_sources(context.documents)
+
+        if settings.ANSWER_CACHE_ENABLED:
+            answer_cache.store(
+                input_, question_embedding, response, cache_generation, sources
+            )
 
-        # Define the processing chain to retrieve context, generate the answer, and parse the output
-        chain = (
-            {"context": retriever, "question": RunnablePassthrough()}
-            | prompt
-            | llm
-            | StrOutputParser()
+        return {"found": True, "answer": response, "results": sources}
+
+    return None
+
+
+# Async variant of `query`: cancelling the awaiting task also cancels the in-flight Ollama requests
+async def aquery(input_: Input) -> QueryResponse | None:
+    if input_:
+        clients = get_clients()
+        answer = await asyncio.to_thread(lookup_fields, clients, input_)
+        if answer is not None:
+            return answer
+
+        question_embedding = await clients.embedding.aembed_query(input_)
+
+        if settings.ANSWER_CACHE_ENABLED:
+            cache_generation = answer_cache.generation
+            if (cached := answer_cache.lookup(question_embedding)) is not None:
+                return {
+                    "found": True,
+                    "answer": cached.answer,
+                    "results": cached.sources,
+                    "cached": True,
+                }
+
+        documents = await get_retriever(clients).ainvoke(input_)
+        ranked = await arank_documents(clients, question_embedding, documents)
+        if not ranked:
+            return {"found": False, "results": []}
+
+        context = pack_context(ranked, settings.CONTEXT_TOKEN_BUDGET)
+        response = await get_answer_chain(clients).ainvoke(
+            {"context": context.text, "question": input_}
         )
+        sources = to_scored_sources(context.documents)
 
-        response = chain.invoke(input_)
+        if settings.ANSWER_CACHE_ENABLED:
+            answer_cache.store(
+                input_, question_embedding, response, cache_generation, sources
+            )
 
-        return response
+        return {"found": True, "answer": response, "results": sources}
 
     return None
+
+
+# Streaming variant of `query`: yields the scored sources first, then the answer tokens as they are generated.
+# No tokens are yielded when no source is retrieved (or, without hybrid retrieval, scores at least `RETRIEVAL_MIN_SCORE`)
+async def astream_query(input_: Input) -> AsyncIterator[StreamEvent]:
+    if not input_:
+        return
+
+    clients = get_clients()
+    if (answer := await asyncio.to_thread(lookup_fields, clients, input_)) is not None:
+        yield {"type": "sources", "sources": answer["results"]}
+        yield {"type": "token", "token": answer["answer"]}
+        return
+
+    question_embedding = await clients.embedding.aembed_query(input_)
+
+    if settings.ANSWER_CACHE_ENABLED:
+        cache_generation = answer_cache.generation
+        if (cached := answer_cache.lookup(question_embedding)) is not None:
+            yield {"type": "sources", "sources": cached.sources, "cached": True}
+            yield {"type": "token", "token": cached.answer, "cached": True}
+            return
+
+    documents = await get_retriever(clients).ainvoke(input_)
+    ranked = await arank_documents(clients, question_embedding, documents)
+    context = pack_context(ranked, settings.CONTEXT_TOKEN_BUDGET)
+    sources = to_scored_sources(context.documents)
+    yield {"type": "sources", "sources": sources}
+    if not ranked:
+        return
+
+    answer_parts = []
+    async for token in get_answer_chain(clients).astream(
+        {"context": context.text, "question": input_}
+    ):
+        answer_parts.append(token)
+        yield {"type": "token", "token": token}
+
+    if settings.ANSWER_CACHE_ENABLED:
+        answer_cache.store(
+            input_,
+            question_embedding,
+            "".join(answer_parts),
+            cache_generation,
+            sources,
+        )
@@ -0,0 +1,233 @@
+import asyncio
+import json
+from concurrent.futures import Executor
+
+from langchain.retrievers.multi_query import MultiQueryRetriever
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStoreRetriever
+
+from custom_loggers import LLM_LOGGER
+from llms.lexical_index import LexicalIndex
+
+
+class BatchedMultiQueryRetriever(MultiQueryRetriever):
+    """
+    A `MultiQueryRetriever` that embeds every generated query in a single
+    batched embedding request and runs the vector searches concurrently.
+    Query generation and the unique union of the results are inherited
+    unchanged, so the merged documents are the same as the sequential version.
+    """
+
+    retriever: VectorStoreRetriever
+    executor: Executor
+
+    def _search_kwargs(self) -> dict:
+        return {"k": 4, **self.retriever.search_kwargs}
+
+    def retrieve_documents(
+        self,
+        queries: list[str],
+        run_manager: CallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        if not queries:
+            return []
+
+        vectorstore = self.retriever.vectorstore
+        search_kwargs = self._search_kwargs()
+        query_embeddings = vectorstore.embeddings.embed_documents(queries)
+        LLM_LOGGER.debug(f"Embedded {len(queries)} queries in one batch")
+
+        document_lists = self.executor.map(
+            lambda embedding: vectorstore.similarity_search_by_vector(
+                embedding, **search_kwargs
+            ),
+            query_embeddings,
+        )
+        return [doc for docs in document_lists for doc in docs]
+
+    async def aretrieve_documents(
+        self,
+        queries: list[str],
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        if not queries:
+            return []
+
+        vectorstore = self.retriever.vectorstore
+        search_kwargs = self._search_kwargs()
+        query_embeddings = await vectorstore.embeddings.aembed_documents(queries)
+        LLM_LOGGER.debug(f"Embedded {len(queries)} queries in one batch")
+
+        loop = asyncio.get_running_loop()
+        document_lists = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self.executor,
+                    lambda embedding=embedding: vectorstore.similarity_search_by_vector(
+                        embedding, **search_kwargs
+                    ),
+                )
+                for embedding in query_embeddings
+            )
+        )
+        return [doc for docs in document_lists for doc in docs]
+
+
+class AdaptiveRetriever(BaseRetriever):
+    """
+    Runs a single vector search first and only falls back to LLM query
+    rewriting when the best similarity score is below `min_score`.
+    """
+
+    retriever: VectorStoreRetriever
+    multi_query_retriever: MultiQueryRetriever
+    min_score: float
+
+    def _is_good_enough(self, docs_and_scores: list[tuple[Document, float]]) -> bool:
+        best_score = max((score for _, score in docs_and_scores), default=None)
+        if best_score is not None and best_score >= self.min_score:
+            LLM_LOGGER.debug(
+                f"Best score {best_score:.3f} >= {self.min_score}, skipping query rewriting"
+            )
+            return True
+
+        LLM_LOGGER.debug(
+            f"Best score {best_score} below {self.min_score}, rewriting the query"
+        )
+        return False
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        docs_and_scores = (
+            self.retriever.vectorstore.similarity_search_with_relevance_scores(
+                query, **self.retriever.search_kwargs
+            )
+        )
+        if self._is_good_enough(docs_and_scores):
+            return [doc for doc, _ in docs_and_scores]
+
+        return self.multi_query_retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        docs_and_scores = (
+            await self.retriever.vectorstore.asimilarity_search_with_relevance_scores(
+                query, **self.retriever.search_kwargs
+            )
+        )
+        if self._is_good_enough(docs_and_scores):
+            return [doc for doc, _ in docs_and_scores]
+
+        return await self.multi_query_retriever.ainvoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Combines BM25 results from the `LexicalIndex` with the results of
+    `vector_retriever` using reciprocal rank fusion.
+    Queries containing exact identifiers (emails, IPs, phone numbers,
+    redaction placeholders) that the lexical index can resolve are answered
+    from the index alone, without a vector search.
+    The documents are returned in fused order, each with its fused score as
+    `metadata["relevance_score"]`. The async path runs the lexical search on
+    `executor`, off the event loop.
+    """
+
+    vector_retriever: BaseRetriever
+    lexical_index: LexicalIndex
+    executor: Executor
+    k: int = 4
+    rrf_k: int = 60
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _identifier_matches(self, query: str) -> list[Document]:
+        matches = self.lexical_index.search_identifiers(query, self.k)
+        if matches:
+            LLM_LOGGER.debug(
+                f"Exact identifier match in {len(matches)} chunks, skipping vector search"
+            )
+        return [
+            self._scored(doc, 1 / (self.rrf_k + rank + 1))
+            for rank, doc in enumerate(matches)
+        ]
+
+    @staticmethod
+    def _scored(doc: Document, score: float) -> Document:
+        # A copy, the lexical index hands out the documents it holds
+        return Document(
+            page_content=doc.page_content,
+            metadata={**doc.metadata, "relevance_score": score},
+        )
+
+    def _fuse(
+        self, lexical_results: list[tuple[Document, float]], vector_docs: list[Document]
+    ) -> list[Document]:
+        scores: dict[tuple[str, str], float] = {}
+        documents: dict[tuple[str, str], Document] = {}
+        for ranking in ([doc for doc, _ in lexical_results], vector_docs):
+            for rank, doc in enumerate(ranking):
+                key = (doc.page_content, json.dumps(doc.metadata, sort_keys=True))
+                documents.setdefault(key, doc)
+                scores[key] = scores.get(key, 0.0) + 1 / (self.rrf_k + rank + 1)
+
+        LLM_LOGGER.debug(
+            f"Fused {len(lexical_results)} lexical and {len(vector_docs)} vector results "
+            f"into {len(documents)} documents"
+        )
+        return [
+            self._scored(documents[key], scores[key])
+            for key in sorted(scores, key=scores.get, reverse=True)
+        ]
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        if matches := self._identifier_matches(query):
+            return matches
+
+        lexical_results = self.lexical_index.search(query, self.k)
+        vector_docs = self.vector_retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        return self._fuse(lexical_results, vector_docs)
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        loop = asyncio.get_running_loop()
+        if matches := await loop.run_in_executor(
+            self.executor, self._identifier_matches, query
+        ):
+            return matches
+
+        lexical_results = await loop.run_in_executor(
+            self.executor, self.lexical_index.search, query, self.k
+        )
+        vector_docs = await self.vector_retriever.ainvoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        return self._fuse(lexical_results, vector_docs)
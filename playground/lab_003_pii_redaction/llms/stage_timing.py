@@ -0,0 +1,86 @@
+import time
+from collections import defaultdict
+from contextlib import AbstractContextManager, nullcontext
+from contextvars import ContextVar
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    """
+    Adds up the time spent in each ingestion stage on the current thread.
+    Stages nest, and a stage's time excludes the stages nested in it, e.g.
+    reading the file while records are parsed counts as `read`, not `parse`.
+    """
+
+    def __init__(self) -> None:
+        self.seconds: dict[str, float] = defaultdict(float)
+        self._stack: list[list] = []
+
+    def stage(self, name: str) -> "_Stage":
+        return _Stage(self, name)
+
+    def _enter(self, name: str) -> None:
+        now = time.perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.seconds[parent[0]] += now - parent[1]
+        self._stack.append([name, now])
+
+    def _exit(self) -> None:
+        now = time.perf_counter()
+        name, started = self._stack.pop()
+        self.seconds[name] += now - started
+        if self._stack:
+            self._stack[-1][1] = now
+
+
+class _Stage:
+    __slots__ = ("timer", "name")
+
+    def __init__(self, timer: StageTimer, name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.timer._enter(self.name)
+
+    def __exit__(self, *exc_info) -> None:
+        self.timer._exit()
+
+
+# Set by whoever wants the stage timings of an ingestion, e.g. the benchmarks
+stage_timer: ContextVar[StageTimer | None] = ContextVar("stage_timer", default=None)
+
+_untimed = nullcontext()
+_DONE = object()
+
+
+def timed_stage(name: str) -> AbstractContextManager:
+    """
+    Times the block as stage `name` when a `stage_timer` is set, and costs
+    next to nothing otherwise.
+    """
+    timer = stage_timer.get()
+    return _untimed if timer is None else timer.stage(name)
+
+
+def timed_iter(items: Iterable[T], name: str) -> Iterator[T]:
+    """
+    Yields the items, timing the production of each one as stage `name`.
+    Without a `stage_timer` the items' own iterator is returned as it is.
+    """
+    timer = stage_timer.get()
+    if timer is None:
+        return iter(items)
+    return _timed_iter(iter(items), timer.stage(name))
+
+
+def _timed_iter(iterator: Iterator[T], stage: "_Stage") -> Iterator[T]:
+    while True:
+        with stage:
+            item = next(iterator, _DONE)
+        if item is _DONE:
+            return
+        yield item
@@ -0,0 +1,70 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+from config import settings
+from custom_loggers import DEFAULT_LOGGER
+from llms.clients import ClientRegistry, init_clients
+
+
+@dataclass
+class StartupStatus:
+    ready: bool = False
+    error: str | None = None
+    attempts: int = 0
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+startup_status = StartupStatus()
+
+
+async def warm_up() -> None:
+    """
+    Opens the vector store and loads the chat and embedding models into Ollama
+    (kept loaded for `OLLAMA_KEEP_ALIVE` seconds), retrying every
+    `WARMUP_RETRY_SECONDS` until every step succeeds.
+    The outcome and per-step timings are reported by `/readyz`.
+    """
+    while not startup_status.ready:
+        startup_status.attempts += 1
+        try:
+            startup_status.timings = await _run_warm_up_steps()
+            startup_status.error = None
+            startup_status.ready = True
+            DEFAULT_LOGGER.debug(f"Warm-up finished: {startup_status.timings}")
+        except Exception as error:
+            startup_status.error = str(error)
+            DEFAULT_LOGGER.error(
+                f"Warm-up attempt {startup_status.attempts} failed: {error}. "
+                f"Retrying in {settings.WARMUP_RETRY_SECONDS}s..."
+            )
+            await asyncio.sleep(settings.WARMUP_RETRY_SECONDS)
+
+
+async def _run_warm_up_steps() -> dict[str, float]:
+    timings: dict[str, float] = {}
+    started = time.perf_counter()
+
+    step_started = time.perf_counter()
+    clients: ClientRegistry = await asyncio.to_thread(init_clients)
+    await asyncio.to_thread(clients.vector_db._collection.count)
+    timings["vector_store_ms"] = _elapsed_ms(step_started)
+
+    # An empty prompt loads the model without generating anything
+    step_started = time.perf_counter()
+    await clients.llm._async_client.generate(
+        model=settings.LLM_MODEL, prompt="", keep_alive=settings.OLLAMA_KEEP_ALIVE
+    )
+    timings["chat_model_ms"] = _elapsed_ms(step_started)
+
+    # Bypasses the embedding cache, which would answer without loading the model
+    step_started = time.perf_counter()
+    await clients.ollama_embedding.aembed_query("warm-up")
+    timings["embedding_model_ms"] = _elapsed_ms(step_started)
+
+    timings["total_ms"] = _elapsed_ms(started)
+    return timings
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
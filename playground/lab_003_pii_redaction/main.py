@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import (
@@ -6,18 +7,43 @@ from fastapi import (
     UploadFile,
 )
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 
 from config import settings
 from custom_loggers import DEFAULT_LOGGER
-from websocket.handler import handle_websocket as do_handle_websocket
-from api_handlers import handle_document_upload as do_handle_document_upload
+from llms.answer_cache import answer_cache
+from llms.clients import close_clients, get_clients
+from llms.warmup import startup_status, warm_up
+from ingestion_jobs import IngestionJob, ingestion_queue
+from websocket.handler import (
+    handle_websocket as do_handle_websocket,
+    send_job_update,
+)
+from api_handlers import (
+    handle_document_upload as do_handle_document_upload,
+    handle_documents_upload as do_handle_documents_upload,
+    handle_job_status as do_handle_job_status,
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     settings.TEMP_FOLDER.mkdir(exist_ok=True)
+    # Warm up in the background so /healthz answers while the models load
+    warm_up_task = asyncio.create_task(warm_up())
+
+    # Ingestion jobs run on worker threads, their updates are pushed from the event loop
+    loop = asyncio.get_running_loop()
+
+    def push_job_update(job: IngestionJob) -> None:
+        asyncio.run_coroutine_threadsafe(send_job_update(job.to_dict()), loop)
+
+    ingestion_queue.add_listener(push_job_update)
+
     yield
+    warm_up_task.cancel()
+    ingestion_queue.shutdown()
+    await close_clients()
     # Clean up here...
     # TODO: might cleanup temp folder on server shutdown
 
@@ -32,13 +58,50 @@ async def serve_index():
     return FileResponse("static/index.html")
 
 
-@app.post("/upload-document/")
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    if startup_status.ready:
+        return {
+            "status": "ready",
+            "timings": startup_status.timings,
+            "answer_cache": answer_cache.stats(),
+            "embedding_cache": get_clients().embedding.stats(),
+        }
+
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "warming_up",
+            "attempts": startup_status.attempts,
+            "error": startup_status.error,
+        },
+    )
+
+
+@app.post("/upload-document/", status_code=202)
 async def handle_document_upload(
     file: UploadFile,
 ):
     return await do_handle_document_upload(file)
 
 
+@app.post("/upload-documents/", status_code=202)
+async def handle_documents_upload(
+    files: list[UploadFile],
+):
+    return await do_handle_documents_upload(files)
+
+
+@app.get("/jobs/{job_id}")
+async def handle_job_status(job_id: str):
+    return await do_handle_job_status(job_id)
+
+
 @app.websocket("/ws")
 async def handle_websocket(websocket: WebSocket):
     await do_handle_websocket(websocket)
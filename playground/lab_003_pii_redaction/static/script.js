@@ -8,6 +8,7 @@ const uploadButton = document.getElementById('uploadButton'); // New
 
 let ws;
 let isConnected = false;
+let streamingBubble = null; // AI message bubble currently receiving streamed tokens
 
 function connectWebSocket() {
   // Use the current host and port for WebSocket connection
@@ -25,6 +26,10 @@ function connectWebSocket() {
     if (!protectionToggle.checked) {
       sendToggleState(false);
     }
+    // Watch again the jobs still running when the connection was lost
+    Object.entries(jobStatuses)
+      .filter(([, status]) => !['succeeded', 'failed'].includes(status))
+      .forEach(([jobId]) => watchJob(jobId));
   });
 
   ws.addEventListener('close', () => {
@@ -44,8 +49,12 @@ function connectWebSocket() {
 
   ws.addEventListener('message', (event) => {
     const message = event.data;
-    // Check if the message is a system message about mode change
-    if (message.startsWith("Mode switched to:")) {
+    // Streaming frames are JSON objects; everything else is plain text
+    const frame = parseStreamFrame(message);
+    if (frame) {
+      handleStreamFrame(frame);
+    } else if (message.startsWith("Mode switched to:")) {
+      // Check if the message is a system message about mode change
       displaySystemMessage(message);
     } else {
       displayMessage(message, false); // Display as AI message
@@ -53,6 +62,72 @@ function connectWebSocket() {
   });
 }
 
+function parseStreamFrame(message) {
+  if (!message.startsWith('{')) return null;
+  try {
+    const frame = JSON.parse(message);
+    return ['sources', 'token', 'end', 'job'].includes(frame.type) ? frame : null;
+  } catch (error) {
+    return null;
+  }
+}
+
+function handleStreamFrame(frame) {
+  if (frame.type === 'sources') {
+    const scores = frame.sources.map((source) => source.score).filter((score) => score != null);
+    const bestScore = scores.length ? ` (best score ${Math.max(...scores).toFixed(2)})` : '';
+    displaySystemMessage(`Found ${frame.sources.length} relevant sources${bestScore}. Generating answer...`);
+    streamingBubble = displayMessage('', false);
+  } else if (frame.type === 'token') {
+    if (!streamingBubble) {
+      streamingBubble = displayMessage('', false);
+    }
+    streamingBubble.textContent += frame.token;
+    messagesDiv.scrollTop = messagesDiv.scrollHeight;
+  } else if (frame.type === 'end') {
+    if (frame.error) {
+      displayMessage(frame.error, false);
+    }
+    const totalSeconds = (frame.timings.total_ms / 1000).toFixed(1);
+    console.log('Response timings (ms):', frame.timings);
+    displaySystemMessage(`Answered in ${totalSeconds}s`);
+    streamingBubble = null;
+  } else if (frame.type === 'job') {
+    handleJobUpdate(frame.job);
+  }
+}
+
+// Job updates are only pushed for the jobs this client asks for
+function watchJob(jobId) {
+  if (isConnected) {
+    ws.send(JSON.stringify({ type: 'watch_job', job_id: jobId }));
+  }
+}
+
+// Last reported status of each ingestion job, so only changes are shown
+const jobStatuses = {};
+
+function handleJobUpdate(job) {
+  const previousStatus = jobStatuses[job.id];
+  jobStatuses[job.id] = job.status;
+  if (job.status === 'running') {
+    if (previousStatus !== 'running') {
+      displaySystemMessage(`Embedding ${job.filename}...`);
+    } else if (job.chunks_written) {
+      displaySystemMessage(`Embedding ${job.filename}: ${job.chunks_written} chunks written`);
+    }
+  } else if (job.status === 'succeeded') {
+    displaySystemMessage(`Successfully uploaded and embedded: ${job.filename}. You can now query its content.`);
+  } else if (job.status === 'failed') {
+    displaySystemMessage(`Embedding ${job.filename} failed: ${job.error || 'Unknown error'}`);
+  }
+  if (job.files && ['succeeded', 'failed'].includes(job.status)) {
+    job.files
+      .filter((file) => !file.success)
+      .forEach((file) => displaySystemMessage(`Could not embed ${file.filename}: ${file.error}`));
+  }
+}
+
 // Initialize WebSocket connection
 connectWebSocket();
 
@@ -98,7 +173,8 @@ function sendMessage() {
 
   const chatMessage = JSON.stringify({
     type: 'chat',
-    message: message
+    message: message,
+    stream: true
   });
 
   ws.send(chatMessage);
@@ -125,6 +201,7 @@ function displayMessage(message, isSender = false) {
 
   // Scroll to the bottom of the messages container
   messagesDiv.scrollTop = messagesDiv.scrollHeight;
+  return messageElement;
 }
 
 function displaySystemMessage(message) {
@@ -139,26 +216,41 @@ uploadButton.addEventListener('click', () => {
   fileUpload.click(); // Trigger the hidden file input click
 });
 
+// Archives and multi-file selections go to the bulk endpoint as one job
+const ARCHIVE_SUFFIXES = ['.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz'];
+
+function isArchive(file) {
+  const name = file.name.toLowerCase();
+  return ARCHIVE_SUFFIXES.some((suffix) => name.endsWith(suffix));
+}
+
 fileUpload.addEventListener('change', async (event) => {
-  const file = event.target.files[0];
-  if (!file) {
+  const files = Array.from(event.target.files);
+  if (!files.length) {
     return;
   }
 
-  displaySystemMessage(`Attempting to upload file: ${file.name}...`);
+  const isBulk = files.length > 1 || isArchive(files[0]);
+  const names = files.map((file) => file.name).join(', ');
+  displaySystemMessage(`Attempting to upload: ${names}...`);
 
   const formData = new FormData();
-  formData.append('file', file);
+  if (isBulk) {
+    files.forEach((file) => formData.append('files', file));
+  } else {
+    formData.append('file', files[0]);
+  }
 
   try {
-    const response = await fetch('/upload-document/', {
+    const response = await fetch(isBulk ? '/upload-documents/' : '/upload-document/', {
       method: 'POST',
       body: formData,
     });
 
     if (response.ok) {
       const result = await response.json();
-      displaySystemMessage(`Successfully uploaded and embedded: ${result.filename}. You can now query its content.`);
+      displaySystemMessage(`Uploaded ${names}, queued for embedding as job ${result.job_id}.`);
+      watchJob(result.job_id);
     } else {
       const errorData = await response.json();
       displaySystemMessage(`File upload failed: ${errorData.detail || 'Unknown error'}`);
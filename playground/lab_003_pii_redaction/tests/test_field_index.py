@@ -0,0 +1,97 @@
+import pytest
+
+from llms.field_index import FieldIndex
+from llms.json_chunker import chunk_records
+from llms.json_stream import JSONRecord
+
+RECORDS = [
+    {
+        "name": "Alice Smith",
+        "email": "alice.smith@example.com",
+        "work_phone": "+1-555-200-2001",
+        "phone_number": "+1-555-100-1001",
+        "department": "Sales",
+        "manager": "Bob Johnson",
+    },
+    {
+        "name": "Bob Johnson",
+        "email": "bob.johnson@example.com",
+        "work_phone": "+1-555-200-2002",
+        "phone_number": "+1-555-100-1002",
+        "department": "Sales",
+        "manager": "Diana Prince",
+    },
+    {
+        "name": "Charlie Brown",
+        "email": "charlie.brown@example.com",
+        "work_phone": "+1-555-200-2003",
+        "phone_number": "+1-555-100-1003",
+        "department": "Sales",
+        "manager": "Bob Johnson",
+    },
+]
+
+
+def index_records(
+    index: FieldIndex, records: list, source: str = "contacts.json"
+) -> None:
+    chunks = chunk_records(
+        [
+            JSONRecord(record, "json_array_item", index)
+            for index, record in enumerate(records)
+        ],
+        source,
+        target_chars=1500,
+        rendering="compact",
+    )
+    index.add([f"{source}-{position}" for position in range(len(chunks))], chunks)
+
+
+@pytest.fixture
+def index(tmp_path):
+    field_index = FieldIndex(tmp_path / "field_index.sqlite3")
+    index_records(field_index, RECORDS)
+    yield field_index
+    field_index.close()
+
+
+def answers(index: FieldIndex, question: str) -> list[tuple[int | None, str, str]]:
+    return [(match.record, match.path, match.value) for match in index.lookup(question)]
+
+
+def test_looks_up_a_field_of_the_named_record(index):
+    assert answers(index, "What is Bob Johnson's work phone?") == [
+        (1, "work_phone", "+1-555-200-2002")
+    ]
+    assert answers(index, "who is charlie.brown@example.com") == [
+        (2, "name", "Charlie Brown")
+    ]
+
+
+def test_subject_in_a_non_identifying_field_is_ignored(index):
+    # Alice and Charlie have Bob Johnson as `manager`, only Bob is named so
+    assert answers(index, "what is the work phone of bob johnson") == [
+        (1, "work_phone", "+1-555-200-2002")
+    ]
+
+
+def test_question_about_the_subject_field_itself_is_not_answered(index):
+    assert answers(index, "Is the name Bob Johnson in the data?") == []
+
+
+def test_shared_values_are_not_subjects(index):
+    assert answers(index, "Who manages sales?") == []
+    assert answers(index, "Who is in Sales?") == []
+
+
+def test_subject_in_several_records_is_not_answered(index, tmp_path):
+    index_records(index, RECORDS[1:2], source="other.json")
+    assert answers(index, "What is Bob Johnson's work phone?") == []
+
+
+def test_partly_named_field_is_not_answered(index):
+    # Both `work_phone` and `phone_number` are partial matches for "phone"
+    assert answers(index, "What is Bob Johnson's phone?") == []
+    assert answers(index, "What is Bob Johnson's phone number?") == [
+        (1, "phone_number", "+1-555-100-1002")
+    ]
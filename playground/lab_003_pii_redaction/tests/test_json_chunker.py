@@ -0,0 +1,77 @@
+import pytest
+from langchain_core.documents import Document
+
+from llms.field_index import FieldIndex
+from llms.json_chunker import chunk_records, chunk_values, render_value
+from llms.json_stream import JSONRecord
+
+VALUES = [
+    {"name": "Alice Smith", "work_phone": "+1-555-200-2001"},
+    "just text",
+    True,
+    {"name": "Carol White", "work_phone": "+1-555-200-2003"},
+]
+
+
+def chunk(rendering: str) -> Document:
+    (document,) = chunk_records(
+        [
+            JSONRecord(value, "json_array_item", index)
+            for index, value in enumerate(VALUES)
+        ],
+        "contacts.json",
+        target_chars=1500,
+        rendering=rendering,
+    )
+    return document
+
+
+def test_chunk_values_keep_primitive_records():
+    assert chunk_values(chunk("json")) == VALUES
+    assert chunk_values(chunk("compact")) == VALUES
+
+
+def test_chunk_values_skip_bare_text_of_older_chunks():
+    # Stored before `json` held primitive records: the bare text is skipped,
+    # keeping the later values at their record's offset
+    document = Document(
+        page_content='{"name": "Alice Smith"}\njust text\n{"name": "Carol White"}',
+        metadata={"item_index": 0, "item_index_end": 2},
+    )
+    assert chunk_values(document) == [
+        {"name": "Alice Smith"},
+        None,
+        {"name": "Carol White"},
+    ]
+
+
+def test_records_after_a_primitive_are_indexed(tmp_path):
+    index = FieldIndex(tmp_path / "field_index.sqlite3")
+    index.add(["chunk"], [chunk("json")])
+    matches = index.lookup("what is Carol White's work phone")
+    index.close()
+
+    assert [(match.record, match.value) for match in matches] == [
+        (3, "+1-555-200-2003")
+    ]
+
+
+@pytest.mark.parametrize(
+    ("value", "rendered"),
+    [
+        (
+            {"city": "Lyon", "zip": 69001, "vip": None},
+            "city: Lyon\nzip: 69001\nvip: null",
+        ),
+        (
+            {"status": "null", "count": "42", "flag": "true"},
+            'status: "null"\ncount: "42"\nflag: "true"',
+        ),
+        ({"tags": ["a, b"]}, 'tags: "a, b"'),
+        ({"tags": ["a", "b"]}, "tags: a, b"),
+        ({"a.b": 1, "a": {"b": 2}}, '"a.b": 1\na.b: 2'),
+        ({"note": "", "padded": " x"}, 'note: ""\npadded: " x"'),
+    ],
+)
+def test_compact_rendering_is_unambiguous(value, rendered):
+    assert render_value(value, "compact") == rendered
@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+
+import pytest
+
+from llms import json_stream
+from llms.json_stream import iter_csv_rows, iter_json_records
+
+ITEMS = [{"name": "Alice Smith"}, "x" * 5000, 12.5, [1, 2, {"a": None}], True]
+
+
+@pytest.fixture(params=[1, 7, 1 << 16])
+def read_size(request, monkeypatch):
+    monkeypatch.setattr(json_stream, "READ_SIZE", request.param)
+    return request.param
+
+
+def test_array_items_across_reads(read_size):
+    text = json.dumps(ITEMS, indent=2)
+    assert [record.value for record in iter_json_records(io.StringIO(text))] == ITEMS
+
+
+class SplitReader(io.StringIO):
+    """A stream whose first read ends at `split`, whatever the size asked for."""
+
+    def __init__(self, text: str, split: int):
+        super().__init__(text)
+        self.split = split
+
+    def read(self, size: int = -1) -> str:
+        if self.tell() < self.split:
+            return super().read(self.split - self.tell())
+        return super().read(size)
+
+
+def test_numbers_split_across_reads():
+    text = "[1.5, -2e10, 3.25E-7, 40, 0.125e+3]"
+    for split in range(1, len(text)):
+        records = iter_json_records(SplitReader(text, split))
+        assert [record.value for record in records] == json.loads(text), split
+
+
+def test_array_item_too_large(monkeypatch):
+    monkeypatch.setattr(json_stream, "READ_SIZE", 100)
+    monkeypatch.setattr(json_stream, "MAX_ITEM_CHARS", 1000)
+    with pytest.raises(json.JSONDecodeError, match="exceeds 1000 characters"):
+        list(iter_json_records(io.StringIO(json.dumps([{"a": 1}, "x" * 5000]))))
+
+
+def test_malformed_array():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_records(io.StringIO('[{"a": 1} {"b": 2}]')))
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_records(io.StringIO('[{"a": 1},')))
+
+
+def test_csv_rows():
+    text = 'name,notes\nAlice,"two\nlines"\n\nBob,\n'
+    records = list(iter_csv_rows(io.StringIO(text)))
+
+    assert [record.value for record in records] == [
+        {"name": "Alice", "notes": "two\nlines"},
+        {"name": "Bob", "notes": ""},
+    ]
+    assert [record.row for record in records] == [2, 5]
+
+
+@pytest.mark.parametrize(
+    ("text", "message"),
+    [
+        ("a,b\n1,2\n3,4,5,6\n", "Line 3: expected 2 fields, got 4"),
+        ("a,b,c\n1,2,3\n4\n", "Line 3: expected 3 fields, got 1"),
+    ],
+)
+def test_ragged_csv_rows(text, message):
+    with pytest.raises(csv.Error, match=message):
+        list(iter_csv_rows(io.StringIO(text)))
@@ -0,0 +1,148 @@
+import pytest
+
+from llms.pii_filter import needs_remote_scan, redact_locally, replace_strings
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "ticket from josé garcía about billing",
+        "customer alice smith called",
+        "Spoke to Dana",
+        "Müller",
+        "Bob Johnson",
+        "Escalated by [REDACTED_PERSON_1], ask for dana",
+        "account 123456789",
+        "4111 1111 1111 1111",
+    ],
+)
+def test_free_text_is_scanned_remotely(text):
+    assert needs_remote_scan(text)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "42",
+        "12.50",
+        "2024-05-01",
+        "12:30:45",
+        "true",
+        "in_progress",
+        "EUR",
+        "[REDACTED_PERSON_1]",
+        "[REDACTED_EMAIL_ADDRESS_1], [REDACTED_PHONE_NUMBER_2]",
+    ],
+)
+def test_values_without_free_text_are_not_scanned(text):
+    assert not needs_remote_scan(text)
+
+
+def test_record_candidates():
+    redaction = redact_locally(
+        {
+            "name": "Bob Johnson",
+            "email": "bob.johnson@example.com",
+            "status": "active",
+            "notes": "customer alice smith called from 192.168.1.2",
+        }
+    )
+
+    assert redaction.value["name"] == "[REDACTED_PERSON_1]"
+    assert redaction.value["status"] == "active"
+    assert redaction.candidates == [
+        "customer alice smith called from [REDACTED_IP_ADDRESS_1]"
+    ]
+
+
+def test_remote_placeholders_are_numbered_per_record():
+    notes = "Escalated by Alice Smith, cc Bob Johnson"
+    redaction = redact_locally({"customer_name": "Bob Johnson", "notes": notes})
+    # The remote redactor numbers every string from 1
+    remote = "Escalated by [REDACTED_PERSON_1], cc [REDACTED_PERSON_2]"
+
+    assert redaction.merge_remote(notes, remote) == (
+        "Escalated by [REDACTED_PERSON_2], cc [REDACTED_PERSON_1]"
+    )
+    # The same separator between and after the placeholders
+    assert redaction.merge_remote(
+        "Alice Smith,Bob Johnson,", "[REDACTED_PERSON_1],[REDACTED_PERSON_2],"
+    ) == ("[REDACTED_PERSON_2],[REDACTED_PERSON_1],")
+
+
+def test_local_placeholders_kept_by_the_remote_redactor_stay():
+    redaction = redact_locally({"notes": "Mail from alice@example.com to Carol"})
+    (text,) = redaction.candidates
+    assert text == "Mail from [REDACTED_EMAIL_ADDRESS_1] to Carol"
+    remote = "Mail from [REDACTED_EMAIL_ADDRESS_1] to [REDACTED_PERSON_1]"
+
+    assert redaction.merge_remote(text, remote) == remote
+    redaction = redact_locally({"customer_name": "Dana", "notes": "Spoke to Carol"})
+    assert redaction.merge_remote("Spoke to Carol", "Spoke to [REDACTED_PERSON_1]") == (
+        "Spoke to [REDACTED_PERSON_2]"
+    )
+
+
+def test_unaligned_remote_placeholders_do_not_collide():
+    redaction = redact_locally({"customer_name": "Bob Johnson", "notes": "Call  Alice"})
+    # Whitespace changed, so the placeholder cannot be traced back to "Alice"
+    assert redaction.merge_remote("Call  Alice", "Call [REDACTED_PERSON_1]") == (
+        "Call [REDACTED_PERSON_2]"
+    )
+
+
+def test_misaligned_remote_output_falls_back_to_its_own_numbering():
+    names = [f"Person{number} Surname" for number in range(12)]
+    notes = "Met " + ", ".join(names) + "."
+    redaction = redact_locally({"customer_name": "Bob Johnson", "notes": notes})
+    # The final "." came back as "!", no placeholder can be traced back
+    remote = "Met " + ", ".join(f"[REDACTED_PERSON_{n}]" for n in range(1, 13)) + "!"
+    merged = redaction.merge_remote(notes, remote)
+
+    assert (
+        merged
+        == "Met " + ", ".join(f"[REDACTED_PERSON_{n}]" for n in range(2, 14)) + "!"
+    )
+    # Within the same string, a repeated placeholder keeps its number
+    assert redaction.merge_remote(
+        notes, "[REDACTED_PERSON_1] and [REDACTED_PERSON_1]"
+    ) == ("[REDACTED_PERSON_2] and [REDACTED_PERSON_2]")
+
+
+def test_bare_name_is_a_person_only_in_a_person_record():
+    contact = redact_locally({"name": "Alice", "phone": "+1-555-100-1001"})
+    assert contact.value["name"] == "[REDACTED_PERSON_1]"
+    assert redact_locally({"customer": {"name": "alice"}}).value == {
+        "customer": {"name": "[REDACTED_PERSON_1]"}
+    }
+
+    # Left to the remote redactor, even as a single lower-case token
+    product = redact_locally({"name": "Widget Pro", "sku": "wp-100"})
+    assert product.value == {"name": "Widget Pro", "sku": "wp-100"}
+    assert product.candidates == ["Widget Pro"]
+    assert redact_locally({"name": "alice"}).candidates == ["alice"]
+
+
+def test_number_leaves():
+    redaction = redact_locally(
+        {
+            "phone_number": 15551001001,
+            "account_number": 12345678,
+            "customer_id": 987654321012,
+            "quantity": 3,
+            "price": 12.5,
+            "active": True,
+        }
+    )
+
+    assert redaction.value["phone_number"] == "[REDACTED_PHONE_NUMBER_1]"
+    assert redaction.candidates == ["12345678", "987654321012"]
+    remote = {"12345678": "[REDACTED_US_BANK_NUMBER_1]", "987654321012": "987654321012"}
+    assert replace_strings(redaction.value, remote) == {
+        "phone_number": "[REDACTED_PHONE_NUMBER_1]",
+        "account_number": "[REDACTED_US_BANK_NUMBER_1]",
+        "customer_id": 987654321012,
+        "quantity": 3,
+        "price": 12.5,
+        "active": True,
+    }
@@ -1,12 +1,33 @@
+import asyncio
+from typing import Coroutine
+
 from fastapi import WebSocket, WebSocketDisconnect
 
+from config import settings
 from custom_loggers import WS_LOGGER, DEFAULT_LOGGER, LLM_LOGGER
-from websocket.primitives import WSMessage, WSToggleMessage, WSChatMessage
+from websocket.primitives import (
+    WSMessage,
+    WSToggleMessage,
+    WSChatMessage,
+    WSSourcesFrame,
+    WSTokenFrame,
+    WSEndFrame,
+    WSJobFrame,
+    WSWatchJobMessage,
+)
 from pydantic import ValidationError
+from ingestion_jobs import ingestion_queue
 from llms import protected_llm, vulnerable_llm
 
 contexts: dict[WebSocket, str] = {}
 protection_modes: dict[WebSocket, bool] = {}
+chat_tasks: dict[WebSocket, asyncio.Task] = {}
+# Clients watching each unfinished ingestion job. Job updates carry file names and
+# errors, so they only go to the clients that asked for the job by its id
+job_watchers: dict[str, set[WebSocket]] = {}
+
+# Bounds how many chat generations run against Ollama at once, across all clients
+chat_slots = asyncio.Semaphore(settings.CHAT_MAX_CONCURRENCY)
 
 
 async def handle_websocket(websocket: WebSocket):
@@ -47,6 +68,10 @@ async def handle_websocket(websocket: WebSocket):
                 )
                 continue
 
+            elif isinstance(message_root, WSWatchJobMessage):
+                await handle_ws_watch_job_message(websocket, message_root)
+                continue
+
             elif isinstance(message_root, WSChatMessage):
                 user_input = message_root.message.strip()
                 if not user_input:
@@ -56,12 +81,18 @@ async def handle_websocket(websocket: WebSocket):
                     )
                     continue
 
+                if message_root.stream:
+                    WS_LOGGER.debug(
+                        f"Calling stream_llm for a WSChatMessage from {websocket.client.host}:{websocket.client.port}."
+                    )
+                    start_chat_task(websocket, stream_llm(websocket, user_input))
+                    continue
+
                 WS_LOGGER.debug(
                     f"Calling run_llm for a WSChatMessage from {websocket.client.host}:{websocket.client.port}."
                 )
-                # run_llm is now async
-                result = await run_llm(websocket, user_input)
-                await websocket.send_text(result)
+                # A newer message cancels the chat still in flight for this client
+                start_chat_task(websocket, reply_llm(websocket, user_input))
 
             elif isinstance(
                 message_root, str
@@ -77,9 +108,8 @@ async def handle_websocket(websocket: WebSocket):
                 WS_LOGGER.debug(
                     f"Calling run_llm for a raw string message from {websocket.client.host}:{websocket.client.port}."
                 )
-                # run_llm is now async
-                result = await run_llm(websocket, user_input)
-                await websocket.send_text(result)
+                # A newer message cancels the chat still in flight for this client
+                start_chat_task(websocket, reply_llm(websocket, user_input))
 
             else:
                 # Fallback for unexpected but valid WSMessage types that aren't WSToggleMessage or WSChatMessage or str
@@ -94,6 +124,8 @@ async def handle_websocket(websocket: WebSocket):
         WS_LOGGER.debug(
             f"WebSocket disconnected for {websocket.client.host}:{websocket.client.port}"
         )
+        cancel_chat_task(websocket)
+        forget_job_watcher(websocket)
         if websocket in contexts:
             del contexts[websocket]
         if websocket in protection_modes:
@@ -103,6 +135,51 @@ async def handle_websocket(websocket: WebSocket):
             f"WebSocket error for {websocket.client.host}:{websocket.client.port}: {e}",
             exc_info=True,
         )
+        cancel_chat_task(websocket)
+        forget_job_watcher(websocket)
+
+
+def start_chat_task(websocket: WebSocket, chat: Coroutine) -> None:
+    """
+    Runs a chat reply in the background, cancelling the one still in flight
+    for this client, so the receive loop keeps listening while it runs.
+    """
+    cancel_chat_task(websocket)
+    task = asyncio.create_task(run_chat_task(websocket, chat))
+    chat_tasks[websocket] = task
+
+    def forget_task(done: asyncio.Task) -> None:
+        if chat_tasks.get(websocket) is done:
+            del chat_tasks[websocket]
+
+    task.add_done_callback(forget_task)
+
+
+def cancel_chat_task(websocket: WebSocket) -> None:
+    """
+    Cancels the chat reply still in flight for this client, if any.
+    """
+    task = chat_tasks.pop(websocket, None)
+    if task is not None and not task.done():
+        WS_LOGGER.debug(
+            f"Cancelling in-flight chat for {websocket.client.host}:{websocket.client.port}"
+        )
+        task.cancel()
+
+
+async def run_chat_task(websocket: WebSocket, chat: Coroutine) -> None:
+    try:
+        await chat
+    except asyncio.CancelledError:
+        WS_LOGGER.debug(
+            f"Chat cancelled for {websocket.client.host}:{websocket.client.port}"
+        )
+        raise
+    except Exception as e:
+        DEFAULT_LOGGER.error(
+            f"Chat error for {websocket.client.host}:{websocket.client.port}: {e}",
+            exc_info=True,
+        )
 
 
 async def handle_ws_toggle_message(websocket: WebSocket, message: WSToggleMessage):
@@ -115,7 +192,36 @@ async def handle_ws_toggle_message(websocket: WebSocket, message: WSToggleMessag
     await websocket.send_text(f"Mode switched to: {mode}")
 
 
-# Modified run_llm to be asynchronous and directly use query_chat_processing_fn
+async def handle_ws_watch_job_message(
+    websocket: WebSocket, message: WSWatchJobMessage
+) -> None:
+    """
+    Sends the job's current state to the client, and its later updates until
+    it finishes.
+    """
+    job = ingestion_queue.get(message.job_id)
+    if job is None:
+        await websocket.send_text(f"System: Job '{message.job_id}' not found.")
+        return
+
+    if job.status not in ("succeeded", "failed"):
+        job_watchers.setdefault(job.id, set()).add(websocket)
+    await websocket.send_text(WSJobFrame(job=job.to_dict()).model_dump_json())
+
+
+def forget_job_watcher(websocket: WebSocket) -> None:
+    for job_id, watchers in list(job_watchers.items()):
+        watchers.discard(websocket)
+        if not watchers:
+            del job_watchers[job_id]
+
+
+async def reply_llm(websocket: WebSocket, user_input: str) -> None:
+    result = await run_llm(websocket, user_input)
+    await websocket.send_text(result)
+
+
+# run_llm awaits the async query_chat_processing_fn, so it never blocks the event loop
 async def run_llm(websocket: WebSocket, user_input: str) -> str:
     """
     Processes a user's chat message using the appropriate LLM based on protection mode.
@@ -136,17 +242,16 @@ async def run_llm(websocket: WebSocket, user_input: str) -> str:
 
     # Select the correct LLM based on the protection mode
     llm_processor = (
-        protected_llm.query_chat_processing_fn
+        protected_llm.aquery_chat_processing_fn
         if current_protection_mode
-        else vulnerable_llm.query_chat_processing_fn
+        else vulnerable_llm.aquery_chat_processing_fn
     )
 
     try:
         # Call the LLM processing function
         DEFAULT_LOGGER.debug(f"llm_processor -> {llm_processor}")
-        new_context, llm_response = llm_processor(
-            current_context, user_input
-        )  # Await the async function
+        async with chat_slots:
+            new_context, llm_response = await llm_processor(current_context, user_input)
 
         # Update the context for the next turn
         contexts[websocket] = new_context
@@ -156,3 +261,56 @@ async def run_llm(websocket: WebSocket, user_input: str) -> str:
             f"Error during LLM processing for input '{user_input}': {e}", exc_info=True
         )
         return "System: An error occurred while processing your request."
+
+
+async def stream_llm(websocket: WebSocket, user_input: str) -> None:
+    """
+    Streams the response to a user's chat message: the retrieved sources first,
+    then the answer tokens as they are generated, then an end frame with timings.
+    """
+    current_context = contexts.get(websocket, "The conversation has just begun.")
+    current_protection_mode = protection_modes.get(websocket, True)
+
+    LLM_LOGGER.debug(
+        f"Calling stream_llm for {websocket.client.host}:{websocket.client.port}"
+    )
+    LLM_LOGGER.debug(f"User input: '{user_input}'")
+    LLM_LOGGER.debug(f"Resolved protection_mode: {current_protection_mode}")
+
+    llm_stream_processor = (
+        protected_llm.stream_chat_processing_fn
+        if current_protection_mode
+        else vulnerable_llm.stream_chat_processing_fn
+    )
+
+    async with chat_slots:
+        async for event in llm_stream_processor(current_context, user_input):
+            if event["type"] == "sources":
+                frame = WSSourcesFrame(sources=event["sources"])
+            elif event["type"] == "token":
+                frame = WSTokenFrame(token=event["token"])
+            else:
+                contexts[websocket] = event["context"]
+                frame = WSEndFrame(timings=event["timings"], error=event.get("error"))
+                LLM_LOGGER.debug(f"Streaming finished with timings: {event['timings']}")
+
+            await websocket.send_text(frame.model_dump_json())
+
+
+async def send_job_update(job: dict) -> None:
+    """
+    Pushes an ingestion job update to the clients watching the job.
+    """
+    if job["status"] in ("succeeded", "failed"):
+        watchers = job_watchers.pop(job["id"], set())
+    else:
+        watchers = job_watchers.get(job["id"], set())
+
+    frame = WSJobFrame(job=job).model_dump_json()
+    for websocket in list(watchers):
+        try:
+            await websocket.send_text(frame)
+        except Exception as e:
+            WS_LOGGER.debug(
+                f"Could not push job update to {websocket.client.host}:{websocket.client.port}: {e}"
+            )
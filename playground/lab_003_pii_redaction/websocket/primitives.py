@@ -7,6 +7,11 @@ from pydantic import BaseModel, RootModel
 class WSMessageTypes(StrEnum):
     TOGGLE = "toggle"
     CHAT = "chat"
+    SOURCES = "sources"
+    TOKEN = "token"
+    END = "end"
+    JOB = "job"
+    WATCH_JOB = "watch_job"
 
 
 class WSToggleMessage(BaseModel):
@@ -17,6 +22,42 @@ class WSToggleMessage(BaseModel):
 class WSChatMessage(BaseModel):
     type: Literal[WSMessageTypes.CHAT]
     message: str
+    stream: bool = False
 
 
-WSMessage = RootModel[WSToggleMessage | WSChatMessage | str]
+# Sent by the client that submitted an ingestion job, with the id from the upload response
+class WSWatchJobMessage(BaseModel):
+    type: Literal[WSMessageTypes.WATCH_JOB]
+    job_id: str
+
+
+WSMessage = RootModel[WSToggleMessage | WSChatMessage | WSWatchJobMessage | str]
+
+
+# Frames sent by the server when a chat message asks for `stream: true`
+class WSSource(BaseModel):
+    document: str
+    metadata: dict
+    score: float | None = None
+
+
+class WSSourcesFrame(BaseModel):
+    type: Literal[WSMessageTypes.SOURCES] = WSMessageTypes.SOURCES
+    sources: list[WSSource]
+
+
+class WSTokenFrame(BaseModel):
+    type: Literal[WSMessageTypes.TOKEN] = WSMessageTypes.TOKEN
+    token: str
+
+
+class WSEndFrame(BaseModel):
+    type: Literal[WSMessageTypes.END] = WSMessageTypes.END
+    timings: dict[str, float]
+    error: str | None = None
+
+
+# Pushed to the clients watching an ingestion job when it is queued, progresses or finishes
+class WSJobFrame(BaseModel):
+    type: Literal[WSMessageTypes.JOB] = WSMessageTypes.JOB
+    job: dict